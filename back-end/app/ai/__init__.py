@@ -8,17 +8,8 @@ This module contains all AI-related functionality including:
 - Prompt templates and management
 """
 
-# Import main LLM components when available
-try:
-    from .llm import *
-except ImportError:
-    pass
-
-try:
-    from .prompt import *
-except ImportError:
-    pass
-
+# Submodules are imported where they are used: loading the LLM stack up front
+# would make every process pay for LangChain, Gemini and Tavily at startup.
 __all__ = [
     # Add specific exports here as needed
-]
\ No newline at end of file
+]
@@ -0,0 +1,197 @@
+"""
+Admission control for agent runs
+
+Every question that is not answered from the cache costs several Gemini and
+Tavily calls. Without a limit a traffic spike sends all of them upstream at
+once, runs into rate limits and slows every user down together. The
+AdmissionController lets a fixed number of agent runs proceed, queues a
+bounded number more, and turns the rest away immediately with a retry hint
+instead of letting them time out.
+
+Waiting runs are queued per user and admitted round-robin, so a user who
+sends many questions at once (or a large batch) only delays their own
+questions, not everyone else's.
+
+A slot stays taken while its agent run is using a worker thread: if the
+request gives up first (the client disconnected, a batch was cancelled), the
+slot is released when the run ends rather than when the request does.
+
+Configuration:
+- ADMISSION_MAX_ACTIVE: agent runs in progress at once (default AGENT_MAX_CONCURRENCY)
+- ADMISSION_MAX_QUEUED: runs waiting for a slot, over all users (default 64)
+- ADMISSION_MAX_QUEUED_PER_USER: runs one user may have waiting (default 8)
+- ADMISSION_MAX_WAIT_SECONDS: longest a run waits before it is rejected (default 30)
+"""
+
+import asyncio
+import contextlib
+import functools
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, AsyncIterator, Deque, Dict, Hashable, Optional
+
+from app.ai.runner import AGENT_MAX_CONCURRENCY
+
+
+class AdmissionRejected(Exception):
+    """The run was not admitted; the client should retry after `retry_after` seconds"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Too many questions are being answered right now ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionSlot:
+    """Slot held by an admitted run; see AdmissionController.admit"""
+
+    def __init__(self):
+        self.worker: Optional[Future] = None
+
+    async def hold(self, worker: Future) -> Any:
+        """Await the result of a worker thread's future, keeping the slot until the worker finishes"""
+        self.worker = worker
+        return await asyncio.wrap_future(worker)
+
+
+class AdmissionController:
+    """Concurrency cap with bounded, per-user round-robin wait queues"""
+
+    def __init__(self, max_active: int = 8, max_queued: int = 64,
+                 max_queued_per_user: int = 8, max_wait_seconds: float = 30):
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.max_queued_per_user = max_queued_per_user
+        self.max_wait_seconds = max_wait_seconds
+        self._active = 0
+        self._queued = 0
+        # user -> waiters in arrival order; users are served in rotation
+        self._queues: "OrderedDict[Hashable, Deque[asyncio.Future]]" = OrderedDict()
+        self._admitted = 0
+        self._rejected: Dict[str, int] = {}
+        self._waits: Deque[float] = deque(maxlen=1000)  # Recent queue waits, for percentiles
+        self._run_seconds = 10.0  # Moving average of run time, for Retry-After
+
+    @contextlib.asynccontextmanager
+    async def admit(self, user_id: Hashable) -> AsyncIterator[AdmissionSlot]:
+        """Hold a run slot for the duration of the block, waiting fairly for one if needed
+
+        Runs on worker threads should be awaited with the yielded slot's
+        hold(), so that the slot is only released once the thread is free.
+        """
+        waited = await self._acquire(user_id)
+        self._waits.append(waited)
+        self._admitted += 1
+        started = time.monotonic()
+        slot = AdmissionSlot()
+
+        def finish(*_) -> None:
+            self._run_seconds = 0.8 * self._run_seconds + 0.2 * (time.monotonic() - started)
+            self._release()
+
+        try:
+            yield slot
+        finally:
+            if slot.worker is None or slot.worker.done():
+                finish()
+            else:
+                # Cancelled while the run goes on in its thread
+                loop = asyncio.get_running_loop()
+                slot.worker.add_done_callback(functools.partial(_call_soon, loop, finish))
+
+    async def _acquire(self, user_id: Hashable) -> float:
+        if self._active < self.max_active and not self._queued:
+            self._active += 1
+            return 0.0
+
+        queue = self._queues.get(user_id)
+        if self._queued >= self.max_queued:
+            self._reject("queue_full")
+        if queue is not None and len(queue) >= self.max_queued_per_user:
+            self._reject("user_queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        if queue is None:
+            queue = self._queues[user_id] = deque()
+        queue.append(waiter)
+        self._queued += 1
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.max_wait_seconds)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up; pass it on
+                self._release()
+            else:
+                waiter.cancel()
+                self._remove(user_id, waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._reject("wait_timeout")
+        return time.monotonic() - start
+
+    def _remove(self, user_id: Hashable, waiter: asyncio.Future) -> None:
+        queue = self._queues.get(user_id)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self._queued -= 1
+            if not queue:
+                del self._queues[user_id]
+
+    def _release(self) -> None:
+        # Hand the slot straight to the next user in rotation instead of freeing it
+        while self._queues:
+            user_id, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._queues.move_to_end(user_id)
+            else:
+                del self._queues[user_id]
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    def _reject(self, reason: str) -> None:
+        self._rejected[reason] = self._rejected.get(reason, 0) + 1
+        # Roughly when the queue ahead will have drained
+        drain = self._run_seconds * (self._queued + 1) / max(self.max_active, 1)
+        raise AdmissionRejected(reason, retry_after=max(1, math.ceil(drain)))
+
+    def stats(self) -> dict:
+        waits = sorted(self._waits)
+
+        def percentile(pct: float) -> float:
+            return round(waits[min(len(waits) - 1, int(pct / 100 * len(waits)))], 4) if waits else 0.0
+
+        return {
+            "active": self._active,
+            "max_active": self.max_active,
+            "queued": self._queued,
+            "max_queued": self.max_queued,
+            "queued_users": len(self._queues),
+            "admitted": self._admitted,
+            "rejected": dict(self._rejected),
+            "wait_seconds_p50": percentile(50),
+            "wait_seconds_p99": percentile(99),
+            "wait_seconds_max": round(waits[-1], 4) if waits else 0.0,
+        }
+
+
+def _call_soon(loop: asyncio.AbstractEventLoop, callback, *args) -> None:
+    try:
+        loop.call_soon_threadsafe(callback, *args)
+    except RuntimeError:
+        pass  # The loop has closed, so nothing waits for the slot any more
+
+
+admission = AdmissionController(
+    max_active=int(os.getenv("ADMISSION_MAX_ACTIVE", str(AGENT_MAX_CONCURRENCY))),
+    max_queued=int(os.getenv("ADMISSION_MAX_QUEUED", "64")),
+    max_queued_per_user=int(os.getenv("ADMISSION_MAX_QUEUED_PER_USER", "8")),
+    max_wait_seconds=float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "30")),
+)
@@ -0,0 +1,324 @@
+"""
+Answer cache for the ASU Chatbot
+
+Most traffic is the same handful of ASU questions, and each one otherwise pays
+for a full agent run. The cache answers a question from memory when it has
+seen the same question before, either exactly (after normalization) or as a
+near-duplicate found through a small local similarity index.
+
+Questions that depend on the date ("this week", "today", ...) are stored
+together with the date they were answered on and stop matching once the date
+changes.
+
+With a shared SHARED_STATE_BACKEND (see app/shared_state.py) every stored
+answer is also written to the shared store, and a question another worker
+has already answered is an exact hit here too. Near-duplicate matching stays
+local to each worker.
+
+Configuration:
+- ANSWER_CACHE_ENABLED: set to 0 to disable the cache (default 1)
+- ANSWER_CACHE_MAX_ENTRIES: answers kept in memory (default 1000)
+- ANSWER_CACHE_TTL_SECONDS: lifetime of a cached answer (default 21600)
+- ANSWER_CACHE_SIMILARITY: cosine similarity needed for a near-duplicate hit (default 0.9)
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, FrozenSet, List, Optional, Set
+
+from app.cache import TTLCache
+from app.shared_state import SharedStore, shared_store
+from .llm import get_current_date
+from .llm_schema import Source
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+_TIME_SENSITIVE_RE = re.compile(
+    r"\b(today|tonight|tomorrow|yesterday|now|currently|current|upcoming|latest|"
+    r"recent|recently|soon|this (week|weekend|month|semester|year)|"
+    r"next (week|weekend|month|semester|year)|last (week|weekend|month))\b"
+)
+
+_STOPWORDS = frozenset(
+    "a an and are at be can do does for from i in is it me my of on or "
+    "the there to will with you".split()
+)
+
+# Content words, but never matched as typos of each other ("when"/"where")
+_QUESTION_WORDS = frozenset("how what when where which who whom whose why".split())
+
+# Answers that signal the agent gave up; these are never cached
+_UNCACHEABLE_PREFIXES = ("Agent stopped", "I don't get what you mean")
+
+_VECTOR_DIMENSIONS = 1 << 16
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase a question and reduce it to space-separated words"""
+    return " ".join(_WORD_RE.findall(question.lower()))
+
+
+def is_time_sensitive(normalized: str) -> bool:
+    """Return True if the answer depends on the current date"""
+    return _TIME_SENSITIVE_RE.search(normalized) is not None
+
+
+def _embed(normalized: str) -> Dict[int, float]:
+    """
+    Embed a question as a sparse, L2-normalized vector of hashed words and
+    character trigrams. Cheap, local, and good enough to catch rephrasings
+    such as word-order changes or small typos.
+    """
+    features: Dict[int, float] = {}
+
+    def add(feature: str, weight: float) -> None:
+        digest = hashlib.blake2b(feature.encode(), digest_size=4).digest()
+        index = int.from_bytes(digest, "little") % _VECTOR_DIMENSIONS
+        features[index] = features.get(index, 0.0) + weight
+
+    for word in normalized.split():
+        if word not in _STOPWORDS:
+            add("w:" + word, 1.0)
+    padded = f" {normalized} "
+    for i in range(len(padded) - 2):
+        add("c:" + padded[i:i + 3], 0.5)
+
+    norm = math.sqrt(sum(v * v for v in features.values())) or 1.0
+    return {k: v / norm for k, v in features.items()}
+
+
+def _one_edit_apart(a: str, b: str) -> bool:
+    """Whether b is a with one character inserted, deleted or replaced"""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i + (len(a) == len(b)):] == b[i + 1:]
+
+
+def _same_words(a: FrozenSet[str], b: FrozenSet[str]) -> bool:
+    """
+    Whether two questions have the same content words, up to word order and
+    one-letter typos in longer words
+
+    A single different word can change the meaning ("open"/"closed",
+    "fall"/"spring", "graduate"/"undergraduate", "when"/"where") while leaving
+    the vectors of a long question almost identical, so similarity alone is
+    not enough.
+    """
+    only_a, only_b = sorted(a - b), list(b - a)
+    if len(only_a) != len(only_b):
+        return False
+    for word in only_a:
+        match = next((other for other in only_b
+                      if min(len(word), len(other)) >= 5 and _one_edit_apart(word, other)
+                      and not {word, other} & _QUESTION_WORDS), None)
+        if match is None:
+            return False
+        only_b.remove(match)
+    return True
+
+
+def _cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+@dataclass
+class CachedAnswer:
+    """A cached agent answer and the data used to match it"""
+    answer: List[str]
+    sources: List[Source]
+    date: Optional[str] = None
+    vector: Dict[int, float] = field(default_factory=dict, repr=False)
+    numbers: FrozenSet[str] = frozenset()
+    words: FrozenSet[str] = frozenset()  # Content words, without stopwords
+
+
+class AnswerCache:
+    """Exact and near-duplicate question cache with date-aware expiry"""
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 21600,
+                 similarity: float = 0.9, date_provider: Callable[[], str] = get_current_date,
+                 shared: Optional[SharedStore] = None):
+        self.similarity = similarity
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self._date_provider = date_provider
+        self._entries = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+        # word -> cache keys of entries containing it; pruned lazily
+        self._index: Dict[str, Set[str]] = {}
+        self._indexed: Set[str] = set()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    def _key(self, normalized: str) -> str:
+        if is_time_sensitive(normalized):
+            return f"{self._date_provider()}|{normalized}"
+        return normalized
+
+    def lookup(self, question: str) -> Optional[CachedAnswer]:
+        """Return a cached answer for question, or None"""
+        normalized = normalize_question(question)
+        key = self._key(normalized)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._lookup_shared(key, normalized)
+        if entry is not None:
+            with self._lock:
+                self.exact_hits += 1
+            return entry
+
+        entry = self._lookup_similar(normalized)
+        with self._lock:
+            if entry is not None:
+                self.similar_hits += 1
+            else:
+                self.misses += 1
+        return entry
+
+    async def lookup_async(self, question: str) -> Optional[CachedAnswer]:
+        """lookup() for async callers; with a shared store it runs off the event loop"""
+        if self.shared is None:
+            return self.lookup(question)
+        return await asyncio.to_thread(self.lookup, question)
+
+    def _lookup_similar(self, normalized: str) -> Optional[CachedAnswer]:
+        words = frozenset(normalized.split()) - _STOPWORDS
+        numbers = frozenset(w for w in words if w.isdigit())
+        date = self._date_provider() if is_time_sensitive(normalized) else None
+
+        with self._lock:
+            candidates = set()
+            for word in words:
+                candidates.update(self._index.get(word, ()))
+
+        vector = None
+        best, best_score = None, self.similarity
+        for key in candidates:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._unindex(key)
+                continue
+            # Different years, room numbers, etc. mean a different question
+            if entry.date != date or entry.numbers != numbers:
+                continue
+            if not _same_words(words, entry.words):
+                continue
+            if vector is None:
+                vector = _embed(normalized)
+            score = _cosine(vector, entry.vector)
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def store(self, question: str, answer: List[str], sources: List[Source]) -> None:
+        """Cache the agent's answer to question"""
+        text = "\n".join(answer)
+        if not text or text.startswith(_UNCACHEABLE_PREFIXES):
+            return
+
+        normalized = normalize_question(question)
+        key = self._key(normalized)
+        self._add(key, normalized, list(answer), list(sources))
+        if self.shared is not None:
+            value = json.dumps({"answer": list(answer), "sources": [source.model_dump() for source in sources]})
+            try:
+                self.shared.set("answer:" + key, value, ttl=self.ttl_seconds)
+            except Exception:
+                logger.exception("Could not write an answer to the shared store")
+
+    async def store_async(self, question: str, answer: List[str], sources: List[Source]) -> None:
+        """store() for async callers; with a shared store it runs off the event loop"""
+        if self.shared is None:
+            self.store(question, answer, sources)
+        else:
+            await asyncio.to_thread(self.store, question, answer, sources)
+
+    def _lookup_shared(self, key: str, normalized: str) -> Optional[CachedAnswer]:
+        """Fetch an answer stored by another worker and keep it locally"""
+        if self.shared is None:
+            return None
+        try:
+            value = self.shared.get("answer:" + key)
+        except Exception:
+            # The shared store is an optimization: run the agent if it is down
+            logger.exception("Could not read an answer from the shared store")
+            return None
+        if value is None:
+            return None
+        cached = json.loads(value)
+        return self._add(key, normalized, cached["answer"], [Source(**source) for source in cached["sources"]])
+
+    def _add(self, key: str, normalized: str, answer: List[str], sources: List[Source]) -> CachedAnswer:
+        words = frozenset(normalized.split()) - _STOPWORDS
+        entry = CachedAnswer(
+            answer=answer,
+            sources=sources,
+            date=self._date_provider() if is_time_sensitive(normalized) else None,
+            vector=_embed(normalized),
+            numbers=frozenset(w for w in words if w.isdigit()),
+            words=words,
+        )
+        self._entries.set(key, entry)
+        with self._lock:
+            self._indexed.add(key)
+            for word in words:
+                self._index.setdefault(word, set()).add(key)
+            stale_check = len(self._indexed) > 2 * self._entries.maxsize
+
+        # Evicted entries are only unindexed when a lookup trips over them, so
+        # sweep the index once it tracks far more keys than the cache can hold
+        if stale_check:
+            for key in [k for k in list(self._indexed) if k not in self._entries]:
+                self._unindex(key)
+        return entry
+
+    def _unindex(self, key: str) -> None:
+        # Keys are the normalized question, optionally prefixed by a date
+        words = set(key.rsplit("|", 1)[-1].split()) - _STOPWORDS
+        with self._lock:
+            self._indexed.discard(key)
+            for word in words:
+                keys = self._index.get(word)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._index[word]
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and cache size"""
+        with self._lock:
+            lookups = self.exact_hits + self.similar_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.similar_hits) / lookups if lookups else 0.0,
+            }
+
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") != "0"
+
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "21600")),
+    similarity=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.9")),
+    shared=shared_store,
+)
@@ -0,0 +1,295 @@
+"""
+Per-request resource budgets for agent runs
+
+The prompt asks the agent to stop after five search cycles, but nothing
+enforces it: a confused model can loop for minutes, paying for an LLM call
+and a search on every iteration. run_with_budget drives the executor one
+step at a time and stops it as soon as any limit is reached:
+- deadline: wall-clock seconds since the request started
+- tool calls: searches the agent may run (checked before each one starts)
+- tokens: prompt plus completion tokens over all LLM calls, as reported by
+  the model or estimated from text length when it reports nothing
+
+build_agent_executor also gives the executor matching max_iterations and
+max_execution_time, so runs that bypass run_with_budget are bounded too.
+
+Limits are checked between steps, so a single slow LLM call can overrun the
+deadline by its own duration. A stopped run still answers: it returns a
+best-effort summary of what its searches found, with their sources.
+
+Configuration:
+- AGENT_DEADLINE_SECONDS: wall-clock limit per question (default 30)
+- AGENT_MAX_TOOL_CALLS: searches per question (default 5)
+- AGENT_MAX_TOKENS: LLM tokens per question (default 30000)
+"""
+
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain.agents.agent_iterator import AgentExecutorIterator
+from langchain_core.agents import AgentAction
+from langchain_core.callbacks import BaseCallbackHandler
+
+from app.metrics import agent_llm_seconds, agent_tool_seconds, metrics
+
+from .traces import trace_recorder
+
+# Rough characters-per-token ratio, used when the model reports no usage
+CHARS_PER_TOKEN = 4
+
+BEST_EFFORT_PREFIX = "I couldn't finish researching this in time"
+
+# Output of an executor stopped by its own max_iterations/max_execution_time
+EXECUTOR_STOPPED_PREFIX = "Agent stopped"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AgentBudget:
+    """Limits for a single agent run"""
+    deadline_seconds: float = 30.0
+    max_tool_calls: int = 5
+    max_tokens: int = 30000
+
+    @classmethod
+    def from_env(cls) -> "AgentBudget":
+        return cls(
+            deadline_seconds=float(os.getenv("AGENT_DEADLINE_SECONDS", "30")),
+            max_tool_calls=int(os.getenv("AGENT_MAX_TOOL_CALLS", "5")),
+            max_tokens=int(os.getenv("AGENT_MAX_TOKENS", "30000")),
+        )
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class TokenCounter(BaseCallbackHandler):
+    """Callback handler that records the input and output tokens of every LLM call in a run"""
+
+    def __init__(self):
+        self.iterations: List[Dict[str, Any]] = []
+        self._prompt_estimate = 0
+
+    @property
+    def tokens(self) -> int:
+        return sum(it["input_tokens"] + it["output_tokens"] for it in self.iterations)
+
+    def on_llm_start(self, serialized, prompts, **kwargs: Any) -> None:
+        self._prompt_estimate = sum(_estimate_tokens(prompt) for prompt in prompts)
+
+    def on_chat_model_start(self, serialized, messages, **kwargs: Any) -> None:
+        self._prompt_estimate = sum(
+            _estimate_tokens(str(message.content)) for batch in messages for message in batch
+        )
+
+    def on_llm_end(self, response, **kwargs: Any) -> None:
+        input_tokens = output_tokens = completion_estimate = 0
+        for generations in response.generations:
+            for generation in generations:
+                completion_estimate += _estimate_tokens(generation.text)
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    input_tokens += usage.get("input_tokens", 0)
+                    output_tokens += usage.get("output_tokens", 0)
+        if not (input_tokens or output_tokens):
+            token_usage = (response.llm_output or {}).get("token_usage") or {}
+            input_tokens = token_usage.get("prompt_tokens", 0)
+            output_tokens = token_usage.get("completion_tokens", 0)
+        estimated = not (input_tokens or output_tokens)
+        if estimated:
+            input_tokens, output_tokens = self._prompt_estimate, completion_estimate
+        self.iterations.append(
+            {"input_tokens": input_tokens, "output_tokens": output_tokens, "estimated": estimated}
+        )
+
+
+class AgentTimer(BaseCallbackHandler):
+    """Callback handler that records how long each LLM and tool call of a run takes (metrics)"""
+
+    def __init__(self):
+        self._started: Dict[Any, float] = {}
+        self._tools: Dict[Any, str] = {}
+
+    def _start(self, run_id) -> None:
+        self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs: Any) -> None:
+        self._start(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs: Any) -> None:
+        self._start(run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs: Any) -> None:
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            agent_llm_seconds.observe(time.perf_counter() - started)
+
+    def on_llm_error(self, error, *, run_id, **kwargs: Any) -> None:
+        self.on_llm_end(None, run_id=run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs: Any) -> None:
+        self._start(run_id)
+        self._tools[run_id] = (serialized or {}).get("name") or "tool"
+
+    def on_tool_end(self, output, *, run_id, **kwargs: Any) -> None:
+        started = self._started.pop(run_id, None)
+        tool = self._tools.pop(run_id, "tool")
+        if started is not None:
+            agent_tool_seconds.labels(tool).observe(time.perf_counter() - started)
+
+    def on_tool_error(self, error, *, run_id, **kwargs: Any) -> None:
+        self.on_tool_end(None, run_id=run_id)
+
+
+class TraceCollector(BaseCallbackHandler):
+    """Callback handler that keeps each LLM and tool call of a run, for trace recording"""
+
+    def __init__(self, started_at: float):
+        self.started_at = started_at
+        self.steps: List[Dict[str, Any]] = []
+        self._open: Dict[Any, Dict[str, Any]] = {}
+
+    def _start(self, run_id, step: Dict[str, Any]) -> None:
+        step["start"] = round(time.monotonic() - self.started_at, 4)
+        self._open[run_id] = step
+        self.steps.append(step)
+
+    def _end(self, run_id, **fields: Any) -> None:
+        step = self._open.pop(run_id, None)
+        if step is not None:
+            step["seconds"] = round(time.monotonic() - self.started_at - step["start"], 4)
+            step.update(fields)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs: Any) -> None:
+        self._start(run_id, {"type": "llm"})
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs: Any) -> None:
+        self._start(run_id, {"type": "llm"})
+
+    def on_llm_end(self, response, *, run_id, **kwargs: Any) -> None:
+        self._end(run_id, text="".join(g.text for generations in response.generations for g in generations))
+
+    def on_llm_error(self, error, *, run_id, **kwargs: Any) -> None:
+        self._end(run_id, error=repr(error))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs: Any) -> None:
+        self._start(run_id, {"type": "tool", "tool": (serialized or {}).get("name") or "tool", "input": input_str})
+
+    def on_tool_end(self, output, *, run_id, **kwargs: Any) -> None:
+        self._end(run_id, output=output)
+
+    def on_tool_error(self, error, *, run_id, **kwargs: Any) -> None:
+        self._end(run_id, error=repr(error))
+
+
+def best_effort_answer(intermediate_steps: List[Tuple[AgentAction, Any]]) -> str:
+    """Summarize the search results gathered before the run was stopped"""
+    findings = []
+    for _, observation in intermediate_steps:
+        if not isinstance(observation, dict):
+            continue
+        for result in observation.get("results", [])[:2]:
+            content = " ".join(str(result.get("content", "")).split())
+            if content:
+                if len(content) > 300:
+                    content = content[:300].rsplit(" ", 1)[0] + "..."
+                findings.append(f"- {result.get('title') or result.get('url')}: {content}")
+    if not findings:
+        return (
+            f"{BEST_EFFORT_PREFIX}. Please try again, or ask a more specific question."
+        )
+    return f"{BEST_EFFORT_PREFIX}, but here is what I found so far:\n" + "\n".join(findings[:3])
+
+
+def run_with_budget(
+    executor,
+    inputs: dict,
+    budget: AgentBudget,
+    callbacks: Optional[list] = None,
+    started_at: Optional[float] = None,
+) -> dict:
+    """Run the agent executor step by step within budget
+
+    Returns the executor's usual result ("output", "intermediate_steps") plus
+    "budget_usage", a dict with elapsed_seconds, tool_calls, tokens (also
+    split into input_tokens and output_tokens, and per LLM call in
+    iterations), exhausted (the name of the limit that stopped the run,
+    or None) and, for runs whose trace was recorded (see traces.py),
+    trace_id. A summary of each run is logged at INFO level.
+    """
+    started_at = time.monotonic() if started_at is None else started_at
+    counter = TokenCounter()
+    steps: List[Tuple[AgentAction, Any]] = []
+    tool_calls = 0
+    exhausted = None
+    result = None
+
+    def over_budget(next_is_tool_call: bool) -> Optional[str]:
+        if time.monotonic() - started_at >= budget.deadline_seconds:
+            return "deadline"
+        if counter.tokens >= budget.max_tokens:
+            return "tokens"
+        if next_is_tool_call and tool_calls >= budget.max_tool_calls:
+            return "tool_calls"
+        return None
+
+    handlers = [*(callbacks or []), counter]
+    if metrics.enabled:
+        handlers.append(AgentTimer())
+    sampled = trace_recorder.should_collect()
+    collector = TraceCollector(started_at) if sampled is not None else None
+    if collector is not None:
+        handlers.append(collector)
+    chunks = iter(AgentExecutorIterator(executor, inputs, handlers, yield_actions=True))
+    for chunk in chunks:
+        if "output" in chunk:
+            if str(chunk["output"]).startswith(EXECUTOR_STOPPED_PREFIX):
+                # The executor's own limits (see build_agent_executor) came first
+                exhausted = over_budget(next_is_tool_call=False) or "iterations"
+            else:
+                result = dict(chunk)
+            break
+        # Actions are yielded before their tool runs, steps once it has finished.
+        # Retries after unparseable output ("_Exception") are not tool calls.
+        actions = [action for action in chunk.get("actions", []) if action.tool != "_Exception"]
+        exhausted = over_budget(next_is_tool_call=bool(actions))
+        if exhausted:
+            chunks.close()
+            break
+        tool_calls += len(actions)
+        for step in chunk.get("steps", []):
+            steps.append((step.action, step.observation))
+
+    if result is None:
+        # Stopped early: answer from what was gathered so far
+        result = {"output": best_effort_answer(steps), "intermediate_steps": steps}
+
+    usage = {
+        "elapsed_seconds": round(time.monotonic() - started_at, 3),
+        "tool_calls": tool_calls,
+        "tokens": counter.tokens,
+        "input_tokens": sum(it["input_tokens"] for it in counter.iterations),
+        "output_tokens": sum(it["output_tokens"] for it in counter.iterations),
+        "iterations": counter.iterations,
+        "exhausted": exhausted,
+    }
+    if collector is not None and trace_recorder.keep(sampled, usage["elapsed_seconds"]):
+        llm_steps = [step for step in collector.steps if step["type"] == "llm"]
+        for step, tokens in zip(llm_steps, counter.iterations):
+            step.update(input_tokens=tokens["input_tokens"], output_tokens=tokens["output_tokens"])
+        usage["trace_id"] = trace_recorder.record(inputs, collector.steps, result["output"], usage, asdict(budget))
+    logger.info(
+        "Agent run: %.2fs, %d tool calls, %d LLM calls, tokens in/out %d/%d, per call %s%s%s",
+        usage["elapsed_seconds"], tool_calls, len(counter.iterations),
+        usage["input_tokens"], usage["output_tokens"],
+        [(it["input_tokens"], it["output_tokens"]) for it in counter.iterations],
+        f", stopped by {exhausted}" if exhausted else "",
+        f", trace {usage['trace_id']}" if "trace_id" in usage else "",
+    )
+    result["budget_usage"] = usage
+    return result
@@ -0,0 +1,59 @@
+"""
+Gemini chat model behind the upstream call policy
+
+ChatGoogleGenerativeAI keeps one client (and its connection) for all calls,
+but retries with its own fixed, unjittered backoff and has no hedging. Here
+its built-in retries are turned off and every call goes through
+call_upstream with the LLM_* policy instead (see upstream.py).
+
+Streamed calls are retried only until the first chunk arrives, and are never
+hedged: tokens already sent to the client cannot be taken back.
+"""
+
+import dataclasses
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from .upstream import UpstreamPolicy, call_upstream
+
+LLM_POLICY = UpstreamPolicy.from_env("LLM", timeout=30)
+
+
+class PolicyChatGoogleGenerativeAI(ChatGoogleGenerativeAI):
+    """Gemini chat model whose requests follow an UpstreamPolicy"""
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[Any] = None, **kwargs: Any) -> ChatResult:
+        generate = super()._generate
+
+        def attempt(timeout: float) -> ChatResult:
+            # Hedged attempts run side by side, so none reports to the run's callbacks
+            return generate(messages, stop=stop, timeout=timeout, max_retries=1, **kwargs)
+
+        return call_upstream("llm", attempt, LLM_POLICY)
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[Any] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        stream = super()._stream
+
+        def attempt(timeout: float):
+            chunks = stream(messages, stop=stop, run_manager=run_manager, timeout=timeout, max_retries=1, **kwargs)
+            return chunks, next(chunks, None)
+
+        chunks, first = call_upstream("llm", attempt, dataclasses.replace(LLM_POLICY, hedge_after=None))
+        if first is not None:
+            yield first
+            yield from chunks
+
+
+def create_gemini(model: str, api_key: Optional[str]) -> PolicyChatGoogleGenerativeAI:
+    return PolicyChatGoogleGenerativeAI(
+        model=model,
+        temperature=0,
+        google_api_key=api_key,
+        timeout=LLM_POLICY.timeout,
+        max_retries=1,
+    )
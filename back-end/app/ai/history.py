@@ -0,0 +1,173 @@
+"""
+Persistent conversation history
+
+Every question/answer exchange is written to the messages table so that
+conversations survive restarts and can be browsed later. Writes are
+write-behind: the chat request only appends to the in-memory window and
+queues the rows, and a background task inserts them in batches, so answering
+never waits for the database.
+
+Stores that do I/O (SharedConversationStore) are called from a worker
+thread, so the event loop never waits on the shared store.
+
+When a conversation that is not in memory is resumed (after a restart, or
+once its idle TTL has passed) its last CONVERSATION_WINDOW exchanges are read
+back with a single indexed query, together with its rows that are still
+queued. Listing a user's conversations or messages first writes that user's
+or conversation's queued rows only.
+
+Configuration:
+- CONVERSATION_PERSIST: store conversations in the database (default 1)
+- CONVERSATION_WRITE_BATCH: most messages inserted per transaction (default 200)
+- CONVERSATION_FLUSH_SECONDS: longest a queued message waits to be written (default 0.5)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from app import db
+from app.ai.memory import ConversationStore, conversation_store
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationHistory:
+    """In-memory conversation windows backed by batched database writes"""
+
+    def __init__(self, store: ConversationStore, enabled: bool = True,
+                 batch_size: int = 200, flush_seconds: float = 0.5):
+        self.store = store
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._pending: List[dict] = []
+        self._writing: List[dict] = []  # The batch being written
+        self._wakeup: Optional[asyncio.Event] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._closing = False
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+    async def _call(self, method, *args, **kwargs):
+        if self.store.blocking:
+            return await asyncio.to_thread(method, *args, **kwargs)
+        return method(*args, **kwargs)
+
+    async def get_chat_history(self, user_id, conversation_id: str) -> str:
+        """Return the prompt history, loading the persisted window on resume"""
+        if (self.enabled and user_id is not None
+                and not await self._call(self.store.__contains__, (user_id, conversation_id))):
+            # Queued rows of this conversation are part of its window. Taken before
+            # the read, so a row written meanwhile is in one of the two
+            queued = [(row["seq"], row["role"], row["content"])
+                      for row in self._rows_of(self._writing + self._pending, user_id, conversation_id)]
+            # Errors propagate: answering without the stored window would number
+            # the new turns from 1 again and clash with the stored ones
+            messages = await db.load_recent_messages_async(
+                user_id, conversation_id, 2 * self.store.window
+            )
+            if queued:
+                by_seq = {message[0]: message for message in messages + queued}
+                messages = [by_seq[seq] for seq in sorted(by_seq)][-2 * self.store.window:]
+            if messages:
+                await self._call(self.store.restore, user_id, conversation_id, messages)
+        return await self._call(self.store.get_chat_history, user_id, conversation_id)
+
+    async def get_serialized(self, user_id, conversation_id: str, after: Optional[int] = None,
+                             limit: Optional[int] = None) -> Tuple[List[Dict], int]:
+        """The store's get_serialized, off the event loop when the store does I/O"""
+        return await self._call(self.store.get_serialized, user_id, conversation_id, after=after, limit=limit)
+
+    async def save_turn(self, user_id, conversation_id: str, question: str, answer: str) -> int:
+        """Remember an exchange now, queue it to be written to the database and return the answer's seq"""
+        seq = await self._call(self.store.save_turn, user_id, conversation_id, question, answer)
+        if not self.enabled or user_id is None:
+            return seq
+        now = time.time()
+        for offset, role, content in ((1, "human", question), (0, "ai", answer)):
+            self._pending.append({
+                "user_id": user_id,
+                "conversation_id": conversation_id,
+                "seq": seq - offset,
+                "role": role,
+                "content": content,
+                "created_at": now,
+            })
+        self._ensure_writer()
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        return seq
+
+    async def get_messages_page(self, user_id, conversation_id: str,
+                                before_seq: Optional[int] = None, limit: int = 50) -> list:
+        """Return a page of stored messages before seq `before_seq`, newest first"""
+        await self.flush(user_id, conversation_id)
+        return await db.get_messages_page_async(user_id, conversation_id, before_seq, limit)
+
+    @staticmethod
+    def _rows_of(rows: List[dict], user_id, conversation_id: Optional[str] = None) -> List[dict]:
+        """The rows of a user, or of one of their conversations"""
+        return [row for row in rows if row["user_id"] == user_id
+                and (conversation_id is None or row["conversation_id"] == conversation_id)]
+
+    async def flush(self, user_id=None, conversation_id: Optional[str] = None) -> None:
+        """Write all queued messages, or only those of a user or one of their conversations"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        # Waits for a batch being written, which may hold rows of this user
+        async with self._flush_lock:
+            while True:
+                if user_id is None:
+                    batch = self._pending[:self.batch_size]
+                    del self._pending[:len(batch)]
+                else:
+                    batch = self._rows_of(self._pending, user_id, conversation_id)[:self.batch_size]
+                    taken = {id(row) for row in batch}
+                    self._pending = [row for row in self._pending if id(row) not in taken]
+                if not batch:
+                    return
+                self._writing = batch
+                try:
+                    await db.save_messages_async(batch)
+                except Exception:
+                    # The answer has already been sent; losing history must not fail requests
+                    logger.exception("Dropped %d conversation messages that could not be stored", len(batch))
+                finally:
+                    self._writing = []
+
+    def _ensure_writer(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._writer is None or self._writer.done() or self._writer.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._writer = loop.create_task(self._write_loop())
+
+    async def _write_loop(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def close(self) -> None:
+        """Stop the background writer after writing what is still queued"""
+        if self._writer is not None and self._writer.get_loop() is asyncio.get_running_loop():
+            # Let a batch that is being written finish rather than cancelling it
+            self._closing = True
+            self._wakeup.set()
+            await self._writer
+        self._writer = None
+        self._closing = False
+        await self.flush()
+        self._flush_lock = None
+
+
+conversation_history = ConversationHistory(
+    conversation_store,
+    enabled=os.getenv("CONVERSATION_PERSIST", "1") == "1",
+    batch_size=int(os.getenv("CONVERSATION_WRITE_BATCH", "200")),
+    flush_seconds=float(os.getenv("CONVERSATION_FLUSH_SECONDS", "0.5")),
+)
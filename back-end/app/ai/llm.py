@@ -5,22 +5,26 @@ This module provides an AI-powered chatbot for Arizona State University
 using LangChain agents with Google Gemini LLM and Tavily search integration.
 
 Features:
-- Conversational memory for follow-up questions
-- Real-time web search capabilities
+- Conversational memory for follow-up questions (see memory.py)
+- Real-time web search capabilities, cached and coalesced (see search_cache.py)
+- Upstream timeouts, jittered retries and optional hedging (see upstream.py)
 - Structured responses with source extraction
 - ASU-specific knowledge and context
+
+LangChain's agent module, the Gemini client and Tavily take seconds to
+import, so they are only loaded when the agent is first needed (get_chain),
+not when the application starts.
 """
 
 from dotenv import load_dotenv
 import os
+import threading
 from datetime import datetime
-from langchain.agents import AgentExecutor, create_react_agent
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_tavily import TavilySearch
-from .llm_schema import LLMResponse, Source
-from .prompt import PROMPT_TEMPLATE
-from langchain_core.prompts import PromptTemplate
-from langchain.memory import ConversationBufferWindowMemory
+from typing import Optional
+from .llm_schema import LLMResponse
+from .prompt import get_prompt_template
+from .search_cache import search_cache
+from .sources import extract_sources
 
 load_dotenv()
 
@@ -28,69 +32,94 @@ def get_current_date():
     """Returns current date in MM-DD-YYYY format"""
     return datetime.now().strftime("%m-%d-%Y")
 
-# Initialize tools and LLM
-tools = [TavilySearch(tavily_api_key=os.getenv("TAVILY_API_KEY"))]
-llm = ChatGoogleGenerativeAI(
-    model="gemini-flash-lite-latest",
-    temperature=0,
-    google_api_key=os.getenv("GOOGLE_API_KEY")
-)
-
-# Configure prompt template with current date
-current_date = get_current_date()
-prompt_template = PromptTemplate(
-    template=PROMPT_TEMPLATE,
-    input_variables=["input", "agent_scratchpad", "tool_names", "tools", "chat_history"],
-).partial(current_date=current_date)
-
-# Initialize conversation memory
-memory = ConversationBufferWindowMemory(
-    k=5,  # Remember last 5 interactions
-    memory_key="chat_history",
-    input_key="input"
-)
-
-# Create agent and executor
-agent = create_react_agent(
-    llm=llm,
-    tools=tools,
-    prompt=prompt_template,
-)
-
-agent_executor = AgentExecutor(
-    agent=agent,
-    tools=tools,
-    verbose=False,  # Set to True for debugging
-    handle_parsing_errors=True,
-    max_iterations=100,
-    memory=memory,
-    return_intermediate_steps=True,
-)
-
-# Main chain for processing user queries
-chain = agent_executor
+def create_tools():
+    """Create the agent's tools: Tavily web search behind the shared search cache"""
+    from .tavily import create_tavily_search
+    from .tools import CachedSearchTool
+
+    return [CachedSearchTool.wrap(create_tavily_search(os.getenv("TAVILY_API_KEY")), search_cache)]
+
+def create_llm():
+    """Create the Gemini chat model, with timeouts, retries and hedging from the LLM_* settings"""
+    from .gemini import create_gemini
+
+    return create_gemini("gemini-flash-lite-latest", os.getenv("GOOGLE_API_KEY"))
+
+def build_prompt(variant: Optional[str] = None, few_shot: Optional[bool] = None):
+    """
+    Build the agent prompt template.
+
+    The static text is rendered once per agent; the current date is a
+    callable partial, filled in each time the prompt is formatted. The
+    template variant defaults to PROMPT_VARIANT / PROMPT_FEW_SHOT.
+    """
+    from .prompt_builder import PrerenderedPromptTemplate
+
+    return PrerenderedPromptTemplate(
+        template=get_prompt_template(variant, few_shot),
+        input_variables=["input", "agent_scratchpad", "tool_names", "tools", "chat_history"],
+    ).partial(current_date=get_current_date)
+
+def build_agent_executor(llm, tools, prompt=None, budget=None):
+    """
+    Create the ReAct agent executor for the given LLM and tools, using
+    prompt or, by default, the configured build_prompt().
+
+    The executor is stateless: callers pass each conversation's history in
+    the "chat_history" input, so one executor can serve all users at once.
+
+    It stops by itself after as many iterations as the budget allows (its
+    tool calls plus the final answer) or at the budget's deadline, so it is
+    bounded however it is invoked; budget defaults to AgentBudget.from_env().
+    run_with_budget applies each request's budget, including the token
+    limit, on top.
+    """
+    from langchain.agents import AgentExecutor, create_react_agent
+
+    from .budget import AgentBudget
+
+    budget = budget or AgentBudget.from_env()
+
+    agent = create_react_agent(
+        llm=llm,
+        tools=tools,
+        prompt=prompt or build_prompt(),
+    )
+
+    return AgentExecutor(
+        agent=agent,
+        tools=tools,
+        verbose=False,  # Set to True for debugging
+        handle_parsing_errors=True,
+        max_iterations=budget.max_tool_calls + 1,
+        max_execution_time=budget.deadline_seconds,
+        return_intermediate_steps=True,
+    )
+
+# Main chain for processing user queries, built on first use by get_chain()
+chain = None
+_chain_lock = threading.Lock()
+
+def get_chain():
+    """Return the agent executor, creating the LLM, tools and agent on first call"""
+    global chain
+    if chain is None:
+        with _chain_lock:
+            if chain is None:
+                chain = build_agent_executor(create_llm(), create_tools())
+    return chain
 
 def process_result(result):
     """Process the agent result and convert to LLMResponse format"""
     if isinstance(result, dict) and 'output' in result:
         output_text = result['output']
-        
-        # Extract sources from intermediate steps
-        sources = []
-        if 'intermediate_steps' in result:
-            for step in result['intermediate_steps']:
-                # Each step is a tuple (AgentAction, observation)
-                if len(step) > 1:
-                    observation = step[1]
-                    # Tavily returns results in a specific format
-                    if isinstance(observation, dict) and 'results' in observation:
-                        for search_result in observation['results']:
-                            if 'url' in search_result and search_result['url']:
-                                sources.append(Source(url=search_result['url']))
-        
+
+        # Unique sources from the searches, ASU pages first (see sources.py)
+        sources = extract_sources(result.get('intermediate_steps', ()))
+
         # Create a basic LLMResponse structure
         return LLMResponse(
             answer=[output_text],  # Convert to list as per your schema
             sources=sources  # Now includes extracted URLs from searches
         )
-    return result
\ No newline at end of file
+    return result
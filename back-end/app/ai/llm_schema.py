@@ -1,10 +1,16 @@
+import os
 from typing import List, Optional
 from pydantic import BaseModel, Field
 
+# Most questions accepted in one batch request
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+
 
 class Source(BaseModel):
     """Source information for LLM responses"""
     url: str = Field(..., description="URL of the source")
+    title: Optional[str] = Field(None, description="Title of the page")
+    snippet: Optional[str] = Field(None, description="Start of the search result's text")
 
 
 class LLMResponse(BaseModel):
@@ -16,7 +22,34 @@ class LLMResponse(BaseModel):
 class ChatRequest(BaseModel):
     """Request model for chat endpoint"""
     question: str = Field(..., description="The user's question", min_length=1, max_length=1000)
+    conversation_id: str = Field("default", description="Conversation to continue, scoped to the current user", min_length=1, max_length=64)
     include_history: Optional[bool] = Field(True, description="Whether to include conversation history in response")
+    history_after: Optional[int] = Field(None, description="Only include history messages after this seq (the history_cursor of the previous response)", ge=0)
+    history_limit: Optional[int] = Field(None, description="Include at most this many of the newest history messages", ge=0, le=100)
+
+
+class BatchChatRequest(BaseModel):
+    """Request model for the batch chat endpoint"""
+    requests: List[ChatRequest] = Field(..., description="Questions to answer", min_length=1, max_length=BATCH_MAX_ITEMS)
+
+
+class IterationUsage(BaseModel):
+    """Tokens of one LLM call in an agent run"""
+    input_tokens: int = Field(..., description="Prompt tokens sent")
+    output_tokens: int = Field(..., description="Completion tokens received")
+    estimated: bool = Field(False, description="Whether counts were estimated from text length")
+
+
+class BudgetUsage(BaseModel):
+    """Resources an agent run used against its per-request budget"""
+    elapsed_seconds: float = Field(..., description="Wall-clock time of the run, including queueing")
+    tool_calls: int = Field(..., description="Searches the agent ran")
+    tokens: int = Field(..., description="LLM tokens used (estimated when the model reports none)")
+    input_tokens: int = Field(0, description="Prompt tokens over all LLM calls")
+    output_tokens: int = Field(0, description="Completion tokens over all LLM calls")
+    iterations: List[IterationUsage] = Field(default_factory=list, description="Token usage of each LLM call")
+    exhausted: Optional[str] = Field(None, description="Limit that stopped the run early: deadline, tool_calls or tokens")
+    trace_id: Optional[str] = Field(None, description="ID of the run's recorded trace, if it was recorded")
 
 
 class ChatResponse(BaseModel):
@@ -24,4 +57,6 @@ class ChatResponse(BaseModel):
     question: str = Field(..., description="The original question")
     answer: List[str] = Field(..., description="List of answer segments")
     sources: List[Source] = Field(default_factory=list, description="Sources used in the response")
-    conversation_history: Optional[List[dict]] = Field(None, description="Conversation history if requested")
\ No newline at end of file
+    conversation_history: Optional[List[dict]] = Field(None, description="Conversation history if requested: {seq, role, content} messages, oldest first")
+    history_cursor: Optional[int] = Field(None, description="seq of the newest message; send it as history_after to receive only newer messages")
+    budget_usage: Optional[BudgetUsage] = Field(None, description="Agent budget usage; empty for cached answers")
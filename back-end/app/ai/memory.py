@@ -0,0 +1,256 @@
+"""
+Per-user conversation memory for the ASU Chatbot
+
+Each conversation is keyed by (user_id, conversation_id) and keeps only the
+last few exchanges, so concurrent users never see each other's history and
+the agent executor itself can stay stateless.
+
+Configuration:
+- CONVERSATION_WINDOW: exchanges kept per conversation (default 5)
+- CONVERSATION_MAX_SESSIONS: conversations held in memory (default 10000)
+- CONVERSATION_TTL_SECONDS: idle time before a conversation is dropped (default 3600)
+- CONVERSATION_MAX_MESSAGE_CHARS: longest message stored, longer ones are cut (default 4000)
+
+Memory use is capped at roughly
+MAX_SESSIONS * 2 * WINDOW * MAX_MESSAGE_CHARS characters.
+
+With a shared SHARED_STATE_BACKEND (sqlite or redis, see app/shared_state.py)
+the windows live in the shared store instead (SharedConversationStore), so a
+conversation can continue on any worker; MAX_SESSIONS then does not apply.
+"""
+
+import json
+import os
+import threading
+from collections import deque
+from typing import Deque, Dict, Hashable, List, Optional, Tuple
+
+from app.cache import TTLCache
+from app.shared_state import SharedStore, shared_store
+
+Message = Tuple[str, str]  # (role, content), role is "human" or "ai"
+NumberedMessage = Tuple[int, str, str]  # (seq, role, content)
+
+_ROLE_PREFIXES = {"human": "Human", "ai": "AI"}
+
+
+class _Conversation:
+    """Window of one conversation's messages in their serialized API form"""
+
+    __slots__ = ("messages", "last_seq", "prompt")
+
+    def __init__(self, window: int):
+        # {"seq", "role", "content"} dicts, built once and shared by every response
+        self.messages: Deque[Dict] = deque(maxlen=2 * window)
+        self.last_seq = 0
+        self.prompt: Optional[str] = None  # Formatted chat history, rebuilt after a change
+
+    def append(self, seq: int, role: str, content: str) -> None:
+        self.messages.append({"seq": seq, "role": role, "content": content})
+        self.last_seq = seq
+        self.prompt = None
+
+
+class ConversationStore:
+    """LRU/TTL-bounded store of windowed chat histories
+
+    Messages are numbered per conversation (`seq`, starting at 1), so clients
+    can ask for only the messages after the last one they have seen.
+    """
+
+    # Calls only touch process memory, so the event loop may make them directly
+    blocking = False
+
+    def __init__(self, window: int = 5, max_sessions: int = 10000,
+                 ttl_seconds: float = 3600, max_message_chars: int = 4000):
+        self.window = window
+        self.max_message_chars = max_message_chars
+        self._conversations = TTLCache(maxsize=max_sessions, ttl=ttl_seconds)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(user_id, conversation_id: str) -> Hashable:
+        return (user_id, conversation_id)
+
+    def get_messages(self, user_id, conversation_id: str) -> List[Message]:
+        """Return the stored messages of a conversation, oldest first"""
+        conversation = self._conversations.get(self._key(user_id, conversation_id))
+        if conversation is None:
+            return []
+        return [(m["role"], m["content"]) for m in conversation.messages]
+
+    def get_serialized(self, user_id, conversation_id: str, after: Optional[int] = None,
+                       limit: Optional[int] = None) -> Tuple[List[Dict], int]:
+        """
+        Return the serialized messages newer than seq `after` (at most the last
+        `limit` of them), oldest first, and the seq of the newest message
+        """
+        conversation = self._conversations.get(self._key(user_id, conversation_id))
+        if conversation is None:
+            return [], after or 0
+        messages = list(conversation.messages)
+        if after is not None:
+            # seqs are consecutive, so the new messages are a suffix of the window
+            new = max(conversation.last_seq - after, 0)
+            messages = messages[len(messages) - new:] if new < len(messages) else messages
+        if limit is not None:
+            messages = messages[-limit:] if limit > 0 else []
+        return messages, conversation.last_seq
+
+    def get_chat_history(self, user_id, conversation_id: str) -> str:
+        """Return the conversation formatted for the prompt's {chat_history}"""
+        conversation = self._conversations.get(self._key(user_id, conversation_id))
+        if conversation is None:
+            return ""
+        with self._lock:
+            if conversation.prompt is None:
+                conversation.prompt = "\n".join(
+                    f"{_ROLE_PREFIXES.get(m['role'], m['role'])}: {m['content']}"
+                    for m in conversation.messages
+                )
+            return conversation.prompt
+
+    def __contains__(self, key: Tuple) -> bool:
+        """`(user_id, conversation_id) in store`: whether the conversation is held in memory"""
+        return self._conversations.get(self._key(*key)) is not None
+
+    def restore(self, user_id, conversation_id: str, messages: List[NumberedMessage]) -> None:
+        """Seed a conversation that is not in memory, e.g. with its persisted window"""
+        key = self._key(user_id, conversation_id)
+        with self._lock:
+            if self._conversations.get(key) is not None:
+                return  # A turn was saved while the window was being loaded
+            conversation = _Conversation(self.window)
+            for seq, role, content in messages:
+                conversation.append(seq, role, content[:self.max_message_chars])
+            self._conversations.set(key, conversation)
+
+    def save_turn(self, user_id, conversation_id: str, question: str, answer: str) -> int:
+        """Append a question/answer exchange, refresh the conversation's expiry and return the answer's seq"""
+        key = self._key(user_id, conversation_id)
+        with self._lock:
+            conversation: Optional[_Conversation] = self._conversations.get(key)
+            if conversation is None:
+                conversation = _Conversation(self.window)
+            seq = conversation.last_seq
+            conversation.append(seq + 1, "human", question[:self.max_message_chars])
+            conversation.append(seq + 2, "ai", answer[:self.max_message_chars])
+            self._conversations.set(key, conversation)
+            return seq + 2
+
+    def clear(self, user_id, conversation_id: str) -> None:
+        self._conversations.pop(self._key(user_id, conversation_id))
+
+    def stats(self) -> Dict[str, int]:
+        return self._conversations.stats()
+
+
+class SharedConversationStore(ConversationStore):
+    """ConversationStore kept in a SharedStore, so every worker sees every conversation
+
+    Each conversation is a capped list of JSON messages plus a counter that
+    hands out seqs, so turns saved by two workers at once are never numbered
+    alike. Workers cannot tell when another one changed a conversation, so
+    the prompt history is formatted on every request instead of cached.
+    """
+
+    # Every call is shared store I/O; ConversationHistory runs them off the event loop
+    blocking = True
+
+    def __init__(self, store: SharedStore, window: int = 5, ttl_seconds: float = 3600,
+                 max_message_chars: int = 4000):
+        self.store = store
+        self.window = window
+        self.ttl_seconds = ttl_seconds
+        self.max_message_chars = max_message_chars
+        self._lock = threading.Lock()
+        self.saved_turns = 0
+        self.restored = 0
+
+    @staticmethod
+    def _key(user_id, conversation_id: str) -> str:
+        return f"conversation:{user_id}:{conversation_id}"
+
+    def _messages(self, user_id, conversation_id: str) -> List[Dict]:
+        messages = [json.loads(item) for item in self.store.get_list(self._key(user_id, conversation_id))]
+        # Turns saved concurrently by different workers may be appended out of order
+        messages.sort(key=lambda m: m["seq"])
+        return messages
+
+    def get_messages(self, user_id, conversation_id: str) -> List[Message]:
+        return [(m["role"], m["content"]) for m in self._messages(user_id, conversation_id)]
+
+    def get_serialized(self, user_id, conversation_id: str, after: Optional[int] = None,
+                       limit: Optional[int] = None) -> Tuple[List[Dict], int]:
+        messages = self._messages(user_id, conversation_id)
+        if not messages:
+            return [], after or 0
+        last_seq = messages[-1]["seq"]
+        if after is not None:
+            messages = [m for m in messages if m["seq"] > after]
+        if limit is not None:
+            messages = messages[-limit:] if limit > 0 else []
+        return messages, last_seq
+
+    def get_chat_history(self, user_id, conversation_id: str) -> str:
+        return "\n".join(
+            f"{_ROLE_PREFIXES.get(m['role'], m['role'])}: {m['content']}"
+            for m in self._messages(user_id, conversation_id)
+        )
+
+    def __contains__(self, key: Tuple) -> bool:
+        return self.store.exists(self._key(*key))
+
+    def restore(self, user_id, conversation_id: str, messages: List[NumberedMessage]) -> None:
+        key = self._key(user_id, conversation_id)
+        if not messages or self.store.exists(key):
+            return
+        # Only the first worker to resume the conversation seeds it
+        if not self.store.set(key + ":seq", str(max(seq for seq, _, _ in messages)),
+                              ttl=self.ttl_seconds, only_if_absent=True):
+            return
+        self.store.append(key, [
+            json.dumps({"seq": seq, "role": role, "content": content[:self.max_message_chars]})
+            for seq, role, content in messages
+        ], max_len=2 * self.window, ttl=self.ttl_seconds)
+        with self._lock:
+            self.restored += 1
+
+    def save_turn(self, user_id, conversation_id: str, question: str, answer: str) -> int:
+        key = self._key(user_id, conversation_id)
+        seq = self.store.incr(key + ":seq", 2, ttl=self.ttl_seconds)
+        self.store.append(key, [
+            json.dumps({"seq": seq - 1, "role": "human", "content": question[:self.max_message_chars]}),
+            json.dumps({"seq": seq, "role": "ai", "content": answer[:self.max_message_chars]}),
+        ], max_len=2 * self.window, ttl=self.ttl_seconds)
+        with self._lock:
+            self.saved_turns += 1
+        return seq
+
+    def clear(self, user_id, conversation_id: str) -> None:
+        key = self._key(user_id, conversation_id)
+        self.store.delete(key)
+        self.store.delete(key + ":seq")
+
+    def stats(self) -> Dict[str, int]:
+        """Turns saved and conversations restored by this process (the size is not known locally)"""
+        with self._lock:
+            return {"saved_turns": self.saved_turns, "restored": self.restored}
+
+
+def _create_conversation_store() -> ConversationStore:
+    window = int(os.getenv("CONVERSATION_WINDOW", "5"))
+    ttl_seconds = float(os.getenv("CONVERSATION_TTL_SECONDS", "3600"))
+    max_message_chars = int(os.getenv("CONVERSATION_MAX_MESSAGE_CHARS", "4000"))
+    if shared_store is not None:
+        return SharedConversationStore(shared_store, window=window, ttl_seconds=ttl_seconds,
+                                       max_message_chars=max_message_chars)
+    return ConversationStore(
+        window=window,
+        max_sessions=int(os.getenv("CONVERSATION_MAX_SESSIONS", "10000")),
+        ttl_seconds=ttl_seconds,
+        max_message_chars=max_message_chars,
+    )
+
+
+conversation_store = _create_conversation_store()
@@ -1,6 +1,15 @@
 # in your prompts.py file or wherever PROMPT_TEMPLATE is defined
+#
+# The prompt is assembled from sections so that a compact variant can reuse
+# them. PROMPT_VARIANT picks the variant the agent uses:
+# - full: the original prompt, which lists the tools twice
+# - compact: lists the tools once; PROMPT_FEW_SHOT=0 also drops the examples
+#   (over 40% of the prompt), which every ReAct iteration re-sends
 
-PROMPT_TEMPLATE = """
+import os
+from typing import Optional
+
+_SYSTEM_SECTION = """
 # [SYSTEM INSTRUCTIONS]
 
 ## 1. Persona
@@ -15,7 +24,9 @@ You have access to the following tools:
 
 {tools}
 
-## 4. Core Instructions & Rules
+"""
+
+_RULES_SECTION = """## 4. Core Instructions & Rules
 You MUST operate in a strict "Reason-Act" cycle to answer the user's question. The cycle is: Thought -> Action -> Observation.
 
 - **Thought**: First, reason about the user's question. Break it down into smaller, searchable steps. Strategize what information you need and how you will get it. Always think step-by-step.
@@ -33,7 +44,9 @@ You MUST operate in a strict "Reason-Act" cycle to answer the user's question. T
     - If you must stop due to the **Handling Failure** rule, your ONLY response MUST be `Final Answer: I don't get what you mean, can you explain it?`
 - **Accuracy**: Always ensure your final answer is factually accurate based on the observations you received. Do NOT fabricate information.
 
-## 5. Examples (Few-Shot Learning)
+"""
+
+_EXAMPLES_SECTION = """## 5. Examples (Few-Shot Learning)
 
 ### Example 1:
 User: where can I find tutoring for my calculus class?
@@ -53,13 +66,19 @@ Observation: Search results show the ASU Events Calendar. Key events listed for
 Thought: I have found a major academic event (career fair) and a major cultural event (Gammage show). This provides a good summary for the user. I can now form a final answer.
 Final Answer: Yes, there are several major events on the Tempe campus next week. The Ira A. Fulton Schools of Engineering is hosting its Fall Career Fair on October 1st and 2nd at the Memorial Union. Additionally, ASU Gammage is showing "Wicked" on Friday, October 3rd. You can find more events listed on the official ASU Events Calendar website.
 
-# [PROMPT START]
+"""
 
-You have access to the following tools:
+_PROMPT_START = """# [PROMPT START]
+
+"""
+
+_TOOLS_REMINDER = """You have access to the following tools:
 
 {tools}
 
-Use the following format:
+"""
+
+_FORMAT_SECTION = """Use the following format:
 
 Question: the input question you must answer
 Thought: you should always think about what to do
@@ -75,4 +94,27 @@ Begin!
 {chat_history}
 Question: {input}
 Thought:{agent_scratchpad}
-"""
\ No newline at end of file
+"""
+
+PROMPT_TEMPLATE = (
+    _SYSTEM_SECTION + _RULES_SECTION + _EXAMPLES_SECTION
+    + _PROMPT_START + _TOOLS_REMINDER + _FORMAT_SECTION
+)
+
+PROMPT_VARIANT = os.getenv("PROMPT_VARIANT", "full")
+PROMPT_FEW_SHOT = os.getenv("PROMPT_FEW_SHOT", "1") == "1"
+
+
+def get_prompt_template(variant: Optional[str] = None, few_shot: Optional[bool] = None) -> str:
+    """Return the agent prompt template for a variant ("full" or "compact")
+
+    Unset arguments default to PROMPT_VARIANT and PROMPT_FEW_SHOT.
+    """
+    variant = PROMPT_VARIANT if variant is None else variant
+    few_shot = PROMPT_FEW_SHOT if few_shot is None else few_shot
+    if variant == "full":
+        return PROMPT_TEMPLATE
+    if variant == "compact":
+        examples = _EXAMPLES_SECTION if few_shot else ""
+        return _SYSTEM_SECTION + _RULES_SECTION + examples + _PROMPT_START + _FORMAT_SECTION
+    raise ValueError(f"Unknown PROMPT_VARIANT: {variant}")
@@ -0,0 +1,63 @@
+"""
+Agent prompt with pre-rendered static text
+
+PROMPT_TEMPLATE is several kilobytes long and the ReAct agent formats it on
+every iteration. PrerenderedPromptTemplate parses the template once: fields
+bound to fixed strings (the tool descriptions and names that
+create_react_agent binds) are folded into the surrounding text the first
+time the prompt is formatted, so each call only joins a few pre-built pieces
+with the per-call values - the question, chat history, agent scratchpad and
+the current date.
+
+The current date is bound as a callable partial and evaluated on every
+format, so long-running workers never reason with a stale date.
+"""
+
+import string
+from typing import Any, List, Optional, Tuple
+
+from langchain_core.prompts import StringPromptTemplate
+from pydantic import PrivateAttr
+
+# (text before the field, field name); the last segment has no field
+Segment = Tuple[str, Optional[str]]
+
+
+class PrerenderedPromptTemplate(StringPromptTemplate):
+    """f-string prompt template that renders its static fields only once"""
+
+    template: str
+
+    _segments: Optional[List[Segment]] = PrivateAttr(default=None)
+
+    @property
+    def _prompt_type(self) -> str:
+        return "prerendered"
+
+    def _compile(self) -> List[Segment]:
+        static = {name: value for name, value in self.partial_variables.items() if isinstance(value, str)}
+        segments: List[Segment] = []
+        text: List[str] = []
+        for literal, field, _, _ in string.Formatter().parse(self.template):
+            text.append(literal)
+            if field is None:
+                continue
+            if field in static:
+                text.append(static[field])
+            else:
+                segments.append(("".join(text), field))
+                text = []
+        segments.append(("".join(text), None))
+        return segments
+
+    def format(self, **kwargs: Any) -> str:
+        # partial() returns a new instance, so compiled segments never go stale
+        if self._segments is None:
+            self._segments = self._compile()
+        values = self._merge_partial_and_user_variables(**kwargs)
+        parts = []
+        for text, field in self._segments:
+            parts.append(text)
+            if field is not None:
+                parts.append(str(values[field]))
+        return "".join(parts)
@@ -0,0 +1,132 @@
+"""
+Agent execution for the ASU Chatbot
+
+The LangChain agent executor is synchronous: a single ReAct loop makes several
+blocking Gemini and Tavily calls. Running it directly inside an async route
+would freeze the event loop for every other request, so agent runs are handed
+to a dedicated, bounded worker pool instead.
+
+Configuration:
+- AGENT_MAX_CONCURRENCY: number of agent runs allowed at the same time (default 8)
+
+The agent itself is built on the first run (or by warm_up_agent) inside the
+pool, so the event loop never blocks on importing or constructing it.
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Optional
+
+from . import llm as _llm_module
+
+if TYPE_CHECKING:
+    # budget.py loads LangChain's agent module; it is imported on first use
+    from .budget import AgentBudget
+
+AGENT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "8"))
+
+# Separate from the default executor so agent runs cannot starve the threads
+# FastAPI uses for sync dependencies and file responses. Created by
+# start_agent_pool (or the first run) and replaced after each shutdown, so the
+# app can be started again in the same process.
+_agent_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def start_agent_pool() -> ThreadPoolExecutor:
+    """Return the agent worker pool, creating it if there is none"""
+    global _agent_pool
+    with _pool_lock:
+        if _agent_pool is None:
+            _agent_pool = ThreadPoolExecutor(max_workers=AGENT_MAX_CONCURRENCY, thread_name_prefix="agent")
+        return _agent_pool
+
+
+class AgentUsageStats:
+    """Running totals of agent runs and their LLM token usage"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.llm_calls = 0
+        self.tool_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.stopped: Dict[str, int] = {}
+
+    def record(self, usage: dict) -> None:
+        with self._lock:
+            self.runs += 1
+            self.llm_calls += len(usage["iterations"])
+            self.tool_calls += usage["tool_calls"]
+            self.input_tokens += usage["input_tokens"]
+            self.output_tokens += usage["output_tokens"]
+            if usage["exhausted"]:
+                self.stopped[usage["exhausted"]] = self.stopped.get(usage["exhausted"], 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "llm_calls": self.llm_calls,
+                "tool_calls": self.tool_calls,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "input_tokens_per_run": round(self.input_tokens / self.runs, 1) if self.runs else 0.0,
+                "stopped_by_budget": dict(self.stopped),
+            }
+
+
+usage_stats = AgentUsageStats()
+
+
+def _invoke(inputs: dict, callbacks: Optional[list], budget: Optional["AgentBudget"], started_at: float) -> dict:
+    from .budget import AgentBudget, run_with_budget
+
+    result = run_with_budget(
+        _llm_module.get_chain(), inputs, budget or AgentBudget.from_env(), callbacks, started_at
+    )
+    usage_stats.record(result["budget_usage"])
+    return result
+
+
+def submit_agent(inputs: dict, callbacks: Optional[list] = None,
+                 budget: Optional["AgentBudget"] = None) -> Future:
+    """Start an agent run on the worker pool and return its future
+
+    The budget (AGENT_* settings by default) deadline includes time spent
+    waiting for a free worker. A run that has started keeps its thread until
+    it ends, even if whoever awaited it has given up.
+    """
+    started_at = time.monotonic()
+    # Carry context variables over to the worker thread, like asyncio.to_thread
+    ctx = contextvars.copy_context()
+    return start_agent_pool().submit(ctx.run, _invoke, inputs, callbacks, budget, started_at)
+
+
+async def run_agent(inputs: dict, callbacks: Optional[list] = None,
+                    budget: Optional["AgentBudget"] = None) -> dict:
+    """Run the agent chain on the worker pool, within budget, and await its result"""
+    return await asyncio.wrap_future(submit_agent(inputs, callbacks, budget))
+
+
+async def warm_up_agent() -> None:
+    """Build the agent ahead of the first chat request"""
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(start_agent_pool(), _llm_module.get_chain)
+
+
+async def shutdown_agent_pool() -> None:
+    """Stop the current pool and wait, off the event loop, for its running runs to finish
+
+    Runs started afterwards get a new pool.
+    """
+    global _agent_pool
+    with _pool_lock:
+        pool, _agent_pool = _agent_pool, None
+    if pool is not None:
+        await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
@@ -0,0 +1,150 @@
+"""
+Search result caching for the agent's web search tool
+
+Many concurrent agents end up issuing the same Tavily queries ("ASU academic
+calendar 2025", ...). SearchCache sits behind the agent's search tool (see
+CachedSearchTool in tools.py) so that:
+- results are cached by normalized query, with a TTL and a size bound
+- identical queries that are already in flight wait for the running call
+  instead of starting another upstream request
+
+Observations are returned unchanged, so the `results`/`url` structure that
+process_result relies on is preserved.
+
+With a shared SHARED_STATE_BACKEND (see app/shared_state.py) successful
+searches are also written to the shared store, and a worker that misses its
+own cache looks there before calling Tavily, so each query is searched once
+per deployment rather than once per worker. The search tool runs on the
+agent's worker threads, so these shared store calls never block the event loop.
+
+Configuration:
+- SEARCH_CACHE_TTL_SECONDS: lifetime of a cached search result (default 900)
+- SEARCH_CACHE_MAX_ENTRIES: search results kept in memory (default 2000)
+"""
+
+import json
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from app.cache import TTLCache
+from app.shared_state import SharedStore, shared_store
+
+_MISSING = object()
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase a query, collapse whitespace and drop surrounding quotes"""
+    return " ".join(query.lower().split()).strip("\"' ")
+
+
+def _is_cacheable(observation: Any) -> bool:
+    # Only successful searches are cached; errors and empty result sets are retried
+    return isinstance(observation, dict) and bool(observation.get("results"))
+
+
+class SearchCache:
+    """TTL/LRU cache of search observations with in-flight request coalescing"""
+
+    def __init__(self, max_entries: int = 2000, ttl_seconds: float = 900,
+                 shared: Optional[SharedStore] = None):
+        self._results = TTLCache(maxsize=max_entries, ttl=ttl_seconds)
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.shared_hits = 0
+
+    def get_or_fetch(self, query: str, fetch: Callable[[str], Any]) -> Any:
+        """Return the cached observation for query, calling fetch at most once per key"""
+        key = normalize_query(query)
+        observation = self._results.get(key, _MISSING)
+        if observation is not _MISSING:
+            return observation
+
+        with self._lock:
+            # A leader may have finished between the cache check and taking the lock
+            observation = self._results.get(key, _MISSING)
+            if observation is not _MISSING:
+                return observation
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            observation = self._load_shared(key)
+            if observation is _MISSING:
+                with self._lock:
+                    self.upstream_calls += 1
+                observation = fetch(query)
+                if _is_cacheable(observation):
+                    self._save_shared(key, observation)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            if _is_cacheable(observation):
+                self._results.set(key, observation)
+            future.set_result(observation)
+            return observation
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _load_shared(self, key: str) -> Any:
+        if self.shared is None:
+            return _MISSING
+        try:
+            value = self.shared.get("search:" + key)
+        except Exception:
+            # The shared store is an optimization: search anyway if it is down
+            logger.exception("Could not read a search result from the shared store")
+            return _MISSING
+        if value is None:
+            return _MISSING
+        with self._lock:
+            self.shared_hits += 1
+        return json.loads(value)
+
+    def _save_shared(self, key: str, observation: Any) -> None:
+        if self.shared is None:
+            return
+        try:
+            # default=str: observations are normally JSON, but tools may return anything
+            self.shared.set("search:" + key, json.dumps(observation, default=str), ttl=self.ttl_seconds)
+        except Exception:
+            logger.exception("Could not write a search result to the shared store")
+
+    def clear(self) -> None:
+        self._results.clear()
+
+    def stats(self) -> dict:
+        results = self._results.stats()
+        with self._lock:
+            return {
+                "size": results["size"],
+                "hits": results["hits"],
+                "upstream_calls": self.upstream_calls,
+                "coalesced": self.coalesced,
+                "shared_hits": self.shared_hits,
+                "in_flight": len(self._inflight),
+            }
+
+
+search_cache = SearchCache(
+    max_entries=int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2000")),
+    ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "900")),
+    shared=shared_store,
+)
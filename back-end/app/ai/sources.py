@@ -0,0 +1,79 @@
+"""
+Source extraction from agent runs
+
+Every search the agent runs returns a handful of results, and later
+iterations often find the same pages again (sometimes with a different
+scheme, a trailing slash or tracking parameters). Sources are therefore
+de-duplicated by canonical URL, ASU pages are listed before other sites,
+and the list is capped.
+
+Configuration:
+- SOURCES_MAX: most sources returned per answer (default 10)
+- SOURCE_SNIPPET_CHARS: longest snippet kept per source (default 200)
+"""
+
+import os
+from typing import Iterable, List, Set
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from .llm_schema import Source
+
+SOURCES_MAX = int(os.getenv("SOURCES_MAX", "10"))
+SOURCE_SNIPPET_CHARS = int(os.getenv("SOURCE_SNIPPET_CHARS", "200"))
+
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid")
+
+
+def canonical_url(url: str) -> str:
+    """Key under which URLs of the same page compare equal"""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = parts.query
+    if query:
+        query = urlencode([(k, v) for k, v in parse_qsl(query, keep_blank_values=True)
+                           if not k.lower().startswith(_TRACKING_PARAMS)])
+    # The scheme and fragment never select a different page
+    return f"{host}{parts.path.rstrip('/')}" + (f"?{query}" if query else "")
+
+
+def is_asu_url(url: str) -> bool:
+    host = urlsplit(url).hostname or ""
+    return host == "asu.edu" or host.endswith(".asu.edu")
+
+
+def _search_results(intermediate_steps: Iterable) -> Iterable[dict]:
+    for step in intermediate_steps:
+        # Each step is a tuple (AgentAction, observation)
+        if len(step) > 1:
+            observation = step[1]
+            # Tavily returns results in a specific format
+            if isinstance(observation, dict) and 'results' in observation:
+                yield from observation['results']
+
+
+def extract_sources(intermediate_steps: Iterable, limit: int = SOURCES_MAX) -> List[Source]:
+    """Unique sources of the searches in an agent run, ASU pages first, at most `limit`"""
+    seen: Set[str] = set()
+    asu: List[Source] = []
+    other: List[Source] = []
+    for search_result in _search_results(intermediate_steps):
+        url = search_result.get('url')
+        if not url:
+            continue
+        key = canonical_url(url)
+        if key in seen:
+            continue
+        seen.add(key)
+        content = search_result.get('content')
+        # Values come straight from the search API, so validation is skipped
+        source = Source.model_construct(
+            url=url,
+            title=search_result.get('title') or None,
+            snippet=content[:SOURCE_SNIPPET_CHARS] if content else None,
+        )
+        (asu if is_asu_url(url) else other).append(source)
+        if len(asu) >= limit:
+            break
+    return (asu + other)[:limit]
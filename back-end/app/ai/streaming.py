@@ -0,0 +1,134 @@
+"""
+Streaming support for agent runs
+
+AgentEventHandler is a LangChain callback handler that turns an agent run
+into a sequence of small events:
+- search_started: the agent called a tool, with the query it used
+- sources_found: a search returned results, with their URLs
+- token: a piece of the final answer, as the model generates it
+
+Events are handed to an `emit` callable; the chat routes forward them to the
+client as Server-Sent Events. Once the client has gone away the route calls
+stop(), and the handler's next callback raises StreamClosed, which ends the
+agent run at its next LLM call, token or tool call instead of paying for the
+rest of an answer nobody reads.
+"""
+
+import json
+from typing import Any, Callable, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode one Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class StreamClosed(Exception):
+    """The client of a streamed answer disconnected"""
+
+
+class AgentEventHandler(BaseCallbackHandler):
+    """Callback handler that emits progress events and final-answer tokens"""
+
+    # Let StreamClosed propagate out of the agent run instead of being logged
+    raise_error = True
+
+    def __init__(self, emit: Callable[[Dict[str, Any]], None]):
+        self.emit = emit
+        self._text = ""
+        self._answering = False
+        self._answer_started = False
+        self._streamed = False
+        self._stopped = False
+
+    def stop(self) -> None:
+        """Make the run's next callback raise StreamClosed"""
+        self._stopped = True
+
+    def _check_stopped(self) -> None:
+        if self._stopped:
+            raise StreamClosed("The client disconnected")
+
+    # Chat models only call the streaming API when a handler exposes these
+    # two hooks (the protocol LangChain uses for astream_events); outputs are
+    # passed through untouched.
+    def tap_output_iter(self, run_id: UUID, output):
+        return output
+
+    def tap_output_aiter(self, run_id: UUID, output):
+        return output
+
+    def on_llm_start(self, serialized, prompts, **kwargs: Any) -> None:
+        self._check_stopped()
+        self._reset()
+
+    def on_chat_model_start(self, serialized, messages, **kwargs: Any) -> None:
+        self._check_stopped()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._text = ""
+        self._answering = False
+        self._answer_started = False
+        self._streamed = False
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self._check_stopped()
+        self._streamed = True
+        if self._answering:
+            self._emit_answer(token)
+            return
+
+        # Buffer until the marker shows up; it may be split across tokens
+        self._text += token
+        index = self._text.find(FINAL_ANSWER_MARKER)
+        if index != -1:
+            self._answering = True
+            self._emit_answer(self._text[index + len(FINAL_ANSWER_MARKER):])
+
+    def _emit_answer(self, text: str) -> None:
+        # The space after the marker may come in a later token than the marker
+        if not self._answer_started:
+            text = text.lstrip()
+        if text:
+            self._answer_started = True
+            self.emit({"event": "token", "text": text})
+
+    def on_llm_end(self, response, **kwargs: Any) -> None:
+        if self._streamed:
+            return
+        # The model did not stream: send the whole final answer as one token
+        text = _generation_text(response)
+        index = text.find(FINAL_ANSWER_MARKER)
+        if index != -1:
+            answer = text[index + len(FINAL_ANSWER_MARKER):].strip()
+            if answer:
+                self.emit({"event": "token", "text": answer})
+
+    def on_agent_action(self, action, **kwargs: Any) -> None:
+        self._check_stopped()
+        self.emit({"event": "search_started", "tool": action.tool, "query": _tool_query(action.tool_input)})
+
+    def on_tool_end(self, output: Any, **kwargs: Any) -> None:
+        if isinstance(output, dict) and "results" in output:
+            urls = [r["url"] for r in output["results"] if r.get("url")]
+            if urls:
+                self.emit({"event": "sources_found", "sources": [{"url": url} for url in urls]})
+
+
+def _generation_text(response) -> str:
+    try:
+        return response.generations[0][0].text
+    except (AttributeError, IndexError):
+        return ""
+
+
+def _tool_query(tool_input: Any) -> Optional[str]:
+    if isinstance(tool_input, dict):
+        return tool_input.get("query")
+    return str(tool_input)
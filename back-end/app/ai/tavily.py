@@ -0,0 +1,90 @@
+"""
+Tavily search behind the upstream call policy
+
+langchain-tavily posts every search with a bare requests.post: a new
+connection (and TLS handshake) per search, no timeout and no retries, and
+offers no way to pass it a session. PooledTavilySearch is the public
+TavilySearch tool (same name, description, arguments and options) that
+sends the search to Tavily's REST API itself, over the shared keep-alive
+session and under the SEARCH_* policy (see upstream.py).
+
+Configuration:
+- TAVILY_BASE_URL: Tavily API endpoint, e.g. a local stub server (default https://api.tavily.com)
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, Optional
+
+from langchain_core.tools import ToolException
+from langchain_tavily import TavilySearch
+from pydantic import SecretStr
+
+from .upstream import UpstreamError, UpstreamPolicy, call_upstream, http_session
+
+SEARCH_POLICY = UpstreamPolicy.from_env("SEARCH", timeout=10)
+TAVILY_API_URL = "https://api.tavily.com"
+
+# Options the agent may pass with a search; as in TavilySearch, a value set
+# on the tool takes precedence
+_INVOCATION_OPTIONS = ("include_domains", "exclude_domains", "search_depth", "include_images", "time_range", "topic")
+# Options only set on the tool
+_TOOL_OPTIONS = ("max_results", "include_answer", "include_raw_content", "include_image_descriptions",
+                 "include_favicon", "country", "auto_parameters", "include_usage")
+
+
+class PooledTavilySearch(TavilySearch):
+    """TavilySearch using pooled connections, timeouts and retries"""
+
+    tavily_api_key: SecretStr
+    api_base_url: Optional[str] = None
+
+    def _search(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        headers = {
+            "Authorization": f"Bearer {self.tavily_api_key.get_secret_value()}",
+            "Content-Type": "application/json",
+            "X-Client-Source": "langchain-tavily",
+        }
+        url = f"{self.api_base_url or TAVILY_API_URL}/search"
+
+        def attempt(timeout: float) -> Dict[str, Any]:
+            response = http_session().post(url, json=params, headers=headers, timeout=timeout)
+            if response.status_code != 200:
+                retry_after = response.headers.get("Retry-After")
+                raise UpstreamError(
+                    response.status_code,
+                    response.text[:200],
+                    retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None,
+                )
+            return response.json()
+
+        return call_upstream("search", attempt, SEARCH_POLICY)
+
+    def _run(self, query: str, run_manager: Optional[Any] = None, **kwargs: Any) -> Dict[str, Any]:
+        params = {
+            **kwargs,
+            **{name: getattr(self, name) or kwargs.get(name) for name in _INVOCATION_OPTIONS},
+            **{name: getattr(self, name) for name in _TOOL_OPTIONS},
+            "query": query,
+        }
+        try:
+            results = self._search({k: v for k, v in params.items() if v is not None})
+        except Exception as e:
+            # Like TavilySearch, failed searches are reported to the agent as results
+            return {"error": e}
+        if not results.get("results"):
+            raise ToolException(
+                f"No search results found for '{query}'. "
+                "Try a broader query, fewer domain filters or a longer time range."
+            )
+        return results
+
+    async def _arun(self, query: str, run_manager: Optional[Any] = None, **kwargs: Any) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._run, query, **kwargs)
+
+
+def create_tavily_search(api_key: str) -> TavilySearch:
+    return PooledTavilySearch(
+        tavily_api_key=api_key,
+        api_base_url=os.getenv("TAVILY_BASE_URL") or None,
+    )
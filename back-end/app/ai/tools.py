@@ -0,0 +1,46 @@
+"""
+LangChain tools used by the agent
+
+Kept apart from search_cache.py so that importing the cache (for example to
+report its statistics) does not load LangChain.
+"""
+
+from typing import Any, Optional, Type
+
+from langchain_core.tools import BaseTool
+from pydantic import BaseModel, Field
+
+from .search_cache import SearchCache
+
+
+class SearchInput(BaseModel):
+    """Input for the cached search tool"""
+    query: str = Field(description="Search query to look up")
+
+
+class CachedSearchTool(BaseTool):
+    """Search tool wrapper that serves repeated queries from a SearchCache"""
+
+    name: str = "tavily_search"
+    description: str = ""
+    args_schema: Type[BaseModel] = SearchInput
+    search: BaseTool
+    cache: SearchCache
+
+    @classmethod
+    def wrap(cls, search: BaseTool, cache: "SearchCache") -> "CachedSearchTool":
+        """Wrap search, keeping its name, description and error handling"""
+        return cls(
+            name=search.name,
+            description=search.description,
+            handle_tool_error=search.handle_tool_error,
+            search=search,
+            cache=cache,
+        )
+
+    def _fetch(self, query: str) -> Any:
+        # Callbacks already see this tool's run; don't report the inner one again
+        return self.search.invoke(query, config={"callbacks": []})
+
+    def _run(self, query: str, run_manager: Optional[Any] = None) -> Any:
+        return self.cache.get_or_fetch(query, self._fetch)
@@ -0,0 +1,121 @@
+"""
+Agent trace recording
+
+A sampled share of agent runs is written to disk with every step: each LLM
+call (the raw Thought/Action text it produced, its timing and tokens) and
+each tool call (input, observation and timing), plus the question, the
+history it was answered with, the final answer and the budget usage. That
+shows whether a slow answer came from the model looping, poor searches or
+waiting on the network, and benchmarks/replay_traces.py re-runs recorded
+traces offline against stubs that play the recorded responses back.
+
+Traces are JSON lines in gzip files, one per process and day
+(traces-YYYYMMDD-<pid>.jsonl.gz, one gzip member per trace so a crash never
+corrupts earlier ones). They are written by a background thread after the
+run, so recording adds no latency to the answer. Traces contain user
+questions and conversation history: keep TRACE_DIR private.
+
+Configuration:
+- TRACE_SAMPLE_RATE: share of agent runs recorded, 0 to 1 (default 0)
+- TRACE_SLOW_SECONDS: also record every run slower than this, 0 to disable (default 0)
+- TRACE_DIR: directory traces are written to (default ./traces)
+"""
+
+import glob
+import gzip
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+TRACE_FORMAT_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+class TraceRecorder:
+    """Decides which agent runs to record and appends their traces to disk"""
+
+    def __init__(self, directory: str, sample_rate: float = 0.0, slow_seconds: float = 0.0):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.recorded = 0
+        self._writer: Optional[ThreadPoolExecutor] = None  # Created by the first recorded trace
+        self._writer_lock = threading.Lock()
+
+    def should_collect(self) -> Optional[bool]:
+        """
+        Whether to collect the steps of the run about to start: None to skip
+        it, True if it is sampled, False if it is only kept when slow
+        """
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return True
+        return False if self.slow_seconds > 0 else None
+
+    def keep(self, sampled: bool, elapsed_seconds: float) -> bool:
+        return sampled or (self.slow_seconds > 0 and elapsed_seconds >= self.slow_seconds)
+
+    def record(self, inputs: dict, steps: List[Dict[str, Any]], output: str, usage: dict,
+               budget: Dict[str, Any]) -> str:
+        """Queue a finished run's trace for writing and return its id"""
+        trace_id = uuid.uuid4().hex
+        trace = {
+            "v": TRACE_FORMAT_VERSION,
+            "id": trace_id,
+            "at": round(time.time(), 3),
+            "question": inputs.get("input", ""),
+            "chat_history": inputs.get("chat_history", ""),
+            "budget": budget,
+            "steps": steps,
+            "output": output,
+            "usage": {key: value for key, value in usage.items() if key != "iterations"},
+        }
+        # default=str: observations are normally JSON, but tools may return anything
+        line = json.dumps(trace, separators=(",", ":"), default=str) + "\n"
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="traces")
+        self._writer.submit(self._write, line)
+        return trace_id
+
+    def _path(self) -> str:
+        return os.path.join(self.directory, f"traces-{datetime.now():%Y%m%d}-{os.getpid()}.jsonl.gz")
+
+    def _write(self, line: str) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with gzip.open(self._path(), "ab") as f:
+                f.write(line.encode())
+            self.recorded += 1  # only the single writer thread updates it
+        except OSError:
+            logger.exception("Could not write agent trace to %s", self.directory)
+
+    def flush(self) -> None:
+        """Wait until the traces queued so far are on disk"""
+        if self._writer is not None:
+            self._writer.submit(lambda: None).result()
+
+
+def read_traces(path: str) -> Iterator[dict]:
+    """Yield the traces in a trace file, or in every trace file of a directory"""
+    paths = sorted(glob.glob(os.path.join(path, "traces-*.jsonl.gz"))) if os.path.isdir(path) else [path]
+    for file_path in paths:
+        with gzip.open(file_path, "rt") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+trace_recorder = TraceRecorder(
+    directory=os.getenv("TRACE_DIR", "traces"),
+    sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0")),
+    slow_seconds=float(os.getenv("TRACE_SLOW_SECONDS", "0")),
+)
@@ -0,0 +1,204 @@
+"""
+Calls to upstream APIs (Gemini, Tavily)
+
+Every agent step waits on an upstream call, so a slow or rate-limited
+upstream directly becomes user-visible latency. call_upstream runs a call
+under an UpstreamPolicy:
+
+- a timeout for each attempt,
+- retries of transient failures (connection errors, timeouts, 429 and 5xx)
+  with exponential backoff and full jitter, honouring Retry-After, so
+  workers hitting a rate limit together do not retry in lockstep,
+- optional hedging: if an attempt has not answered after hedge_after
+  seconds, a second identical request is sent and whichever answers first
+  is used. This trims the latency tail at the cost of some extra calls.
+
+HTTP calls share one pooled requests.Session (http_session), so searches
+reuse open keep-alive connections instead of a TLS handshake per call.
+
+Configuration, per upstream (prefix LLM or SEARCH):
+- <PREFIX>_TIMEOUT_SECONDS: time limit of one attempt (default 30 for LLM, 10 for SEARCH)
+- <PREFIX>_MAX_RETRIES: retries after the first attempt (default 2)
+- <PREFIX>_BACKOFF_SECONDS: base delay before the first retry, doubled per retry (default 0.5)
+- <PREFIX>_BACKOFF_MAX_SECONDS: longest delay between retries (default 8)
+- <PREFIX>_HEDGE_AFTER_SECONDS: send a duplicate request after this long, 0 to disable (default 0)
+- UPSTREAM_POOL_SIZE: keep-alive connections per upstream host (default 16)
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, TypeVar
+
+from app.metrics import observe_since, upstream_seconds
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying: rate limited, or the upstream is having trouble
+RETRYABLE_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", "16"))
+
+# Runs the attempts of hedged calls; the calling (agent worker) thread only
+# waits. Created by the first hedged call
+_hedge_pool: Optional[ThreadPoolExecutor] = None
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class UpstreamError(Exception):
+    """An upstream answered with an error status"""
+
+    def __init__(self, status: int, message: str = "", retry_after: Optional[float] = None):
+        super().__init__(f"Error {status}: {message}" if message else f"Error {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class UpstreamPolicy:
+    """Timeout, retry and hedging settings for calls to one upstream"""
+    timeout: float = 30.0
+    max_retries: int = 2
+    backoff: float = 0.5
+    backoff_max: float = 8.0
+    hedge_after: Optional[float] = None
+
+    @classmethod
+    def from_env(cls, prefix: str, timeout: float = 30.0) -> "UpstreamPolicy":
+        hedge_after = float(os.getenv(f"{prefix}_HEDGE_AFTER_SECONDS", "0"))
+        return cls(
+            timeout=float(os.getenv(f"{prefix}_TIMEOUT_SECONDS", str(timeout))),
+            max_retries=int(os.getenv(f"{prefix}_MAX_RETRIES", "2")),
+            backoff=float(os.getenv(f"{prefix}_BACKOFF_SECONDS", "0.5")),
+            backoff_max=float(os.getenv(f"{prefix}_BACKOFF_MAX_SECONDS", "8")),
+            hedge_after=hedge_after or None,
+        )
+
+    def delay(self, retry: int, error: BaseException) -> float:
+        """Seconds to wait before the given retry (1-based): full jitter, or the upstream's Retry-After"""
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after:
+            return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** (retry - 1)))
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Connection problems, timeouts and retryable statuses (including Google API errors' `code`)"""
+    if isinstance(error, (OSError, TimeoutError)):
+        return True
+    status = getattr(error, "status", None) or getattr(error, "code", None)
+    return isinstance(status, int) and status in RETRYABLE_STATUSES
+
+
+class UpstreamStats:
+    """Counters of upstream calls, per upstream"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def add(self, name: str, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(
+                name, {"calls": 0, "attempts": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "failures": 0}
+            )
+            counts[counter] += amount
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {name: dict(counts) for name, counts in self._counts.items()}
+
+
+upstream_stats = UpstreamStats()
+
+
+def _hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_pool
+    if _hedge_pool is None:
+        with _session_lock:
+            if _hedge_pool is None:
+                _hedge_pool = ThreadPoolExecutor(max_workers=2 * UPSTREAM_POOL_SIZE, thread_name_prefix="upstream")
+    return _hedge_pool
+
+
+def _hedged(name: str, attempt: Callable[[float], T], policy: UpstreamPolicy) -> T:
+    """Run attempt, adding a duplicate if the first is slower than hedge_after; first success wins"""
+    pool = _hedge_executor()
+    primary = pool.submit(attempt, policy.timeout)
+    done, _ = wait([primary], timeout=policy.hedge_after)
+    if done:
+        return primary.result()
+
+    upstream_stats.add(name, "hedges")
+    upstream_stats.add(name, "attempts")
+    hedge = pool.submit(attempt, policy.timeout)
+    pending = {primary, hedge}
+    error: Optional[BaseException] = None
+    deadline = time.monotonic() + policy.timeout
+    while pending:
+        done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    upstream_stats.add(name, "hedge_wins")
+                return future.result()
+            error = future.exception()
+    for future in pending:
+        future.cancel()
+    raise error or TimeoutError(f"{name} did not answer within {policy.timeout} s")
+
+
+def call_upstream(name: str, attempt: Callable[[float], T], policy: UpstreamPolicy,
+                  retryable: Callable[[BaseException], bool] = is_retryable) -> T:
+    """
+    Call attempt(timeout) under policy and return its result
+
+    attempt must apply the timeout it is given to its own I/O, and raise on
+    failure; the last error is re-raised once retries are exhausted.
+    """
+    upstream_stats.add(name, "calls")
+    for retry in range(policy.max_retries + 1):
+        if retry:
+            upstream_stats.add(name, "retries")
+            time.sleep(policy.delay(retry, error))
+        upstream_stats.add(name, "attempts")
+        started = time.perf_counter()
+        try:
+            if policy.hedge_after is not None:
+                result = _hedged(name, attempt, policy)
+            else:
+                result = attempt(policy.timeout)
+        except Exception as e:
+            observe_since(upstream_seconds, started, name, "error")
+            error = e
+            if not retryable(e):
+                break
+        else:
+            observe_since(upstream_seconds, started, name, "ok")
+            return result
+    upstream_stats.add(name, "failures")
+    raise error
+
+
+def http_session():
+    """Return the shared requests.Session with pooled keep-alive connections"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=UPSTREAM_POOL_SIZE, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
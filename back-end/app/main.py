@@ -1,111 +1,214 @@
 from fastapi import FastAPI, Request, HTTPException, status
-from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from jose import JWTError, jwt
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from jose import JWTError
 from app.routes import api_router
-from app.routes.auth import token_blacklist  # Import the token blacklist
+from app.routes.auth import token_cache  # Verified token claims
+from app.revocation import revocation_store  # Logged-out tokens
+from app.shared_state import shared_store  # State shared by the workers
+from app.static_assets import StaticAssets  # React build serving
 from app.db import main as init_db  # Import database initialization
+from app.ai.runner import shutdown_agent_pool, start_agent_pool, usage_stats, warm_up_agent
+from app.ai.admission import admission
+from app.ai.answer_cache import answer_cache
+from app.ai.search_cache import search_cache
+from app.ai.memory import conversation_store
+from app.ai.upstream import upstream_stats
+from app.ai.history import conversation_history  # Write-behind chat history
+from app.ai.traces import trace_recorder  # Sampled agent traces
+from app.metrics import METRICS_TOKEN, auth_seconds, http_request_seconds, http_requests_in_flight, metrics
+from contextlib import asynccontextmanager
+import asyncio
+import hmac
 import os
+import re
+import time
 from pathlib import Path
+from typing import Optional
 
-SECRET_KEY = "LEOISGAY"
-ALGORITHM = "HS256"
+def _unauthorized(detail: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        content={"detail": detail},
+        headers={"WWW-Authenticate": "Bearer"}
+    )
 
-class AuthenticationMiddleware(BaseHTTPMiddleware):
+
+_PATH_PARAM = re.compile(r"{(\w+)(?::\w+)?}")
+
+
+def _route_label(scope: Scope) -> str:
+    """Path template of the matched route, so requests for different IDs share one label"""
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    # Routes of included routers may only know their path below the router's prefix
+    params = scope.get("path_params", {})
+    rendered = _PATH_PARAM.sub(lambda m: str(params.get(m.group(1), m.group(0))), template)
+    path = scope["path"]
+    prefix = path[:-len(rendered)] if rendered and path.endswith(rendered) else ""
+    return prefix + template
+
+
+class AuthenticationMiddleware:
     """
     Middleware to check authentication for protected endpoints
+
+    Implemented as plain ASGI rather than BaseHTTPMiddleware: allowed requests
+    are handed to the app with the original receive/send channels, so there is
+    no per-request task or body wrapping and streaming responses pass through
+    untouched.
     """
-    
-    def __init__(self, app):
-        super().__init__(app)
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
         # Define public endpoints that don't require authentication
-        self.public_endpoints = {
+        self.public_endpoints = frozenset({
             "/",
             "/docs",
-            "/openapi.json", 
+            "/openapi.json",
             "/redoc",
             "/api/auth/login",
             "/api/auth/register",
-            "/api/auth/admin-login"
-        }
+            "/api/auth/admin-login",
+            "/metrics",
+        })
         # Add patterns for static files (React build files)
         self.public_patterns = [
             "/static/",
             "/manifest.json",
-           
         ]
-    
-    async def dispatch(self, request: Request, call_next):
-        # Check if the endpoint is public
-        if request.url.path in self.public_endpoints:
-            return await call_next(request)
-        
-        # Check if it's a static file request
-        for pattern in self.public_patterns:
-            if request.url.path.startswith(pattern):
-                return await call_next(request)
-        
+        # One precompiled prefix match instead of a startswith() loop
+        self._public_prefix = re.compile("|".join(re.escape(p) for p in self.public_patterns)).match
+
+    def is_public(self, path: str) -> bool:
+        return path in self.public_endpoints or self._public_prefix(path) is not None
+
+    async def authenticate(self, scope: Scope) -> Optional[JSONResponse]:
+        """Verify the bearer token and store its claims; return an error response if rejected"""
         # Check for Authorization header
-        authorization = request.headers.get("Authorization")
-        
+        authorization = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value.decode("latin-1")
+                break
+
         if not authorization or not authorization.startswith("Bearer "):
-            return JSONResponse(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                content={"detail": "Authentication required"},
-                headers={"WWW-Authenticate": "Bearer"}
-            )
-        
+            return _unauthorized("Authentication required")
+
         # Extract token
         token = authorization.split(" ")[1] if len(authorization.split(" ")) > 1 else None
-        
+
         if not token:
-            return JSONResponse(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                content={"detail": "Invalid token format"},
-                headers={"WWW-Authenticate": "Bearer"}
-            )
-        
+            return _unauthorized("Invalid token format")
+
         # Validate token
         try:
-            # Check if token is blacklisted
-            if token in token_blacklist:
-                return JSONResponse(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    content={"detail": "Token has been invalidated"},
-                    headers={"WWW-Authenticate": "Bearer"}
-                )
-                
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            email = payload.get("sub")
-            user_id = payload.get("user_id")
-            
-            if not email or not user_id:
-                return JSONResponse(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    content={"detail": "Invalid token payload"},
-                    headers={"WWW-Authenticate": "Bearer"}
-                )
-            
-            # Add user info to request state for use in endpoints
-            request.state.user_email = email
-            request.state.user_id = user_id
-            
+            # Verified once per token; repeat requests are served from the cache
+            payload, jti = token_cache.decode(token)
         except JWTError:
-            return JSONResponse(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                content={"detail": "Invalid or expired token"},
-                headers={"WWW-Authenticate": "Bearer"}
-            )
-        
+            return _unauthorized("Invalid or expired token")
+
+        # Check if token has been revoked by a logout
+        if await revocation_store.is_revoked_async(jti):
+            return _unauthorized("Token has been invalidated")
+
+        email = payload.get("sub")
+        user_id = payload.get("user_id")
+
+        if not email or not user_id:
+            return _unauthorized("Invalid token payload")
+
+        # Add user info to request state for use in endpoints
+        state = scope.setdefault("state", {})
+        state["user_email"] = email
+        state["user_id"] = user_id
+        state["token_claims"] = payload
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if metrics.enabled:
+            await self._call_measured(scope, receive, send)
+            return
+
+        if self.is_public(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        error = await self.authenticate(scope)
+        if error is not None:
+            await error(scope, receive, send)
+            return
+
         # Continue to the endpoint
-        return await call_next(request)
+        await self.app(scope, receive, send)
+
+    async def _call_measured(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """__call__ with request latency, status and auth time recorded"""
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            if self.is_public(scope["path"]):
+                await self.app(scope, receive, send_with_status)
+                return
+
+            error = await self.authenticate(scope)
+            auth_seconds.labels("rejected" if error else "ok").observe(time.perf_counter() - started)
+            if error is not None:
+                await error(scope, receive, send_with_status)
+                return
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            http_request_seconds.labels(scope["method"], _route_label(scope), str(status_code)).observe(
+                time.perf_counter() - started
+            )
+
+# Build the chat agent during startup instead of on the first chat request
+AGENT_WARMUP = os.getenv("AGENT_WARMUP", "0") == "1"
+# app/serve.py initializes the database once before starting its workers
+DB_INIT_ON_STARTUP = os.getenv("DB_INIT_ON_STARTUP", "1") == "1"
+
+
+def _open_resources() -> None:
+    """Blocking startup work, kept out of import so that importing the app does no I/O"""
+    static_assets.load()
+    revocation_store.open()
+    if shared_store is not None:
+        shared_store.open()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Initialize database
+    if DB_INIT_ON_STARTUP:
+        init_db()
+    await asyncio.to_thread(_open_resources)
+    start_agent_pool()
+    if AGENT_WARMUP:
+        await warm_up_agent()
+    yield
+    # Write conversation messages that are still queued
+    await conversation_history.close()
+    await shutdown_agent_pool()
+    # After the agent pool: runs that just finished may have queued a trace
+    trace_recorder.flush()
+    metrics.close()
 
-app = FastAPI()
 
-# Initialize database
-init_db()
+app = FastAPI(lifespan=lifespan)
 
 # Add authentication middleware
 app.add_middleware(AuthenticationMiddleware)
@@ -118,17 +221,92 @@ app.include_router(api_router, prefix="/api")
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 REACT_BUILD_DIR = BASE_DIR / "front-end" / "build"
 
-# Mount static files (CSS, JS, images)
-app.mount("/static", StaticFiles(directory=str(REACT_BUILD_DIR / "static")), name="static")
+# React build index: documents in memory, static files with ETags and precompressed variants.
+# Loaded by the lifespan
+static_assets = StaticAssets(REACT_BUILD_DIR)
+REACT_APP_MISSING = "React app not found. Please run 'npm run build' in the front-end directory."
+
+
+@metrics.collector
+def _component_stats():
+    """Queue depths, cache counters and token totals, read from the components' stats()"""
+    queue = admission.stats()
+    yield "agent_runs_active", "gauge", "Agent runs holding an admission slot", [({}, queue["active"])]
+    yield "agent_runs_queued", "gauge", "Agent runs waiting for an admission slot", [({}, queue["queued"])]
+    yield "agent_runs_admitted_total", "counter", "Agent runs admitted", [({}, queue["admitted"])]
+    yield "agent_runs_rejected_total", "counter", "Agent runs turned away, by reason", [
+        ({"reason": reason}, count) for reason, count in queue["rejected"].items()
+    ]
+
+    answers = answer_cache.stats()
+    searches = search_cache.stats()
+    tokens = token_cache.stats()
+    yield "cache_lookups_total", "counter", "Cache lookups, by cache and result", [
+        ({"cache": "answer", "result": "exact_hit"}, answers["exact_hits"]),
+        ({"cache": "answer", "result": "similar_hit"}, answers["similar_hits"]),
+        ({"cache": "answer", "result": "miss"}, answers["misses"]),
+        ({"cache": "search", "result": "hit"}, searches["hits"]),
+        ({"cache": "search", "result": "coalesced"}, searches["coalesced"]),
+        ({"cache": "search", "result": "shared_hit"}, searches["shared_hits"]),
+        ({"cache": "search", "result": "miss"}, searches["upstream_calls"]),
+        ({"cache": "token", "result": "hit"}, tokens["hits"]),
+        ({"cache": "token", "result": "miss"}, tokens["misses"]),
+    ]
+    conversations = conversation_store.stats()
+    yield "cache_entries", "gauge", "Entries held, by cache", [
+        ({"cache": "answer"}, answers["size"]),
+        ({"cache": "search"}, searches["size"]),
+        ({"cache": "token"}, tokens["size"]),
+        # Conversations in a shared store are not counted per process
+        *([({"cache": "conversation"}, conversations["size"])] if "size" in conversations else []),
+    ]
+    yield "searches_in_flight", "gauge", "Searches waiting on Tavily", [({}, searches["in_flight"])]
+
+    usage = usage_stats.stats()
+    yield "agent_llm_tokens_total", "counter", "LLM tokens of agent runs, by direction", [
+        ({"direction": "input"}, usage["input_tokens"]),
+        ({"direction": "output"}, usage["output_tokens"]),
+    ]
+    yield "upstream_events_total", "counter", "Upstream calls, attempts, retries, hedges and failures", [
+        ({"upstream": name, "event": event}, count)
+        for name, counts in upstream_stats.stats().items() for event, count in counts.items()
+    ]
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    """
+    Prometheus text exposition of this process's metrics
+
+    404 unless METRICS_ENABLED=1 and METRICS_TOKEN is set; scrapes must send
+    the token as a bearer token (see app/metrics.py).
+    """
+    if not metrics.enabled or not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    expected = f"Bearer {METRICS_TOKEN}".encode()
+    if not hmac.compare_digest(request.headers.get("authorization", "").encode(), expected):
+        return _unauthorized("Metrics token required")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_static(path: str, request: Request):
+    response = static_assets.static_response(request, path)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return response
 
 
 @app.get("/manifest.json")
-async def get_manifest():
-    return FileResponse(str(REACT_BUILD_DIR / "manifest.json"))
+async def get_manifest(request: Request):
+    response = static_assets.document_response(request, "manifest.json")
+    if response is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return response
 
 # Catch-all route to serve React app for client-side routing
 @app.get("/{full_path:path}")
-async def serve_react_app(full_path: str):
+async def serve_react_app(full_path: str, request: Request):
     """
     Serve the React app for all routes not handled by API endpoints.
     This enables client-side routing to work properly.
@@ -137,10 +315,8 @@ async def serve_react_app(full_path: str):
     if full_path.startswith("api/"):
         raise HTTPException(status_code=404, detail="API endpoint not found")
     
-    # For all other routes, serve the React index.html
-    index_file = REACT_BUILD_DIR / "index.html"
-    if index_file.exists():
-        return FileResponse(str(index_file))
-    else:
-        raise HTTPException(status_code=404, detail="React app not found. Please run 'npm run build' in the front-end directory.")
-
+    # For all other routes, serve the React index.html from memory
+    response = static_assets.document_response(request, "index.html")
+    if response is None:
+        raise HTTPException(status_code=404, detail=REACT_APP_MISSING)
+    return response
@@ -0,0 +1,188 @@
+"""
+Prometheus metrics
+
+Counters, gauges and histograms (prometheus_client), rendered in the
+Prometheus text format by the /metrics endpoint. Latency is recorded where
+it is spent:
+
+- http_request_seconds / http_requests_in_flight: AuthenticationMiddleware,
+  per route template, method and status; auth_seconds for token checks
+- question_seconds, agent_iterations, agent_tool_calls, process_result_seconds:
+  ask_question_service, per question
+- agent_llm_seconds, agent_tool_seconds: agent callbacks, per ReAct iteration
+- upstream_seconds: every attempt of a Gemini or Tavily call, by outcome
+- db_query_seconds: every SQL statement, by verb
+
+Queue depths, in-flight runs, cache hit counters and token totals already
+exist as stats() of their components; they are read when /metrics is
+scraped (collectors), so they cost nothing on the request path.
+
+With metrics disabled, /metrics answers 404 and every hook is a single
+`metrics.enabled` check: no timers, locks or callback handlers are added.
+
+/metrics only answers scrapes that send `Authorization: Bearer
+<METRICS_TOKEN>` (bearer_token / authorization in the Prometheus scrape
+config); without a METRICS_TOKEN it answers 404 even with metrics enabled,
+so enabling metrics never publishes them by accident.
+
+The metrics are prometheus_client's, rendered in text format 0.0.4. They
+are per process unless PROMETHEUS_MULTIPROC_DIR is set, which
+`app.serve --workers` (more than one, with metrics enabled) does for its
+workers: they then record into files in that directory and every scrape
+reports the histograms and in-flight gauge of all workers. The stats read
+at scrape time still come from the worker that answered the scrape.
+
+Configuration:
+- METRICS_ENABLED: record metrics and serve /metrics (default 0)
+- METRICS_TOKEN: bearer token scrapes of /metrics must send (default unset: /metrics is not served)
+- PROMETHEUS_MULTIPROC_DIR: directory shared by the worker processes' metrics (default unset: per process)
+"""
+
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector, mark_process_dead
+
+# Seconds; from a cached token check up to a slow agent run
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# One sample of a collector: (metric name, type, help, [(labels, value)])
+Sample = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+class _StatsCollector:
+    """prometheus_client collector of the samples returned by MetricsRegistry collectors"""
+
+    def __init__(self, collectors: List[Callable[[], Iterable[Sample]]]):
+        self.collectors = collectors
+
+    def collect(self):
+        for collect in self.collectors:
+            for name, kind, help, samples in collect():
+                labelnames = list(samples[0][0]) if samples else []
+                family_class = CounterMetricFamily if kind == "counter" else GaugeMetricFamily
+                family = family_class(name, help, labels=labelnames)
+                for labels, value in samples:
+                    family.add_metric([str(labels[label]) for label in labelnames], value)
+                yield family
+
+
+class MetricsRegistry:
+    """Metrics of this process (or of all workers, in multiprocess mode), plus collectors read at scrape time"""
+
+    def __init__(self, enabled: bool, multiprocess_dir: Optional[str] = None):
+        self.enabled = enabled
+        self.multiprocess_dir = multiprocess_dir
+        if multiprocess_dir:
+            # prometheus_client writes each metric's file as the metric is created
+            os.makedirs(multiprocess_dir, exist_ok=True)
+        self.registry = CollectorRegistry()
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+        self._stats_registry = CollectorRegistry(auto_describe=False)
+        self._stats_registry.register(_StatsCollector(self._collectors))
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return Counter(name, help, labelnames, registry=self.registry)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        # In multiprocess mode: the sum over the workers that are running
+        return Gauge(name, help, labelnames, registry=self.registry, multiprocess_mode="livesum")
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return Histogram(name, help, labelnames, registry=self.registry, buckets=buckets)
+
+    def collector(self, collect: Callable[[], Iterable[Sample]]) -> Callable[[], Iterable[Sample]]:
+        """Register a function returning samples to read on every scrape"""
+        self._collectors.append(collect)
+        return collect
+
+    def value(self, name: str, labels: Optional[Dict[str, str]] = None) -> float:
+        """Current value of one sample of this process, e.g. "http_request_seconds_count" (0 if not recorded)"""
+        return self.registry.get_sample_value(name, labels or {}) or 0.0
+
+    def render(self) -> str:
+        registry = self.registry
+        if self.multiprocess_dir:
+            registry = CollectorRegistry()
+            MultiProcessCollector(registry, path=self.multiprocess_dir)
+        return (generate_latest(registry) + generate_latest(self._stats_registry)).decode()
+
+    def close(self) -> None:
+        """Drop this process's in-flight gauges from a multiprocess scrape (call when a worker stops)"""
+        if self.multiprocess_dir:
+            mark_process_dead(os.getpid(), self.multiprocess_dir)
+
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+metrics = MetricsRegistry(
+    enabled=os.getenv("METRICS_ENABLED", "0") == "1",
+    multiprocess_dir=os.getenv("PROMETHEUS_MULTIPROC_DIR") or None,
+)
+
+http_request_seconds = metrics.histogram(
+    "http_request_seconds", "Time to answer HTTP requests, to the end of the response body",
+    ("method", "route", "status"),
+)
+http_requests_in_flight = metrics.gauge("http_requests_in_flight", "HTTP requests being answered")
+auth_seconds = metrics.histogram(
+    "auth_seconds", "Time to check the bearer token of a request", ("outcome",),
+    buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01),
+)
+question_seconds = metrics.histogram(
+    "question_seconds", "Time to answer a question, including admission; outcome is cache, agent, rejected or error",
+    ("outcome",),
+)
+agent_iterations = metrics.histogram(
+    "agent_iterations", "LLM calls per answered question", buckets=(1, 2, 3, 4, 5, 6, 8, 10, 15),
+)
+agent_tool_calls = metrics.histogram(
+    "agent_tool_calls", "Searches per answered question", buckets=(0, 1, 2, 3, 4, 5, 6, 8),
+)
+agent_llm_seconds = metrics.histogram("agent_llm_seconds", "Time of each LLM call of an agent run")
+agent_tool_seconds = metrics.histogram("agent_tool_seconds", "Time of each tool call of an agent run", ("tool",))
+process_result_seconds = metrics.histogram(
+    "process_result_seconds", "Time to turn an agent result into an answer with sources",
+    buckets=(0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05),
+)
+upstream_seconds = metrics.histogram(
+    "upstream_seconds", "Time of each attempt of a call to an upstream API", ("upstream", "outcome"),
+)
+db_query_seconds = metrics.histogram(
+    "db_query_seconds", "Time to execute a SQL statement", ("engine", "verb"),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0),
+)
+
+
+def observe_since(histogram: Histogram, started: float, *labels: str) -> None:
+    """Record the time since a perf_counter() start, if metrics are enabled"""
+    if metrics.enabled:
+        (histogram.labels(*labels) if labels else histogram).observe(time.perf_counter() - started)
+
+
+def instrument_engine(engine, name: str) -> None:
+    """Time every statement a SQLAlchemy engine executes (no-op with metrics disabled)"""
+    if not metrics.enabled:
+        return
+    import sqlalchemy as sa
+
+    @sa.event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @sa.event.listens_for(engine, "after_cursor_execute")
+    def _end(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_started"].pop()
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        db_query_seconds.labels(name, verb).observe(time.perf_counter() - started)
+
+    @sa.event.listens_for(engine, "handle_error")
+    def _failed(context):
+        started = context.connection.info.get("metrics_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
@@ -0,0 +1,122 @@
+"""
+Password hashing
+
+Passwords are stored as bcrypt (or, optionally, argon2) hashes. Deliberately
+slow hashing would stall the event loop for every login and registration,
+so the async helpers run it on a small dedicated thread pool; both bcrypt and
+argon2-cffi release the GIL while hashing, so the pool scales with CPU cores.
+
+Accounts created before this stored an unsalted SHA-256 hex digest. Those
+still verify, and verify() reports that they need rehashing, so the login
+route replaces them with a proper hash as soon as the password is known.
+The same happens to hashes made with an outdated scheme or cost.
+
+Configuration:
+- PASSWORD_SCHEME: bcrypt or argon2 (needs the argon2-cffi package) (default bcrypt)
+- PASSWORD_BCRYPT_ROUNDS: bcrypt cost, each step doubles the work (default 12)
+- PASSWORD_ARGON2_TIME_COST / PASSWORD_ARGON2_MEMORY_KIB: argon2 cost (defaults 3 / 65536)
+- PASSWORD_HASH_WORKERS: passwords hashed in parallel (default: number of CPUs)
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import bcrypt
+
+_LEGACY_SHA256 = re.compile(r"[0-9a-f]{64}")
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords, off the event loop when used async"""
+
+    def __init__(self, scheme: str = "bcrypt", bcrypt_rounds: int = 12, argon2_time_cost: int = 3,
+                 argon2_memory_kib: int = 65536, workers: int = 4):
+        if scheme not in ("bcrypt", "argon2"):
+            raise ValueError(f"Unknown password scheme: {scheme}")
+        self.scheme = scheme
+        self.bcrypt_rounds = bcrypt_rounds
+        self._argon2 = None
+        if scheme == "argon2":
+            from argon2 import PasswordHasher as Argon2Hasher
+
+            self._argon2 = Argon2Hasher(time_cost=argon2_time_cost, memory_cost=argon2_memory_kib)
+        self.workers = workers
+        self._pool: Optional[ThreadPoolExecutor] = None  # Created by the first async call
+        self._pool_lock = threading.Lock()
+        # Verified when the email is unknown, so a miss takes as long as a wrong password
+        self._dummy_hash = None
+
+    @staticmethod
+    def _bcrypt_input(password: str) -> bytes:
+        # bcrypt only reads 72 bytes; digest longer passwords so all of them counts
+        encoded = password.encode()
+        if len(encoded) > 72:
+            encoded = base64.b64encode(hashlib.sha256(encoded).digest())
+        return encoded
+
+    def hash(self, password: str) -> str:
+        if self._argon2 is not None:
+            return self._argon2.hash(password)
+        return bcrypt.hashpw(self._bcrypt_input(password), bcrypt.gensalt(self.bcrypt_rounds)).decode()
+
+    def verify(self, password: str, stored_hash: str) -> Tuple[bool, bool]:
+        """Return (matches, needs_rehash) for a stored hash of any supported kind"""
+        if _LEGACY_SHA256.fullmatch(stored_hash):
+            legacy = hashlib.sha256(password.encode()).hexdigest()
+            matches = hmac.compare_digest(legacy, stored_hash)
+            return matches, matches
+
+        if stored_hash.startswith("$argon2"):
+            from argon2 import PasswordHasher as Argon2Hasher
+            from argon2.exceptions import InvalidHashError, VerificationError
+
+            try:
+                (self._argon2 or Argon2Hasher()).verify(stored_hash, password)
+            except (VerificationError, InvalidHashError):
+                return False, False
+            return True, self._argon2 is None or self._argon2.check_needs_rehash(stored_hash)
+
+        try:
+            matches = bcrypt.checkpw(self._bcrypt_input(password), stored_hash.encode())
+        except ValueError:
+            return False, False  # Not a hash this service knows
+        # "$2b$12$...": the cost is the second field
+        outdated = self.scheme != "bcrypt" or int(stored_hash.split("$")[2]) != self.bcrypt_rounds
+        return matches, matches and outdated
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password")
+        return self._pool
+
+    async def hash_async(self, password: str) -> str:
+        return await asyncio.get_running_loop().run_in_executor(self._executor(), self.hash, password)
+
+    async def verify_async(self, password: str, stored_hash: str) -> Tuple[bool, bool]:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor(), self.verify, password, stored_hash
+        )
+
+    async def verify_missing_async(self, password: str) -> None:
+        """Spend the time of a verification for an account that does not exist"""
+        if self._dummy_hash is None:
+            self._dummy_hash = await self.hash_async("not a password")
+        await self.verify_async(password, self._dummy_hash)
+
+
+password_hasher = PasswordHasher(
+    scheme=os.getenv("PASSWORD_SCHEME", "bcrypt"),
+    bcrypt_rounds=int(os.getenv("PASSWORD_BCRYPT_ROUNDS", "12")),
+    argon2_time_cost=int(os.getenv("PASSWORD_ARGON2_TIME_COST", "3")),
+    argon2_memory_kib=int(os.getenv("PASSWORD_ARGON2_MEMORY_KIB", "65536")),
+    workers=int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 4))),
+)
@@ -0,0 +1,270 @@
+"""
+Access token revocation
+
+Logged-out tokens are recorded by token ID (the `jti` claim) together with
+the token's expiry. Once a token has expired it is rejected by signature
+verification anyway, so its revocation entry is purged automatically and
+memory use stays proportional to the tokens that are still live.
+
+Backends (REVOCATION_BACKEND, default SHARED_STATE_BACKEND, see app/shared_state.py):
+- memory: per-process dict with an expiry heap
+- sqlite: the revoked_tokens table in the application database; shared by
+  all workers on one host. Each worker answers lookups from an in-memory copy
+  that it loads when the app starts. Every REVOCATION_REFRESH_SECONDS
+  (default 1) it reads the rows revoked since its last refresh, so a token
+  logged out on another worker is rejected within that interval; tokens
+  logged out on the same worker are rejected at once
+- redis: a Redis server at REDIS_URL, through redis-py; keys expire on
+  their own
+"""
+
+import asyncio
+import hashlib
+import heapq
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Tuple
+
+import sqlalchemy as sa
+
+from app.shared_state import REDIS_URL, SHARED_STATE_BACKEND, create_redis_client
+
+REVOCATION_REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", "1"))
+
+# A refresh also re-reads rows revoked this long before the previous one: a
+# revoke that waited on the database lock commits after its revoked_at, maybe
+# after another worker's refresh had passed it. Longer than busy_timeout
+_REFRESH_OVERLAP_SECONDS = 10.0
+
+
+def token_id(payload: dict, token: str) -> str:
+    """Return the revocation ID of a decoded token"""
+    jti = payload.get("jti")
+    if jti:
+        return jti
+    # Tokens issued before jti was added: use a digest instead of the full token
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class RevocationStore(ABC):
+    """Set of revoked token IDs whose entries expire with the tokens"""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+
+    @abstractmethod
+    def revoke(self, jti: str, expires_at: float) -> None:
+        """Revoke a token until its expiry (a Unix timestamp)"""
+
+    @abstractmethod
+    def is_revoked(self, jti: str) -> bool:
+        """Return True if the token ID was revoked and has not expired yet"""
+
+    async def revoke_async(self, jti: str, expires_at: float) -> None:
+        """revoke() for async callers; backends doing I/O run it off the event loop"""
+        self.revoke(jti, expires_at)
+
+    async def is_revoked_async(self, jti: str) -> bool:
+        """is_revoked() for async callers; backends doing I/O run it off the event loop"""
+        return self.is_revoked(jti)
+
+    def open(self) -> None:
+        """Prepare the backend (tables, first load); called by the app's lifespan, or else on first use"""
+
+    @abstractmethod
+    def purge_expired(self) -> int:
+        """Drop entries of expired tokens and return how many were removed"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of entries currently held"""
+
+
+class MemoryRevocationStore(RevocationStore):
+    """In-process store: O(1) lookups, expired entries purged on each revoke"""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        super().__init__(clock)
+        self._expiry: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        if expires_at <= self.clock():
+            return
+        with self._lock:
+            if self._expiry.get(jti) == expires_at:
+                return
+            self._expiry[jti] = expires_at
+            heapq.heappush(self._heap, (expires_at, jti))
+            self._purge_locked()
+
+    def is_revoked(self, jti: str) -> bool:
+        expires_at = self._expiry.get(jti)
+        return expires_at is not None and expires_at > self.clock()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._purge_locked()
+
+    def _purge_locked(self) -> int:
+        now = self.clock()
+        removed = 0
+        while self._heap and self._heap[0][0] <= now:
+            expires_at, jti = heapq.heappop(self._heap)
+            # Skip stale heap entries of tokens revoked again with a later expiry
+            if self._expiry.get(jti) == expires_at:
+                del self._expiry[jti]
+                removed += 1
+        return removed
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+
+class SQLiteRevocationStore(RevocationStore):
+    """
+    Store backed by the revoked_tokens table, shared across worker processes
+
+    The table is only for persistence and for other workers: lookups are
+    answered from an in-memory MemoryRevocationStore, which is loaded from
+    the table by open() (or the first lookup). Every refresh_interval seconds
+    the rows revoked since the previous refresh are added to it, and expired
+    entries dropped from it.
+    """
+
+    def __init__(self, engine=None, clock: Callable[[], float] = time.time, purge_interval: float = 60,
+                 refresh_interval: float = REVOCATION_REFRESH_SECONDS):
+        super().__init__(clock)
+        from app.db import RevokedToken, db
+
+        self.engine = engine if engine is not None else db
+        self.table = RevokedToken.__table__
+        self._table_ready = False
+        self.purge_interval = purge_interval
+        self.refresh_interval = refresh_interval
+        self._next_purge = 0.0
+        self._next_refresh = 0.0
+        self._refreshed_at: Optional[float] = None
+        self._revoked = MemoryRevocationStore(clock)
+
+    def _ensure_table(self) -> None:
+        if not self._table_ready:
+            self.table.create(self.engine, checkfirst=True)
+            self._table_ready = True
+
+    def open(self) -> None:
+        self.refresh()
+
+    def refresh(self) -> None:
+        """Load tokens revoked since the last refresh, by any worker, into the in-memory copy"""
+        self._ensure_table()
+        now = self.clock()
+        self._next_refresh = now + self.refresh_interval
+        query = sa.select(self.table.c.jti, self.table.c.expires_at).where(self.table.c.expires_at > now)
+        if self._refreshed_at is not None:
+            query = query.where(self.table.c.revoked_at > self._refreshed_at - _REFRESH_OVERLAP_SECONDS)
+        with self.engine.connect() as conn:
+            rows = conn.execute(query).all()
+        self._refreshed_at = now
+        # Entries only ever leave by expiring, which the in-memory copy handles itself
+        for jti, expires_at in rows:
+            self._revoked.revoke(jti, expires_at)
+        self._revoked.purge_expired()
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        if expires_at <= self.clock():
+            return
+        self._revoked.revoke(jti, expires_at)
+        self._ensure_table()
+        with self.engine.begin() as conn:
+            conn.execute(sa.delete(self.table).where(self.table.c.jti == jti))
+            conn.execute(sa.insert(self.table).values(jti=jti, expires_at=expires_at, revoked_at=self.clock()))
+        if self.clock() >= self._next_purge:
+            self.purge_expired()
+
+    def is_revoked(self, jti: str) -> bool:
+        if self.clock() >= self._next_refresh:
+            self.refresh()
+        return self._revoked.is_revoked(jti)
+
+    async def revoke_async(self, jti: str, expires_at: float) -> None:
+        if expires_at <= self.clock():
+            return
+        # Rejected by this worker at once; the table write only informs the others
+        self._revoked.revoke(jti, expires_at)
+        await asyncio.to_thread(self.revoke, jti, expires_at)
+
+    async def is_revoked_async(self, jti: str) -> bool:
+        if self.clock() >= self._next_refresh:
+            # Concurrent requests keep using the current copy while one reloads it
+            self._next_refresh = self.clock() + self.refresh_interval
+            await asyncio.to_thread(self.refresh)
+        return self._revoked.is_revoked(jti)
+
+    def purge_expired(self) -> int:
+        now = self.clock()
+        self._next_purge = now + self.purge_interval
+        self._revoked.purge_expired()
+        self._ensure_table()
+        with self.engine.begin() as conn:
+            result = conn.execute(sa.delete(self.table).where(self.table.c.expires_at <= now))
+        return result.rowcount
+
+    def __len__(self) -> int:
+        self._ensure_table()
+        with self.engine.connect() as conn:
+            return conn.scalar(sa.select(sa.func.count()).select_from(self.table))
+
+
+class RedisRevocationStore(RevocationStore):
+    """Store for any client with redis-py's set(ex=)/exists/scan_iter API"""
+
+    def __init__(self, client, prefix: str = "revoked:", clock: Callable[[], float] = time.time):
+        super().__init__(clock)
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisRevocationStore":
+        # SET EX and EXISTS do the same when repeated, so both may be retried
+        return cls(create_redis_client(url, retries=2))
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        ttl = int(expires_at - self.clock()) + 1
+        if ttl > 1:
+            # Redis drops the key by itself once the token has expired
+            self.client.set(self.prefix + jti, 1, ex=ttl)
+
+    def is_revoked(self, jti: str) -> bool:
+        return bool(self.client.exists(self.prefix + jti))
+
+    async def revoke_async(self, jti: str, expires_at: float) -> None:
+        await asyncio.to_thread(self.revoke, jti, expires_at)
+
+    async def is_revoked_async(self, jti: str) -> bool:
+        return await asyncio.to_thread(self.is_revoked, jti)
+
+    def purge_expired(self) -> int:
+        return 0
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + "*"))
+
+
+def create_revocation_store(backend: Optional[str] = None) -> RevocationStore:
+    """Build the revocation store selected by REVOCATION_BACKEND"""
+    # Logged-out tokens must be rejected by every worker, so follow the shared state by default
+    backend = (backend or os.getenv("REVOCATION_BACKEND", SHARED_STATE_BACKEND)).lower()
+    if backend == "memory":
+        return MemoryRevocationStore()
+    if backend == "sqlite":
+        return SQLiteRevocationStore()
+    if backend == "redis":
+        return RedisRevocationStore.from_url(REDIS_URL)
+    raise ValueError(f"Unknown REVOCATION_BACKEND: {backend}")
+
+
+revocation_store = create_revocation_store()
@@ -1,10 +1,13 @@
-import hashlib, datetime
+import datetime, uuid
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
-from typing import Annotated, Set
+from typing import Annotated
 
 from pydantic import BaseModel, Field
-from app.db import authenticate, User, create_user
+from app.db import authenticate_async, User, create_user_async
+from app.passwords import password_hasher
+from app.revocation import revocation_store
+from app.token_cache import create_token_cache
 from jose import JWTError, jwt
 
 router = APIRouter()
@@ -14,9 +17,8 @@ ALGORITHM = "HS256"
 
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl="login")
 
-# Token blacklist to store invalidated tokens
-# In production, use Redis or database for persistence
-token_blacklist: Set[str] = set()
+# Claims of recently verified tokens, shared with the authentication middleware
+token_cache = create_token_cache(SECRET_KEY, ALGORITHM)
 
 class Token(BaseModel):
     access_token: str
@@ -35,7 +37,8 @@ class LogoutResponse(BaseModel):
     message: str
 
 def create_access_token(email: str, user_id: int, is_admin: bool = False, expires_delta: datetime.timedelta = None):
-    to_encode = {"sub": email, "user_id": user_id, "is_admin": is_admin}
+    # jti identifies the token for revocation without storing the token itself
+    to_encode = {"sub": email, "user_id": user_id, "is_admin": is_admin, "jti": uuid.uuid4().hex}
     if expires_delta:
         expires = datetime.datetime.utcnow() + expires_delta
     else:
@@ -44,28 +47,32 @@ def create_access_token(email: str, user_id: int, is_admin: bool = False, expire
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
   
-async def get_current_user(token: str = Depends(oauth2_bearer)):
-  try:
-      # Check if token is blacklisted
-      if token in token_blacklist:
+async def get_current_user(request: Request, token: str = Depends(oauth2_bearer)):
+  # The authentication middleware has already verified the token
+  payload = getattr(request.state, "token_claims", None)
+  if payload is None:
+      try:
+          payload, jti = token_cache.decode(token)
+      except JWTError:
           raise HTTPException(
               status_code=status.HTTP_401_UNAUTHORIZED,
-              detail="Token has been invalidated",
+              detail="Could not validate credentials",
               headers={"WWW-Authenticate": "Bearer"},
           )
-      
-      payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-      email: str = payload.get("sub")
-      user_id: int = payload.get("user_id")
-      is_admin: bool = payload.get("is_admin", False)
-      
-      if email is None or user_id is None:
+
+      # Check if token has been revoked by a logout
+      if await revocation_store.is_revoked_async(jti):
           raise HTTPException(
               status_code=status.HTTP_401_UNAUTHORIZED,
-              detail="Could not validate credentials",
+              detail="Token has been invalidated",
               headers={"WWW-Authenticate": "Bearer"},
           )
-  except JWTError:
+
+  email: str = payload.get("sub")
+  user_id: int = payload.get("user_id")
+  is_admin: bool = payload.get("is_admin", False)
+
+  if email is None or user_id is None:
       raise HTTPException(
           status_code=status.HTTP_401_UNAUTHORIZED,
           detail="Could not validate credentials",
@@ -73,6 +80,13 @@ async def get_current_user(token: str = Depends(oauth2_bearer)):
       )
   return {"email": email, "user_id": user_id, "is_admin": is_admin}
 
+
+async def require_admin(current_user: dict = Depends(get_current_user)) -> dict:
+    """Dependency for operator endpoints: rejects tokens without the admin claim"""
+    if not current_user.get("is_admin"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
+
 @router.post("/register", response_model=UserResponse)
 async def register_user(user_data: CreateUserRequest):
     """
@@ -81,11 +95,11 @@ async def register_user(user_data: CreateUserRequest):
     - **email**: Email address (must be unique and valid, used as username)
     - **password**: Password (6-100 characters, will be hashed)
     """
-    # Hash the password
-    password_hash = hashlib.sha256(user_data.password.encode()).hexdigest()
+    # Hash the password (bcrypt by default) on the password hashing pool
+    password_hash = await password_hasher.hash_async(user_data.password)
     
     # Create the user using email as both username and email
-    new_user = create_user(
+    new_user = await create_user_async(
         username=user_data.email,  # Use email as username
         email=user_data.email, 
         password_hash=password_hash
@@ -105,11 +119,9 @@ async def register_user(user_data: CreateUserRequest):
 
 @router.post("/login", response_model=Token)
 async def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
-    # Hash the password before authentication
-    password_hash = hashlib.sha256(form_data.password.encode()).hexdigest()
-    
-    # Use email as username - form_data.username will contain the email
-    user = authenticate(form_data.username, password_hash)
+    # Use email as username - form_data.username will contain the email.
+    # The password is verified (and legacy hashes upgraded) off the event loop
+    user = await authenticate_async(form_data.username, form_data.password)
     
     if user:
         token = create_access_token(
@@ -135,7 +147,7 @@ async def logout(request: Request):
     """
     Logout user by invalidating their JWT token
     
-    This endpoint adds the token to a blacklist, preventing its future use.
+    This endpoint revokes the token until it expires, preventing its future use.
     The client should also remove the token from local storage.
     """
     # Get the token from the Authorization header
@@ -157,9 +169,9 @@ async def logout(request: Request):
             headers={"WWW-Authenticate": "Bearer"}
         )
     
-    # Verify token is valid before blacklisting
+    # Verify token is valid before revoking
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload, jti = token_cache.decode(token)
         email = payload.get("sub")
         if not email:
             raise HTTPException(
@@ -174,8 +186,9 @@ async def logout(request: Request):
             headers={"WWW-Authenticate": "Bearer"}
         )
     
-    # Add token to blacklist
-    token_blacklist.add(token)
+    # Revoke the token until it would have expired anyway
+    await revocation_store.revoke_async(jti, payload["exp"])
+    token_cache.discard(token)
     
     return {"message": "Successfully logged out"}
 
@@ -191,11 +204,8 @@ async def admin_login():
     admin_email = "admin@gmail.com"
     admin_password = "admin123"
     
-    # Hash the password
-    password_hash = hashlib.sha256(admin_password.encode()).hexdigest()
-    
     # Authenticate admin
-    user = authenticate(admin_email, password_hash)
+    user = await authenticate_async(admin_email, admin_password)
     
     if not user:
         raise HTTPException(
@@ -1,76 +1,131 @@
 """
 Conversation-based API for handling follow-up questions
 """
-from typing import Dict, List
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
 
 from dotenv import load_dotenv
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 
-from app.ai.llm import chain, process_result
-from app.ai.llm_schema import ChatRequest, ChatResponse, Source
+from app.ai.admission import AdmissionRejected, admission
+from app.ai.answer_cache import ANSWER_CACHE_ENABLED, answer_cache, normalize_question
+from app.ai.llm import process_result
+from app.ai.history import conversation_history
+from app.ai.runner import submit_agent, usage_stats
+from app.ai.search_cache import search_cache
+from app.ai.upstream import upstream_stats
+from app.db import get_conversations_page_async
+from app.routes.auth import require_admin
+from app.metrics import (
+    agent_iterations, agent_tool_calls, metrics, observe_since, process_result_seconds, question_seconds,
+)
+from app.ai.llm_schema import BatchChatRequest, ChatRequest, ChatResponse
 
 # Load environment variables once
 load_dotenv()
 
-router = APIRouter()
-
-
-def _get_conversation_history() -> List[Dict[str, str]]:
-    """Return serialized conversation history from the chain's memory."""
-    history: List[Dict[str, str]] = []
+# Questions of one /ask/batch request answered at the same time; the agent
+# worker pool (AGENT_MAX_CONCURRENCY) still bounds runs across all requests
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
 
-    memory = getattr(chain, "memory", None)
-    chat_memory = getattr(memory, "chat_memory", None) if memory else None
-    messages = getattr(chat_memory, "messages", None) if chat_memory else None
+router = APIRouter()
 
-    if not messages:
-        return history
 
-    for message in messages:
-        role = getattr(message, "type", message.__class__.__name__.replace("Message", "").lower())
-        content = getattr(message, "content", "")
-        if not isinstance(content, str):
-            content = str(content)
-        history.append({
-            "role": role,
-            "content": content,
-        })
+async def _get_conversation_history(user_id, request: ChatRequest) -> Tuple[List[Dict], int]:
+    """Return the requested part of the conversation's serialized history and its cursor."""
+    return await conversation_history.get_serialized(
+        user_id, request.conversation_id, after=request.history_after, limit=request.history_limit
+    )
 
-    return history
+def _error_fields(e: HTTPException) -> dict:
+    """Status (and retry hint) of an error reported inside a streamed response"""
+    fields = {"status": e.status_code}
+    if e.headers and "Retry-After" in e.headers:
+        fields["retry_after"] = int(e.headers["Retry-After"])
+    return fields
 
-async def ask_question_service(request: ChatRequest) -> ChatResponse:
+async def ask_question_service(request: ChatRequest, user_id=None, callbacks: Optional[list] = None,
+                               chat_history: Optional[str] = None) -> ChatResponse:
     """
-    Ask a question to the LLM agent (stateless)
+    Ask a question to the LLM agent
     
     Args:
         request (ChatRequest): The chat request containing question and options
+        user_id: Authenticated user the conversation belongs to
+        callbacks: Optional LangChain callback handlers for the agent run
+        chat_history: History to answer with instead of the conversation's current one
         
     Returns:
         ChatResponse: Structured response with answer and sources
     """
+    started = time.perf_counter()
+    outcome = "error"
     try:
-        # Invoke the chain with user input (LLM has its own memory)
-        result = chain.invoke({
-            "input": request.question
-        })
-        
-        # Process the result to get LLMResponse format
-        processed = process_result(result)
+        if chat_history is None:
+            chat_history = await conversation_history.get_chat_history(user_id, request.conversation_id)
+
+        # Follow-up questions depend on the conversation, so only fresh ones use the cache
+        use_cache = ANSWER_CACHE_ENABLED and not chat_history
+        cached = await answer_cache.lookup_async(request.question) if use_cache else None
+
+        budget_usage = None
+        if cached is not None:
+            answer, sources = cached.answer, cached.sources
+            outcome = "cache"
+        else:
+            # Run the chain on the agent worker pool with this conversation's history,
+            # once admission control has a slot for this user
+            async with admission.admit(user_id) as slot:
+                result = await slot.hold(submit_agent({
+                    "input": request.question,
+                    "chat_history": chat_history,
+                }, callbacks=callbacks))
+
+            # Process the result to get LLMResponse format
+            processing = time.perf_counter()
+            processed = process_result(result)
+            observe_since(process_result_seconds, processing)
+            answer, sources = processed.answer, processed.sources
+            budget_usage = result.get("budget_usage")
+            outcome = "agent"
+            if metrics.enabled and budget_usage:
+                agent_iterations.observe(len(budget_usage["iterations"]))
+                agent_tool_calls.observe(budget_usage["tool_calls"])
+            # Best-effort answers from a run that was cut short are not reused
+            if use_cache and not (budget_usage and budget_usage["exhausted"]):
+                await answer_cache.store_async(request.question, answer, sources)
+
+        await conversation_history.save_turn(
+            user_id, request.conversation_id, request.question, "\n".join(answer)
+        )
         
         # Build response with optional conversation history
         response_data = {
             "question": request.question,
-            "answer": processed.answer,  # List[str]
-            "sources": [Source(url=source.url) for source in processed.sources],  # List[Source]
+            "answer": answer,  # List[str]
+            "sources": sources,  # List[Source], already deduplicated and capped
+            "budget_usage": budget_usage,
         }
         
         if request.include_history:
-            response_data["conversation_history"] = _get_conversation_history()
+            history, cursor = await _get_conversation_history(user_id, request)
+            response_data["conversation_history"] = history
+            response_data["history_cursor"] = cursor
             
         return ChatResponse(**response_data)
-        
+
+    except AdmissionRejected as e:
+        outcome = "rejected"
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
+        outcome = "error"
         raise HTTPException(status_code=500, detail=f"Error processing question: {str(e)}")
+    finally:
+        observe_since(question_seconds, started, outcome)
 
 @router.post("/ask", response_model=ChatResponse)
 async def ask_question(request: ChatRequest, req: Request):
@@ -78,7 +133,10 @@ async def ask_question(request: ChatRequest, req: Request):
     Ask a question to the ASU chatbot
     
     - **question**: The question to ask (required, 1-1000 characters)
+    - **conversation_id**: Conversation to continue (optional, default: "default")
     - **include_history**: Whether to include conversation history (optional, default: True)
+    - **history_after**: Only include messages after this seq, i.e. the previous response's history_cursor (optional)
+    - **history_limit**: Include at most this many of the newest messages (optional)
     
     Note: This endpoint requires authentication. User info is available via req.state.user_email and req.state.user_id
     """
@@ -86,4 +144,236 @@ async def ask_question(request: ChatRequest, req: Request):
     user_email = getattr(req.state, 'user_email', None)
     user_id = getattr(req.state, 'user_id', None)
     
-    return await ask_question_service(request)
\ No newline at end of file
+    return await ask_question_service(request, user_id=user_id)
+
+
+@router.post("/ask/stream")
+async def ask_question_stream(request: ChatRequest, req: Request):
+    """
+    Ask a question and stream the answer as Server-Sent Events
+
+    Takes the same body as /ask. Events, in order:
+    - **search_started**: the agent is searching; carries the query
+    - **sources_found**: a search returned results; carries their URLs
+    - **token**: the next piece of the final answer
+    - **done**: the full result, with the same fields as the /ask response
+    - **error**: the question could not be answered; carries a detail message, the
+      HTTP status /ask would have returned and, when overloaded (429), retry_after
+
+    If the client disconnects, the question is abandoned: the agent run stops at
+    its next step and nothing is added to the conversation.
+    """
+    # Loads LangChain's callback machinery, which only the agent needs
+    from app.ai.streaming import AgentEventHandler, format_sse
+
+    user_id = getattr(req.state, 'user_id', None)
+
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    # Callbacks fire on the agent worker thread; hand events over to the loop
+    handler = AgentEventHandler(lambda event: loop.call_soon_threadsafe(events.put_nowait, event))
+    task = asyncio.create_task(ask_question_service(request, user_id=user_id, callbacks=[handler]))
+    task.add_done_callback(lambda _: events.put_nowait(None))
+
+    def abandon():
+        # The worker thread cannot be interrupted; the handler ends its run instead
+        handler.stop()
+        task.cancel()
+
+    async def watch_disconnect():
+        while (await req.receive())["type"] != "http.disconnect":
+            pass
+        abandon()
+
+    watcher = asyncio.create_task(watch_disconnect())
+
+    async def event_stream():
+        try:
+            saw_token = False
+            while (event := await events.get()) is not None:
+                name = event.pop("event")
+                saw_token = saw_token or name == "token"
+                yield format_sse(name, event)
+
+            if task.cancelled():
+                return
+            try:
+                response = task.result()
+            except HTTPException as e:
+                yield format_sse("error", {"detail": e.detail, **_error_fields(e)})
+                return
+
+            # Cached answers never reach the model, so send them as a single token
+            if not saw_token:
+                yield format_sse("token", {"text": "\n".join(response.answer)})
+            yield format_sse("done", response.model_dump())
+        finally:
+            # Also reached when the server stops sending because the client went away
+            watcher.cancel()
+            if not task.done():
+                abandon()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/ask/batch")
+async def ask_question_batch(batch: BatchChatRequest, req: Request):
+    """
+    Ask several questions at once and stream the answers as they finish
+
+    Takes `{"requests": [...]}` with up to BATCH_MAX_ITEMS bodies of /ask.
+    Questions are answered concurrently, at most BATCH_MAX_CONCURRENCY at a
+    time, each with its conversation's history as it was when the batch
+    started. Repeated questions in the same conversation are answered once.
+
+    The response is newline-delimited JSON, one line per item in completion
+    order: `{"index": i, "response": {...}}` with the /ask response, or
+    `{"index": i, "error": "...", "status": 500}` (429 errors also carry
+    `retry_after` seconds).
+    """
+    user_id = getattr(req.state, 'user_id', None)
+
+    # Items asking the same question in the same conversation share one run
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for index, item in enumerate(batch.requests):
+        groups.setdefault((item.conversation_id, normalize_question(item.question)), []).append(index)
+
+    histories = {}
+    for conversation_id, _ in groups:
+        if conversation_id not in histories:
+            histories[conversation_id] = await conversation_history.get_chat_history(user_id, conversation_id)
+
+    limit = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+
+    async def answer(indexes: List[int]) -> Tuple[List[int], object]:
+        request = batch.requests[indexes[0]]
+        async with limit:
+            try:
+                return indexes, await ask_question_service(
+                    request, user_id=user_id, chat_history=histories[request.conversation_id]
+                )
+            except HTTPException as e:
+                return indexes, e
+
+    tasks = [asyncio.create_task(answer(indexes)) for indexes in groups.values()]
+
+    async def result_lines():
+        try:
+            for finished in asyncio.as_completed(tasks):
+                indexes, result = await finished
+                for index in indexes:
+                    if isinstance(result, HTTPException):
+                        line = {"index": index, "error": result.detail, **_error_fields(result)}
+                    else:
+                        response = result.model_copy(update={"question": batch.requests[index].question})
+                        line = {"index": index, "response": response.model_dump()}
+                    yield json.dumps(line) + "\n"
+        finally:
+            # The client went away: drop the questions that have not started yet
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+
+
+def _parse_conversations_cursor(before: str) -> Tuple[float, Optional[int]]:
+    """Split a `next_before` cursor into updated_at and id; a bare updated_at is also accepted"""
+    updated_at, _, conversation_pk = before.partition(":")
+    try:
+        return float(updated_at), int(conversation_pk) if conversation_pk else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid conversations cursor")
+
+
+@router.get("/conversations")
+async def list_conversations(req: Request, before: Optional[str] = None,
+                             limit: int = Query(20, ge=1, le=100)):
+    """
+    The user's stored conversations, most recently active first
+
+    - **before**: `next_before` of the previous page, to continue from it
+    - **limit**: conversations per page (1-100, default 20)
+    """
+    user_id = getattr(req.state, 'user_id', None)
+    cursor = _parse_conversations_cursor(before) if before is not None else None
+    await conversation_history.flush(user_id)
+    conversations = await get_conversations_page_async(user_id, cursor, limit)
+    last = conversations[-1] if len(conversations) == limit else None
+    return {
+        "conversations": [
+            {"conversation_id": c.conversation_id, "created_at": c.created_at, "updated_at": c.updated_at}
+            for c in conversations
+        ],
+        # Opaque to clients: ids order conversations updated at the same time
+        "next_before": f"{last.updated_at!r}:{last.id}" if last is not None else None,
+    }
+
+
+@router.get("/conversations/{conversation_id}/messages")
+async def list_conversation_messages(conversation_id: str, req: Request, before: Optional[int] = None,
+                                     limit: int = Query(50, ge=1, le=200)):
+    """
+    Stored messages of one of the user's conversations, newest first
+
+    - **before**: `next_before` of the previous page, to continue with older messages
+    - **limit**: messages per page (1-200, default 50)
+    """
+    user_id = getattr(req.state, 'user_id', None)
+    messages = await conversation_history.get_messages_page(user_id, conversation_id, before, limit)
+    return {
+        "messages": [
+            {"seq": m.seq, "role": m.role, "content": m.content, "created_at": m.created_at}
+            for m in messages
+        ],
+        "next_before": messages[-1].seq if len(messages) == limit else None,
+    }
+
+
+@router.get("/cache/stats", dependencies=[Depends(require_admin)])
+async def answer_cache_stats():
+    """
+    Hit/miss counters of the answer and search caches
+
+    Exact hits match a previously asked question after normalization, similar
+    hits match a near-duplicate through the similarity index. Coalesced
+    searches waited for an identical query that was already running.
+
+    Admins only.
+    """
+    return {
+        "enabled": ANSWER_CACHE_ENABLED,
+        **answer_cache.stats(),
+        "search": search_cache.stats(),
+    }
+
+
+@router.get("/admission/stats", dependencies=[Depends(require_admin)])
+async def admission_stats():
+    """
+    Current load of the agent admission queue
+
+    Active and queued runs, how many were admitted or rejected (by reason:
+    queue_full, user_queue_full or wait_timeout), and recent queue wait times.
+
+    Admins only.
+    """
+    return admission.stats()
+
+
+@router.get("/usage/stats", dependencies=[Depends(require_admin)])
+async def agent_usage_stats():
+    """
+    Totals of agent runs since startup
+
+    Counts LLM calls, searches and input/output tokens (estimated from text
+    length when the model reports no usage), and how many runs were stopped
+    by each budget limit. `upstream` counts calls to Gemini (llm) and Tavily
+    (search) with their attempts, retries, hedged duplicates and failures.
+
+    Admins only.
+    """
+    return {**usage_stats.stats(), "upstream": upstream_stats.stats()}
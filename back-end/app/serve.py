@@ -0,0 +1,103 @@
+"""
+Multi-worker launcher
+
+    uv run python -m app.serve --workers 4 --host 0.0.0.0 --port 8000
+    uv run python -m app.serve --workers 4 --gunicorn   # needs the gunicorn package
+
+Each worker is a separate process with its own event loop and agent pool, so
+throughput grows with the number of workers until the CPUs, the database or
+the upstream rate limits run out. Whatever one request leaves for later ones
+(logged-out tokens, conversations, cached answers and searches) goes through
+SHARED_STATE_BACKEND (see app/shared_state.py): with more than one worker it
+must be sqlite (one host) or redis, and the launcher refuses to start with
+the per-process memory backend, which would let a logged-out token keep
+working on the other workers.
+
+The database is initialized once here, before the workers start, rather than
+by every worker racing to create the tables and the admin account. With
+METRICS_ENABLED=1 and several workers, the launcher also gives the workers
+an empty PROMETHEUS_MULTIPROC_DIR (a temporary directory unless it is set),
+so that /metrics reports all of them (see app/metrics.py).
+
+Configuration:
+- WEB_CONCURRENCY: number of workers when --workers is not given (default 1)
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import sys
+import tempfile
+from typing import List, Optional
+
+
+def _check_shared_state(workers: int) -> Optional[str]:
+    """Return why the configured state backends are unsafe with this many workers, if they are"""
+    from app.shared_state import SHARED_STATE_BACKEND
+
+    if workers <= 1:
+        return None
+    if SHARED_STATE_BACKEND == "memory":
+        return "SHARED_STATE_BACKEND=memory keeps state per process; use sqlite or redis with several workers"
+    if os.getenv("REVOCATION_BACKEND", SHARED_STATE_BACKEND).lower() == "memory":
+        return "REVOCATION_BACKEND=memory would only revoke tokens on one worker; use sqlite or redis"
+    return None
+
+
+def _prepare_metrics_dir(workers: int) -> None:
+    """Give the workers an empty directory for multiprocess metrics, if they record metrics"""
+    if workers <= 1 or os.getenv("METRICS_ENABLED", "0") != "1":
+        return
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR") or tempfile.mkdtemp(prefix="asu-metrics-")
+    os.makedirs(path, exist_ok=True)
+    # Files of a previous run (or of this launcher) would be added to the workers' numbers
+    for stale in glob.glob(os.path.join(path, "*.db")):
+        os.remove(stale)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "1")))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--app", default="app.main:app", help="ASGI app to serve (default app.main:app)")
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--gunicorn", action="store_true",
+                        help="run the workers under gunicorn's process manager instead of uvicorn's")
+    args = parser.parse_args(argv)
+
+    problem = _check_shared_state(args.workers)
+    if problem:
+        print(f"app.serve: {problem}", file=sys.stderr)
+        return 2
+
+    from app.db import main as init_db
+
+    init_db()
+    # Inherited by the workers, which then skip initializing the database again
+    os.environ["DB_INIT_ON_STARTUP"] = "0"
+    _prepare_metrics_dir(args.workers)
+
+    if args.gunicorn:
+        gunicorn = shutil.which("gunicorn")
+        if gunicorn is None:
+            print("app.serve: --gunicorn requires the gunicorn package", file=sys.stderr)
+            return 2
+        os.execv(gunicorn, [
+            gunicorn, args.app,
+            "--worker-class", "uvicorn.workers.UvicornWorker",
+            "--workers", str(args.workers),
+            "--bind", f"{args.host}:{args.port}",
+            "--log-level", args.log_level,
+        ])
+
+    import uvicorn
+
+    uvicorn.run(args.app, host=args.host, port=args.port, workers=args.workers, log_level=args.log_level)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,372 @@
+"""
+State shared by the worker processes of one deployment
+
+Run with several workers (see app/serve.py), each process has its own memory,
+so anything a request leaves behind for later requests must live where every
+worker sees it: a logged-out token must be rejected by all of them, and a
+conversation continued on another worker must see its earlier turns. A
+SharedStore is a small key/value store with expiry, counters and capped
+lists, which is all conversations and caches need.
+
+Backends (SHARED_STATE_BACKEND):
+- memory: state stays in each process (default; only correct with one worker)
+- sqlite: the shared_values and shared_list_items tables of the application
+  database; shared by all workers on one host
+- redis: a Redis server at REDIS_URL, for workers on several hosts, through
+  redis-py (create_redis_client); benchmarks/fakes.py has a local stand-in
+  server.
+
+Calls are synchronous (one indexed statement or one round trip), but a
+locked database or a slow server can hold them for seconds, so async code
+never makes them on the event loop: RevocationStore.is_revoked_async,
+ConversationHistory and AnswerCache.lookup_async/store_async run them in a
+worker thread, and the search cache is only used from agent threads.
+
+Configuration:
+- SHARED_STATE_BACKEND: memory, sqlite or redis (default memory)
+- REDIS_URL: server of the redis backend (default redis://localhost:6379/0)
+- SHARED_STATE_PREFIX: prefix of every redis key, to share a server between deployments (default asu:)
+"""
+
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import sqlalchemy as sa
+
+SHARED_STATE_BACKEND = os.getenv("SHARED_STATE_BACKEND", "memory").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+
+class SharedStore(ABC):
+    """Key/value store with per-key expiry, counters and capped lists; TTLs are in seconds"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Return the value of key, or None if it is missing or expired"""
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: Optional[float] = None, only_if_absent: bool = False) -> bool:
+        """Set key, optionally only if it does not exist; return whether it was written"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove key, whether it holds a value, a counter or a list"""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Return True if key holds an unexpired value, counter or list"""
+
+    @abstractmethod
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Atomically add amount to the counter at key (missing counts as 0), refresh its TTL and return it"""
+
+    @abstractmethod
+    def append(self, key: str, values: List[str], max_len: int, ttl: Optional[float] = None) -> None:
+        """Atomically append values to the list at key, keep its last max_len items and refresh its TTL"""
+
+    @abstractmethod
+    def get_list(self, key: str) -> List[str]:
+        """Return the items of the list at key, oldest first"""
+
+    def open(self) -> None:
+        """Create the backend's tables; called by the app's lifespan, or else by the first operation"""
+
+
+class MemorySharedStore(SharedStore):
+    """Process-local store, for a single worker and for tests"""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._data: Dict[str, Tuple[Union[str, int, List[str]], Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _expires_at(self, ttl: Optional[float]) -> Optional[float]:
+        return self.clock() + ttl if ttl is not None else None
+
+    def _live(self, key: str):
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= self.clock():
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._live(key)
+        return None if entry is None else str(entry[0])
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None, only_if_absent: bool = False) -> bool:
+        with self._lock:
+            if only_if_absent and self._live(key) is not None:
+                return False
+            self._data[key] = (value, self._expires_at(ttl))
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def exists(self, key: str) -> bool:
+        with self._lock:
+            return self._live(key) is not None
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        with self._lock:
+            entry = self._live(key)
+            value = (int(entry[0]) if entry is not None else 0) + amount
+            self._data[key] = (value, self._expires_at(ttl))
+            return value
+
+    def append(self, key: str, values: List[str], max_len: int, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            entry = self._live(key)
+            items = (list(entry[0]) if entry is not None else []) + list(values)
+            self._data[key] = (items[-max_len:], self._expires_at(ttl))
+
+    def get_list(self, key: str) -> List[str]:
+        with self._lock:
+            entry = self._live(key)
+            return list(entry[0]) if entry is not None else []
+
+
+class SQLiteSharedStore(SharedStore):
+    """
+    Store in the application database, shared by the workers of one host
+
+    Every operation is a single transaction that starts with a write, so
+    concurrent workers queue on SQLite's write lock (busy_timeout) instead of
+    failing to upgrade a read lock. Lists are rows of shared_list_items; their
+    expiry is kept in shared_values under the list's key.
+    """
+
+    def __init__(self, engine=None, clock: Callable[[], float] = time.time, purge_interval: float = 60):
+        from app.db import SharedListItem, SharedValue, db
+
+        self.engine = engine if engine is not None else db
+        self.values = SharedValue.__table__
+        self.items = SharedListItem.__table__
+        self.clock = clock
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        self._opened = False
+
+    def open(self) -> None:
+        if not self._opened:
+            self.values.create(self.engine, checkfirst=True)
+            self.items.create(self.engine, checkfirst=True)
+            self._opened = True
+
+    def _insert(self):
+        if self.engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        return insert(self.values)
+
+    def _expires_at(self, ttl: Optional[float]) -> Optional[float]:
+        return self.clock() + ttl if ttl is not None else None
+
+    def _live(self, now: float):
+        return sa.or_(self.values.c.expires_at.is_(None), self.values.c.expires_at > now)
+
+    def _maybe_purge(self) -> None:
+        if self.clock() >= self._next_purge:
+            self.purge_expired()
+
+    def get(self, key: str) -> Optional[str]:
+        self.open()
+        with self.engine.connect() as conn:
+            return conn.scalar(
+                sa.select(self.values.c.value).where(self.values.c.key == key, self._live(self.clock()))
+            )
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None, only_if_absent: bool = False) -> bool:
+        self.open()
+        now = self.clock()
+        stmt = self._insert().values(key=key, value=value, expires_at=self._expires_at(ttl))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["key"],
+            set_={"value": stmt.excluded.value, "expires_at": stmt.excluded.expires_at},
+            # NX: only replace a value that has expired
+            where=sa.not_(self._live(now)) if only_if_absent else None,
+        )
+        with self.engine.begin() as conn:
+            written = conn.execute(stmt).rowcount > 0
+        self._maybe_purge()
+        return written
+
+    def delete(self, key: str) -> None:
+        self.open()
+        with self.engine.begin() as conn:
+            conn.execute(sa.delete(self.values).where(self.values.c.key == key))
+            conn.execute(sa.delete(self.items).where(self.items.c.key == key))
+
+    def exists(self, key: str) -> bool:
+        self.open()
+        with self.engine.connect() as conn:
+            return conn.scalar(
+                sa.select(sa.literal(1)).where(self.values.c.key == key, self._live(self.clock()))
+            ) is not None
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        self.open()
+        now = self.clock()
+        current = self.values.c.value
+        stmt = self._insert().values(key=key, value=str(amount), expires_at=self._expires_at(ttl))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["key"],
+            set_={
+                # An expired counter starts again from zero
+                "value": sa.cast(
+                    sa.case((self._live(now), sa.cast(current, sa.Integer) + amount), else_=amount),
+                    sa.String,
+                ),
+                "expires_at": stmt.excluded.expires_at,
+            },
+        ).returning(self.values.c.value)
+        with self.engine.begin() as conn:
+            value = int(conn.execute(stmt).scalar_one())
+        self._maybe_purge()
+        return value
+
+    def append(self, key: str, values: List[str], max_len: int, ttl: Optional[float] = None) -> None:
+        self.open()
+        now = self.clock()
+        marker = self._insert().values(key=key, value="", expires_at=self._expires_at(ttl))
+        marker = marker.on_conflict_do_update(
+            index_elements=["key"], set_={"expires_at": marker.excluded.expires_at},
+        )
+        expired = sa.select(sa.literal(1)).where(self.values.c.key == key, sa.not_(self._live(now)))
+        newest = (
+            sa.select(self.items.c.id).where(self.items.c.key == key)
+            .order_by(self.items.c.id.desc()).limit(max_len)
+        )
+        with self.engine.begin() as conn:
+            # Items of a list that expired belong to an earlier life of the key
+            conn.execute(sa.delete(self.items).where(self.items.c.key == key, expired.exists()))
+            conn.execute(marker)
+            conn.execute(sa.insert(self.items), [{"key": key, "value": value} for value in values])
+            conn.execute(sa.delete(self.items).where(self.items.c.key == key, self.items.c.id.not_in(newest)))
+        self._maybe_purge()
+
+    def get_list(self, key: str) -> List[str]:
+        self.open()
+        now = self.clock()
+        with self.engine.connect() as conn:
+            live = conn.scalar(sa.select(sa.literal(1)).where(self.values.c.key == key, self._live(now)))
+            if not live:
+                return []
+            return list(conn.scalars(
+                sa.select(self.items.c.value).where(self.items.c.key == key).order_by(self.items.c.id)
+            ))
+
+    def purge_expired(self) -> int:
+        """Drop expired values and the items of expired lists; return how many keys were removed"""
+        self.open()
+        now = self.clock()
+        self._next_purge = now + self.purge_interval
+        expired = sa.select(self.values.c.key).where(self.values.c.expires_at <= now)
+        with self.engine.begin() as conn:
+            conn.execute(sa.delete(self.items).where(self.items.c.key.in_(expired)))
+            return conn.execute(sa.delete(self.values).where(self.values.c.expires_at <= now)).rowcount
+
+
+def create_redis_client(url: str = REDIS_URL, retries: int = 0):
+    """
+    redis-py client with its own connection pool, replies decoded to str
+
+    retries: how often a command is sent again, with exponential backoff,
+    after a connection error or timeout. Only safe for commands without side
+    effects or with the same effect when repeated: the server may have applied
+    a command whose reply was lost. Idle connections are checked with PING
+    before they are used; with retries that check reconnects, too.
+    """
+    import redis
+    from redis.backoff import ExponentialBackoff
+    from redis.retry import Retry
+
+    return redis.Redis.from_url(
+        url,
+        decode_responses=True,
+        # RESP2 is spoken by every Redis version and by benchmarks/fakes.py
+        protocol=2,
+        socket_timeout=5,
+        socket_connect_timeout=5,
+        health_check_interval=15,
+        retry=Retry(ExponentialBackoff(cap=1, base=0.05), retries),
+    )
+
+
+class RedisSharedStore(SharedStore):
+    """
+    Store on a Redis-protocol server; expiry is left to the server
+
+    Writes go through `client`, which should not retry: INCRBY and RPUSH
+    applied twice would count or append twice. Reads go through
+    `read_client` (default `client`), which may.
+    """
+
+    def __init__(self, client, prefix: str = "asu:", read_client=None):
+        self.client = client
+        self.read_client = read_client if read_client is not None else client
+        self.prefix = prefix
+
+    @staticmethod
+    def _ttl_ms(ttl: Optional[float]) -> Optional[int]:
+        return max(1, int(ttl * 1000)) if ttl is not None else None
+
+    def get(self, key: str) -> Optional[str]:
+        return self.read_client.get(self.prefix + key)
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None, only_if_absent: bool = False) -> bool:
+        return bool(self.client.set(self.prefix + key, value, px=self._ttl_ms(ttl), nx=only_if_absent))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def exists(self, key: str) -> bool:
+        return bool(self.read_client.exists(self.prefix + key))
+
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        key = self.prefix + key
+        with self.client.pipeline(transaction=True) as pipe:
+            pipe.incrby(key, amount)
+            if ttl is not None:
+                pipe.pexpire(key, self._ttl_ms(ttl))
+            return pipe.execute()[0]
+
+    def append(self, key: str, values: List[str], max_len: int, ttl: Optional[float] = None) -> None:
+        key = self.prefix + key
+        with self.client.pipeline(transaction=True) as pipe:
+            pipe.rpush(key, *values)
+            pipe.ltrim(key, -max_len, -1)
+            if ttl is not None:
+                pipe.pexpire(key, self._ttl_ms(ttl))
+            pipe.execute()
+
+    def get_list(self, key: str) -> List[str]:
+        return self.read_client.lrange(self.prefix + key, 0, -1)
+
+
+def create_shared_store(backend: Optional[str] = None) -> SharedStore:
+    """Build the store selected by SHARED_STATE_BACKEND"""
+    backend = (backend or SHARED_STATE_BACKEND).lower()
+    if backend == "memory":
+        return MemorySharedStore()
+    if backend == "sqlite":
+        return SQLiteSharedStore()
+    if backend == "redis":
+        return RedisSharedStore(
+            create_redis_client(REDIS_URL),
+            prefix=os.getenv("SHARED_STATE_PREFIX", "asu:"),
+            read_client=create_redis_client(REDIS_URL, retries=2),
+        )
+    raise ValueError(f"Unknown SHARED_STATE_BACKEND: {backend}")
+
+
+# None with the memory backend: components then keep their state in-process.
+# Built without I/O; see SharedStore.open
+shared_store: Optional[SharedStore] = None if SHARED_STATE_BACKEND == "memory" else create_shared_store()
@@ -0,0 +1,217 @@
+"""
+Serving of the React production build
+
+The front-end build is immutable once deployed, so StaticAssets indexes it
+once, when the app starts (or on the first request if it was not started):
+- index.html and manifest.json are held in memory, together with gzip (and,
+  if the `brotli` package is installed, brotli) encoded copies
+- every file under build/static gets a strong ETag, a content type and the
+  list of precompressed variants (`main.1a2b3c4d.js.br`, `.gz`) found next
+  to it; run `python -m app.static_assets` after `npm run build` to create
+  them
+- content-hashed file names are served with a one year immutable
+  Cache-Control, everything else has to be revalidated
+
+Conditional requests (If-None-Match) are answered with 304 from the index
+without touching the disk. A missing build is not an error: no assets are
+indexed and requests for them return 404.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import re
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Webpack names built files like main.1a2b3c4d.js or 453.1a2b3c4d.chunk.css
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# Preferred first
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+COMPRESSIBLE_SUFFIXES = {".js", ".css", ".html", ".json", ".map", ".svg", ".txt", ".ico"}
+MIN_COMPRESS_BYTES = 1024
+
+
+def _compress(body: bytes, encoding: str) -> Optional[bytes]:
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body)
+    return None
+
+
+def _etag(digest: str, encoding: Optional[str] = None) -> str:
+    # Every representation needs its own strong validator
+    return f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Return the content codings a client accepts (ignoring q=0 entries)"""
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q=") and q[2:].strip() in ("0", "0.0", "0.00", "0.000"):
+            continue
+        if coding:
+            accepted.add(coding.strip())
+    return accepted
+
+
+@dataclass
+class Asset:
+    """An indexed build file and its precompressed representations"""
+    path: Path
+    media_type: str
+    digest: str
+    cache_control: str
+    # encoding -> file on disk holding that representation
+    variants: Dict[str, Path] = field(default_factory=dict)
+    # In-memory bodies by encoding ("" is the identity body)
+    bodies: Dict[str, bytes] = field(default_factory=dict)
+
+    def choose_encoding(self, accept_encoding: str) -> Optional[str]:
+        accepted = accepted_encodings(accept_encoding)
+        available = self.bodies if self.bodies else self.variants
+        for encoding in ENCODINGS:
+            if encoding in available and (encoding in accepted or "*" in accepted):
+                return encoding
+        return None
+
+
+class StaticAssets:
+    """In-memory index of the React build directory"""
+
+    def __init__(self, build_dir: Path):
+        self.build_dir = Path(build_dir)
+        self.static: Dict[str, Asset] = {}
+        self.documents: Dict[str, Asset] = {}
+        self.loaded = False
+
+    def load(self) -> "StaticAssets":
+        """(Re)index the build directory"""
+        self.static = self._index_static(self.build_dir / "static")
+        self.documents = {}
+        for name in ("index.html", "manifest.json"):
+            asset = self._load_document(self.build_dir / name)
+            if asset is not None:
+                self.documents[name] = asset
+        self.loaded = True
+        return self
+
+    def _index_static(self, static_dir: Path) -> Dict[str, Asset]:
+        index = {}
+        if not static_dir.is_dir():
+            return index
+        for path in sorted(static_dir.rglob("*")):
+            if not path.is_file() or path.suffix in (".gz", ".br"):
+                continue
+            with path.open("rb") as file:
+                digest = hashlib.file_digest(file, "sha256").hexdigest()[:32]
+            cache_control = IMMUTABLE if HASHED_NAME.search(path.name) else REVALIDATE
+            variants = {
+                encoding: path.with_name(path.name + suffix)
+                for encoding, suffix in ENCODINGS.items()
+                if path.with_name(path.name + suffix).is_file()
+            }
+            index[path.relative_to(static_dir).as_posix()] = Asset(
+                path=path,
+                media_type=mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+                digest=digest,
+                cache_control=cache_control,
+                variants=variants,
+            )
+        return index
+
+    def _load_document(self, path: Path) -> Optional[Asset]:
+        if not path.is_file():
+            return None
+        body = path.read_bytes()
+        bodies = {"": body}
+        for encoding in ENCODINGS:
+            encoded = _compress(body, encoding)
+            if encoded is not None and len(encoded) < len(body):
+                bodies[encoding] = encoded
+        return Asset(
+            path=path,
+            media_type=mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+            digest=hashlib.sha256(body).hexdigest()[:32],
+            cache_control=REVALIDATE,
+            bodies=bodies,
+        )
+
+    def static_response(self, request: Request, path: str) -> Optional[Response]:
+        """Response for a file under /static/, or None if it is not in the build"""
+        if not self.loaded:
+            self.load()
+        asset = self.static.get(path)
+        return self._respond(request, asset) if asset is not None else None
+
+    def document_response(self, request: Request, name: str) -> Optional[Response]:
+        """Response for index.html or manifest.json, or None if missing from the build"""
+        if not self.loaded:
+            self.load()
+        asset = self.documents.get(name)
+        return self._respond(request, asset) if asset is not None else None
+
+    def _respond(self, request: Request, asset: Asset) -> Response:
+        encoding = asset.choose_encoding(request.headers.get("accept-encoding", ""))
+        etag = _etag(asset.digest, encoding)
+        headers = {"ETag": etag, "Cache-Control": asset.cache_control, "Vary": "Accept-Encoding"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+
+        if _matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+        if asset.bodies:
+            return Response(asset.bodies[encoding or ""], media_type=asset.media_type, headers=headers)
+        path = asset.variants[encoding] if encoding else asset.path
+        # FileResponse only fills in ETag/Content-Length headers that are not set yet
+        return FileResponse(path, media_type=asset.media_type, headers=headers)
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def precompress(build_dir: Path) -> int:
+    """Write .gz (and .br) variants of compressible build/static files; return the count"""
+    written = 0
+    for path in sorted((Path(build_dir) / "static").rglob("*")):
+        if not path.is_file() or path.suffix not in COMPRESSIBLE_SUFFIXES:
+            continue
+        body = path.read_bytes()
+        if len(body) < MIN_COMPRESS_BYTES:
+            continue
+        for encoding, suffix in ENCODINGS.items():
+            encoded = _compress(body, encoding)
+            if encoded is not None and len(encoded) < len(body):
+                path.with_name(path.name + suffix).write_bytes(encoded)
+                written += 1
+    return written
+
+
+if __name__ == "__main__":
+    build = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).resolve().parent.parent.parent / "front-end" / "build"
+    print(f"Wrote {precompress(build)} precompressed files in {build / 'static'}")
+    if brotli is None:
+        print("Install the 'brotli' package to also write .br files")
@@ -0,0 +1,70 @@
+"""
+Verified access token cache
+
+Clients poll the API with the same bearer token many times per minute, and
+every request used to pay for an HMAC verification (twice on routes using
+get_current_user). VerifiedTokenCache remembers the claims of tokens whose
+signature was already checked, so repeated requests only cost a dictionary
+lookup. Entries are keyed by the full token string, so a cached entry can
+only match a byte-identical, already verified token, and they expire with
+the token's `exp` claim. Revocation is still checked on every request.
+
+Configuration:
+- TOKEN_CACHE_MAX_ENTRIES: verified tokens kept in memory (default 10000)
+"""
+
+import os
+import time
+from typing import Tuple
+
+from jose import JWTError, jwt
+
+from app.cache import TTLCache
+from app.revocation import token_id
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of token -> (claims, revocation ID) for verified tokens"""
+
+    def __init__(self, secret_key: str, algorithm: str, max_entries: int = 10000):
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+        self._tokens = TTLCache(maxsize=max_entries)
+
+    def decode(self, token: str) -> Tuple[dict, str]:
+        """Return the claims and revocation ID of token
+
+        Raises JWTError if the signature is invalid or the token has expired.
+        """
+        entry = self._tokens.get(token)
+        if entry is not None:
+            return entry
+
+        payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        entry = (payload, token_id(payload, token))
+        exp = payload.get("exp")
+        if exp is not None:
+            ttl = exp - time.time()
+            if ttl <= 0:
+                raise JWTError("Signature has expired.")
+            self._tokens.set(token, entry, ttl=ttl)
+        return entry
+
+    def discard(self, token: str) -> None:
+        """Forget token, e.g. once it has been revoked"""
+        self._tokens.pop(token)
+
+    def clear(self) -> None:
+        self._tokens.clear()
+
+    def stats(self) -> dict:
+        return self._tokens.stats()
+
+
+def create_token_cache(secret_key: str, algorithm: str) -> VerifiedTokenCache:
+    """Build the verified token cache sized by TOKEN_CACHE_MAX_ENTRIES"""
+    return VerifiedTokenCache(
+        secret_key,
+        algorithm,
+        max_entries=int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000")),
+    )
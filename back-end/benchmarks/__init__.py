@@ -0,0 +1,9 @@
+"""
+Offline benchmarks for the ASU Chatbot backend
+
+Every benchmark runs against deterministic stand-ins for Gemini and Tavily
+(see fakes.py), so results do not depend on network access or API keys.
+
+Run from the back-end directory, e.g.:
+    uv run python -m benchmarks.bench_ask_concurrency
+"""
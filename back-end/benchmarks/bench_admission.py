@@ -0,0 +1,77 @@
+"""
+Admission control benchmark
+
+One heavy user fires a burst of questions while light users each ask one a
+moment later. Runs take a fixed time and at most --active run at once. With
+a plain FIFO semaphore the light users queue behind the whole burst; with
+the AdmissionController they are interleaved with it round-robin, and
+questions beyond the queue bound are turned away at once with 429.
+
+    uv run python -m benchmarks.bench_admission --burst 40 --light-users 10
+"""
+
+import argparse
+import asyncio
+import time
+
+from .common import percentile
+
+
+async def _scenario(gate, burst: int, light_users: int, run_seconds: float):
+    from app.ai.admission import AdmissionRejected
+
+    latencies = {"heavy": [], "light": []}
+    rejected = 0
+
+    async def ask(user, kind):
+        nonlocal rejected
+        start = time.perf_counter()
+        try:
+            async with gate(user):
+                await asyncio.sleep(run_seconds)
+        except AdmissionRejected:
+            rejected += 1
+            return
+        latencies[kind].append(time.perf_counter() - start)
+
+    tasks = [asyncio.create_task(ask("heavy", "heavy")) for _ in range(burst)]
+    await asyncio.sleep(run_seconds / 2)
+    tasks += [asyncio.create_task(ask(f"light{i}", "light")) for i in range(light_users)]
+    await asyncio.gather(*tasks)
+    return latencies, rejected
+
+
+def main(burst: int, light_users: int, active: int, run_seconds: float, max_queued: int, per_user: int) -> None:
+    from app.ai.admission import AdmissionController
+
+    def fifo():
+        semaphore = asyncio.Semaphore(active)
+        return lambda user: semaphore
+
+    def fair():
+        controller = AdmissionController(max_active=active, max_queued=max_queued,
+                                         max_queued_per_user=per_user, max_wait_seconds=60)
+        return controller.admit
+
+    print(f"{burst} questions from one user, then {light_users} users ask one each; "
+          f"{active} runs at once, {run_seconds * 1000:.0f} ms per run")
+    print(f"{'':18}{'light p50 s':>12}{'light p99 s':>12}{'heavy p99 s':>12}{'rejected':>10}")
+    for label, make_gate in (("FIFO semaphore", fifo), ("fair admission", fair)):
+        async def run():
+            return await _scenario(make_gate(), burst, light_users, run_seconds)
+
+        latencies, rejected = asyncio.run(run())
+        print(f"{label:<18}{percentile(latencies['light'], 50):>12.2f}{percentile(latencies['light'], 99):>12.2f}"
+              f"{percentile(latencies['heavy'], 99):>12.2f}{rejected:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--burst", type=int, default=40)
+    parser.add_argument("--light-users", type=int, default=10)
+    parser.add_argument("--active", type=int, default=4)
+    parser.add_argument("--run-seconds", type=float, default=0.1)
+    parser.add_argument("--max-queued", type=int, default=64)
+    parser.add_argument("--max-queued-per-user", type=int, default=8)
+    args = parser.parse_args()
+    main(args.burst, args.light_users, args.active, args.run_seconds, args.max_queued, args.max_queued_per_user)
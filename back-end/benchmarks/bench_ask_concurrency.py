@@ -0,0 +1,69 @@
+"""
+Concurrent /api/chat/ask benchmark
+
+Fires N concurrent questions at the app (stub LLM, fake search) and compares
+the wall time with a single call. With the agent on its worker pool the batch
+should take about as long as one call, and /api/auth/me should stay fast while
+the agents are running.
+
+    uv run python -m benchmarks.bench_ask_concurrency --requests 8
+"""
+
+import argparse
+import asyncio
+import time
+
+from .common import auth_headers, bench_client, install_stub_agent
+
+
+async def _ask(client, headers, question: str) -> float:
+    start = time.perf_counter()
+    response = await client.post(
+        "/api/chat/ask",
+        json={"question": question, "include_history": False},
+        headers=headers,
+    )
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def _me(client, headers) -> float:
+    start = time.perf_counter()
+    response = await client.get("/api/auth/me", headers=headers)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def main(requests: int, llm_latency: float, search_latency: float, steps: int) -> None:
+    install_stub_agent(llm_latency=llm_latency, search_latency=search_latency, steps=steps)
+    headers = auth_headers()
+
+    async with bench_client() as client:
+        single = await _ask(client, headers, "Where can I find tutoring?")
+
+        start = time.perf_counter()
+        asks = [
+            asyncio.create_task(_ask(client, headers, f"Question number {i}"))
+            for i in range(requests)
+        ]
+        # Probe the event loop while the agents are busy
+        await asyncio.sleep(llm_latency / 2)
+        me_latency = await _me(client, headers)
+        await asyncio.gather(*asks)
+        batch = time.perf_counter() - start
+
+    print(f"single /ask:                 {single * 1000:8.1f} ms")
+    print(f"{requests} concurrent /ask:          {batch * 1000:8.1f} ms")
+    print(f"serial estimate ({requests} x single): {requests * single * 1000:8.1f} ms")
+    print(f"batch / single ratio:        {batch / single:8.2f}")
+    print(f"/me latency under load:      {me_latency * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--search-latency", type=float, default=0.1)
+    parser.add_argument("--steps", type=int, default=1)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.llm_latency, args.search_latency, args.steps))
@@ -0,0 +1,76 @@
+"""
+Per-request authentication cost benchmark
+
+Compares the old path (the token HMAC-verified in the middleware and again
+in get_current_user) with one verification per request through the
+verified token cache, first as a microbenchmark of the auth work alone and
+then as end-to-end polling of /api/auth/me.
+
+    uv run python -m benchmarks.bench_auth --iterations 20000 --requests 2000
+"""
+
+import argparse
+import asyncio
+import time
+
+from .common import auth_headers
+
+
+def _time_per_call(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+async def _poll_me(requests: int, headers: dict) -> float:
+    from .common import bench_client
+
+    async with bench_client() as client:
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = await client.get("/api/auth/me", headers=headers)
+            response.raise_for_status()
+        return requests / (time.perf_counter() - start)
+
+
+def main(iterations: int, requests: int) -> None:
+    from jose import jwt
+
+    from app.cache import TTLCache
+    from app.revocation import revocation_store, token_id
+    from app.routes.auth import ALGORITHM, SECRET_KEY, token_cache
+
+    headers = auth_headers()
+    token = headers["Authorization"].split(" ", 1)[1]
+
+    def legacy_auth():
+        for _ in range(2):  # middleware, then get_current_user
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            revocation_store.is_revoked(token_id(payload, token))
+
+    def cached_auth():
+        payload, jti = token_cache.decode(token)
+        revocation_store.is_revoked(jti)
+
+    legacy = _time_per_call(legacy_auth, iterations)
+    cached = _time_per_call(cached_auth, iterations)
+    print(f"auth work per request ({iterations} iterations)")
+    print(f"  decode twice:  {legacy * 1e6:8.2f} us")
+    print(f"  cached:        {cached * 1e6:8.2f} us  ({legacy / cached:.0f}x faster)")
+
+    cached_rps = asyncio.run(_poll_me(requests, headers))
+    # Disable the cache: every request verifies the signature again
+    token_cache._tokens = TTLCache(maxsize=0)
+    uncached_rps = asyncio.run(_poll_me(requests, headers))
+    print(f"GET /api/auth/me ({requests} sequential requests)")
+    print(f"  without cache: {uncached_rps:8.1f} req/s")
+    print(f"  with cache:    {cached_rps:8.1f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.iterations, args.requests)
@@ -0,0 +1,65 @@
+"""
+Batch question benchmark
+
+Answers the same list of questions (some of them repeated, as in advising
+exports) by looping over /api/chat/ask one call at a time, and with a single
+/api/chat/ask/batch request, and compares wall time, agent runs and upstream
+searches. Answer caching is turned off so every question reaches the agent.
+
+    uv run python -m benchmarks.bench_batch --questions 24 --concurrency 4
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from . import common
+
+TOPICS = ["tutoring", "parking permits", "library hours", "financial aid", "the academic calendar", "campus events"]
+
+
+async def _run(questions: list, concurrency: int) -> None:
+    from app.ai.history import conversation_history
+    from app.ai.runner import usage_stats
+    from app.routes import chat
+
+    chat.ANSWER_CACHE_ENABLED = False
+    chat.BATCH_MAX_CONCURRENCY = concurrency
+    conversation_history.enabled = False
+    headers = common.auth_headers()
+    print(f"{len(questions)} questions ({len(set(questions))} distinct), batch concurrency {concurrency}")
+
+    async with common.bench_client() as client:
+        for label in ("one at a time", "batch"):
+            search = common.install_stub_agent()
+            runs = usage_stats.runs
+            start = time.perf_counter()
+            if label == "batch":
+                body = {"requests": [{"question": q, "conversation_id": "batch"} for q in questions]}
+                response = await client.post("/api/chat/ask/batch", json=body, headers=headers, timeout=None)
+                answered = sum("response" in json.loads(line) for line in response.text.splitlines())
+            else:
+                answered = 0
+                for i, question in enumerate(questions):
+                    # A fresh conversation per question, like the batch items
+                    body = {"question": question, "conversation_id": f"loop-{i}", "include_history": False}
+                    response = await client.post("/api/chat/ask", json=body, headers=headers, timeout=None)
+                    answered += response.status_code == 200
+            elapsed = time.perf_counter() - start
+            print(f"  {label:<14} {elapsed:7.2f} s  {answered:3d} answered  "
+                  f"{usage_stats.runs - runs:3d} agent runs  {search.calls:3d} searches")
+
+
+def main(questions: int, concurrency: int) -> None:
+    workload = [f"What should I know about {TOPICS[i % len(TOPICS)]} at ASU? ({i % (questions // 2 or 1)})"
+                for i in range(questions)]
+    asyncio.run(_run(workload, concurrency))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=24)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    main(args.questions, args.concurrency)
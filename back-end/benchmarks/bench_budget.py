@@ -0,0 +1,44 @@
+"""
+Agent budget benchmark
+
+Runs a "runaway" stub agent that keeps searching for --steps cycles, once
+without limits (as the executor behaved with max_iterations=100 and no
+deadline) and once under the default per-request budget, and reports time,
+LLM calls, searches and tokens for each.
+
+    uv run python -m benchmarks.bench_budget --steps 30
+"""
+
+import argparse
+import math
+import time
+
+from .common import install_stub_agent
+
+
+def main(steps: int, llm_latency: float, search_latency: float) -> None:
+    from app.ai import llm
+    from app.ai.budget import AgentBudget, run_with_budget
+
+    unlimited = AgentBudget(deadline_seconds=math.inf, max_tool_calls=10**6, max_tokens=10**9)
+    inputs = {"input": "What are the ASU library hours?", "chat_history": ""}
+
+    print(f"runaway agent: {steps} search cycles, LLM {llm_latency * 1000:.0f} ms, search {search_latency * 1000:.0f} ms")
+    print(f"{'':>10}{'time':>10}{'searches':>10}{'tokens':>10}  stopped by")
+    for label, budget in (("unlimited", unlimited), ("budget", AgentBudget.from_env())):
+        search = install_stub_agent(llm_latency=llm_latency, search_latency=search_latency, steps=steps,
+                                    budget=budget)
+        start = time.perf_counter()
+        result = run_with_budget(llm.get_chain(), inputs, budget)
+        elapsed = time.perf_counter() - start
+        usage = result["budget_usage"]
+        print(f"{label:>10}{elapsed:>9.2f}s{search.calls:>10}{usage['tokens']:>10}  {usage['exhausted'] or '-'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=30)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--search-latency", type=float, default=0.05)
+    args = parser.parse_args()
+    main(args.steps, args.llm_latency, args.search_latency)
@@ -0,0 +1,83 @@
+"""
+Conversation history persistence benchmark
+
+Saves conversation turns into a scratch SQLite database, once with a
+transaction per turn (what writing inline in the request would cost) and once
+through the batched write-behind queue, then times reloading a conversation's
+window and paging through its messages, which only read the rows returned.
+
+    uv run python -m benchmarks.bench_history --turns 2000
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from . import common  # noqa: F401 - sets the API keys needed to import app
+
+
+async def _run(turns: int, conversations: int, directory: Path) -> None:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from app import db
+    from app.ai.history import ConversationHistory
+    from app.ai.memory import ConversationStore
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{directory / 'history.db'}")
+    db._configure_sqlite(engine.sync_engine)
+    async with engine.begin() as connection:
+        await connection.run_sync(db.Base.metadata.create_all)
+    db.async_db, db.AsyncSession = engine, async_sessionmaker(engine, expire_on_commit=False)
+
+    def turn(i):
+        return [
+            {"user_id": 1 + i % conversations, "conversation_id": "default", "role": role,
+             "content": f"{role} message {i} " * 20, "created_at": time.time()}
+            for role in ("human", "ai")
+        ]
+
+    start = time.perf_counter()
+    for i in range(turns):
+        await db.save_messages_async(turn(i))
+    inline = time.perf_counter() - start
+
+    history = ConversationHistory(ConversationStore())
+    start = time.perf_counter()
+    for i in range(turns):
+        await history.save_turn(1 + i % conversations, "default", f"question {i} " * 20, f"answer {i} " * 20)
+    queued = time.perf_counter() - start
+    await history.close()
+    batched = time.perf_counter() - start
+
+    print(f"{turns} turns over {conversations} conversations")
+    print(f"  transaction per turn   {inline * 1e3 / turns:8.3f} ms/turn in the request")
+    print(f"  write-behind batches   {queued * 1e3 / turns:8.3f} ms/turn in the request, "
+          f"{batched * 1e3 / turns:.3f} ms/turn including the writes")
+
+    reads = 200
+    start = time.perf_counter()
+    for i in range(reads):
+        await db.load_recent_messages_async(1 + i % conversations, "default", 10)
+    window = (time.perf_counter() - start) / reads
+    start = time.perf_counter()
+    for i in range(reads):
+        await db.get_messages_page_async(1 + i % conversations, "default", limit=50)
+    page = (time.perf_counter() - start) / reads
+    print(f"  resume window (10 msgs) {window * 1e3:7.3f} ms")
+    print(f"  history page (50 msgs)  {page * 1e3:7.3f} ms")
+    await engine.dispose()
+
+
+def main(turns: int, conversations: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(_run(turns, conversations, Path(directory)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--conversations", type=int, default=50)
+    args = parser.parse_args()
+    main(args.turns, args.conversations)
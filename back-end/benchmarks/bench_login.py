@@ -0,0 +1,99 @@
+"""
+Login throughput benchmark
+
+Registers a set of users in a throwaway SQLite database and then drives
+/api/auth/login at a fixed concurrency, reporting requests per second and
+latency percentiles. `--legacy` swaps in the old synchronous database call
+(run directly on the event loop) for comparison, and `--query-latency` adds
+a delay to every statement to model a slower disk or a remote Postgres.
+
+    uv run python -m benchmarks.bench_login --requests 500 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from .common import percentile
+
+
+def _add_query_latency(engine, seconds: float) -> None:
+    """Sleep inside every SQLite statement, on the thread that executes it"""
+    import sqlalchemy as sa
+
+    @sa.event.listens_for(engine, "connect")
+    def _slow_statements(dbapi_connection, _):
+        raw = getattr(dbapi_connection, "driver_connection", dbapi_connection)
+        # aiosqlite wraps the sqlite3 connection and drives it from its own thread
+        raw = getattr(raw, "_conn", raw)
+        raw.set_trace_callback(lambda _: time.sleep(seconds))
+
+
+async def _drive(client, total: int, concurrency: int, users: int):
+    latencies = []
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i % users)
+
+    async def worker():
+        while not queue.empty():
+            user = queue.get_nowait()
+            start = time.perf_counter()
+            response = await client.post(
+                "/api/auth/login",
+                data={"username": f"user{user}@example.com", "password": "password123"},
+            )
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+
+async def main(requests: int, concurrency: int, users: int, legacy: bool, query_latency: float) -> None:
+    from .common import bench_client
+    from app.db import Base, async_db, authenticate, db, create_admin_account
+    import app.routes.auth as auth_routes
+
+    Base.metadata.create_all(db)
+    create_admin_account()
+
+    if query_latency:
+        for engine in (db, async_db.sync_engine):
+            _add_query_latency(engine, query_latency)
+        db.dispose()
+
+    if legacy:
+        async def blocking_authenticate(email, password):
+            return authenticate(email, password)
+        auth_routes.authenticate_async = blocking_authenticate
+
+    async with bench_client() as client:
+        for i in range(users):
+            await client.post("/api/auth/register", json={"email": f"user{i}@example.com", "password": "password123"})
+
+        elapsed, latencies = await _drive(client, requests, concurrency, users)
+
+    mode = "legacy sync" if legacy else "async pool"
+    print(f"{mode}: {requests} logins, concurrency {concurrency}, query latency {query_latency * 1000:.0f} ms")
+    print(f"  throughput: {requests / elapsed:8.1f} req/s")
+    print(f"  p50:        {percentile(latencies, 50) * 1000:8.2f} ms")
+    print(f"  p99:        {percentile(latencies, 99) * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--legacy", action="store_true", help="use the synchronous database call")
+    parser.add_argument("--query-latency", type=float, default=0.0, help="seconds added to each statement")
+    args = parser.parse_args()
+
+    # Keep benchmark users out of the real database
+    workdir = tempfile.mkdtemp(prefix="bench-login-")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    asyncio.run(main(args.requests, args.concurrency, args.users, args.legacy, args.query_latency))
@@ -0,0 +1,56 @@
+"""
+Logout storm benchmark
+
+Revokes a steady stream of short-lived tokens and samples the revocation
+store's size and memory over time. Because entries are purged once their
+token expires, both should level off at (logout rate x token lifetime)
+instead of growing with the total number of logouts, as the old
+`token_blacklist` set of full token strings did.
+
+    uv run python -m benchmarks.bench_logout_storm --seconds 5 --rate 20000
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from .common import auth_headers
+
+
+def main(seconds: float, rate: int, lifetime: float) -> None:
+    from app.revocation import MemoryRevocationStore
+
+    # A real token, to size the legacy set of full token strings
+    token_bytes = len(auth_headers()["Authorization"].split(" ", 1)[1])
+
+    store = MemoryRevocationStore()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+
+    print(f"{rate} logouts/s, tokens expire after {lifetime:.1f}s")
+    print(f"{'t (s)':>6}{'logouts':>10}{'entries':>10}{'store KiB':>11}{'legacy set KiB':>16}")
+    start = time.time()
+    total = 0
+    next_report = 0.0
+    while (elapsed := time.time() - start) < seconds:
+        batch_end = time.time() + 0.1
+        for _ in range(rate // 10):
+            total += 1
+            store.revoke(f"{total:032x}", time.time() + lifetime)
+        if elapsed >= next_report:
+            used = (tracemalloc.get_traced_memory()[0] - baseline) / 1024
+            legacy = total * (token_bytes + 49) / 1024  # str payload + object header
+            print(f"{elapsed:>6.1f}{total:>10}{len(store):>10}{used:>11.0f}{legacy:>16.0f}")
+            next_report += 0.5
+        time.sleep(max(0.0, batch_end - time.time()))
+
+    tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--rate", type=int, default=20000)
+    parser.add_argument("--lifetime", type=float, default=1.0)
+    args = parser.parse_args()
+    main(args.seconds, args.rate, args.lifetime)
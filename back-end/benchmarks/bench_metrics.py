@@ -0,0 +1,93 @@
+"""
+Metrics overhead benchmark
+
+Measures what instrumentation costs on the request path: requests per second
+through AuthenticationMiddleware in front of a minimal app, and questions
+per second through /api/chat/ask with the stub agent (no latency, cache
+off), with METRICS_ENABLED off and on, alternating the two and reporting
+medians. Also times one /metrics scrape.
+
+    uv run python -m benchmarks.bench_metrics --requests 3000 --questions 200 --rounds 5
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+
+from .common import auth_headers, bench_client, install_stub_agent
+
+
+async def _rps(client, path: str, requests: int, **kwargs) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = await client.request(url=path, **kwargs)
+        response.raise_for_status()
+    return requests / (time.perf_counter() - start)
+
+
+def _ping_app() -> FastAPI:
+    from app.main import AuthenticationMiddleware
+
+    app = FastAPI()
+    app.add_middleware(AuthenticationMiddleware)
+
+    @app.get("/api/ping")
+    async def ping(request: Request):
+        return {"user_id": request.state.user_id}
+
+    return app
+
+
+async def main(requests: int, questions: int, rounds: int) -> None:
+    from app import main as main_module
+    from app.ai.history import conversation_history
+    from app.metrics import metrics
+    from app.routes import chat
+
+    chat.ANSWER_CACHE_ENABLED = False
+    conversation_history.enabled = False
+    install_stub_agent(llm_latency=0, search_latency=0)
+    headers = auth_headers()
+    transport = httpx.ASGITransport(app=_ping_app())
+
+    results = {False: [], True: []}
+    # Alternate the modes so drift (CPU frequency, GC) affects both alike
+    for round_ in range(rounds + 1):
+        for enabled in (False, True):
+            metrics.enabled = enabled
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+                ping = await _rps(client, "/api/ping", requests, method="GET", headers=headers)
+            async with bench_client() as client:
+                ask = await _rps(client, "/api/chat/ask", questions, method="POST", headers=headers,
+                                 json={"question": "Where is the library?", "include_history": False})
+            if round_:  # the first round warms up imports and caches
+                results[enabled].append((ping, ask))
+
+    print(f"median of {rounds} rounds")
+    print(f"{'':>12}{'ping req/s':>14}{'ask req/s':>12}")
+    medians = {}
+    for enabled, samples in results.items():
+        medians[enabled] = [statistics.median(column) for column in zip(*samples)]
+        ping, ask = medians[enabled]
+        print(f"{'metrics on' if enabled else 'metrics off':>12}{ping:>14.0f}{ask:>12.1f}")
+    off, on = medians[False], medians[True]
+    print(f"{'overhead':>12}{(1 - on[0] / off[0]) * 100:>13.1f}%{(1 - on[1] / off[1]) * 100:>11.1f}%")
+
+    main_module.METRICS_TOKEN = "benchmark"
+    async with bench_client() as client:
+        start = time.perf_counter()
+        body = (await client.get("/metrics", headers={"Authorization": "Bearer benchmark"})).text
+        print(f"/metrics scrape: {(time.perf_counter() - start) * 1000:.1f} ms, {len(body.splitlines())} lines")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.questions, args.rounds))
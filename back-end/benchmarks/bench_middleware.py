@@ -0,0 +1,169 @@
+"""
+Authentication middleware benchmark
+
+Measures requests per second through the pure ASGI AuthenticationMiddleware
+and through a copy of the previous BaseHTTPMiddleware implementation, in
+front of the same minimal app, for a protected route, a public route and a
+rejected (unauthenticated) request.
+
+    uv run python -m benchmarks.bench_middleware --requests 5000
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+from jose import JWTError
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from .common import auth_headers  # sets the API keys needed to import app
+
+from app.revocation import revocation_store
+from app.routes.auth import token_cache
+
+
+class LegacyAuthenticationMiddleware(BaseHTTPMiddleware):
+    """
+    The BaseHTTPMiddleware implementation this benchmark compares against
+    """
+    
+    def __init__(self, app):
+        super().__init__(app)
+        # Define public endpoints that don't require authentication
+        self.public_endpoints = {
+            "/",
+            "/docs",
+            "/openapi.json", 
+            "/redoc",
+            "/api/auth/login",
+            "/api/auth/register",
+            "/api/auth/admin-login"
+        }
+        # Add patterns for static files (React build files)
+        self.public_patterns = [
+            "/static/",
+            "/manifest.json",
+           
+        ]
+    
+    async def dispatch(self, request: Request, call_next):
+        # Check if the endpoint is public
+        if request.url.path in self.public_endpoints:
+            return await call_next(request)
+        
+        # Check if it's a static file request
+        for pattern in self.public_patterns:
+            if request.url.path.startswith(pattern):
+                return await call_next(request)
+        
+        # Check for Authorization header
+        authorization = request.headers.get("Authorization")
+        
+        if not authorization or not authorization.startswith("Bearer "):
+            return JSONResponse(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                content={"detail": "Authentication required"},
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+        
+        # Extract token
+        token = authorization.split(" ")[1] if len(authorization.split(" ")) > 1 else None
+        
+        if not token:
+            return JSONResponse(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                content={"detail": "Invalid token format"},
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+        
+        # Validate token
+        try:
+            # Verified once per token; repeat requests are served from the cache
+            payload, jti = token_cache.decode(token)
+
+            # Check if token has been revoked by a logout
+            if revocation_store.is_revoked(jti):
+                return JSONResponse(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    content={"detail": "Token has been invalidated"},
+                    headers={"WWW-Authenticate": "Bearer"}
+                )
+            email = payload.get("sub")
+            user_id = payload.get("user_id")
+            
+            if not email or not user_id:
+                return JSONResponse(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    content={"detail": "Invalid token payload"},
+                    headers={"WWW-Authenticate": "Bearer"}
+                )
+            
+            # Add user info to request state for use in endpoints
+            request.state.user_email = email
+            request.state.user_id = user_id
+            request.state.token_claims = payload
+            
+        except JWTError:
+            return JSONResponse(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                content={"detail": "Invalid or expired token"},
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+        
+        # Continue to the endpoint
+        return await call_next(request)
+
+
+def _build_app(middleware) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(middleware)
+
+    @app.get("/api/ping")
+    async def ping(request: Request):
+        return {"user_id": request.state.user_id}
+
+    @app.get("/api/auth/login")
+    async def public():
+        return {"ok": True}
+
+    return app
+
+
+async def _rps(app, path: str, headers: dict, requests: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        start = time.perf_counter()
+        for _ in range(requests):
+            await client.get(path, headers=headers)
+        return requests / (time.perf_counter() - start)
+
+
+async def main(requests: int) -> None:
+    from app.main import AuthenticationMiddleware
+
+    headers = auth_headers()
+    cases = [
+        ("protected", "/api/ping", headers),
+        ("public", "/api/auth/login", {}),
+        ("rejected", "/api/ping", {}),
+    ]
+    apps = {
+        "BaseHTTPMiddleware": _build_app(LegacyAuthenticationMiddleware),
+        "pure ASGI": _build_app(AuthenticationMiddleware),
+    }
+
+    print(f"{'':>12}" + "".join(f"{name:>20}" for name in apps) + f"{'speedup':>10}")
+    for label, path, case_headers in cases:
+        results = [await _rps(app, path, case_headers, requests) for app in apps.values()]
+        row = "".join(f"{rps:>14.0f} req/s" for rps in results)
+        print(f"{label:>12}{row}{results[1] / results[0]:>9.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,103 @@
+"""
+Password hashing cost benchmark
+
+Registers users in a throwaway SQLite database at each bcrypt cost and drives
+/api/auth/login at a fixed concurrency, reporting logins per second, p99
+latency, and the longest the event loop went without running (which is what
+every other request, including chat streams, would wait). `--inline` runs
+the hashing on the event loop instead of the hashing pool, for comparison.
+
+    uv run python -m benchmarks.bench_passwords --rounds 4 8 10 12 --requests 100
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from .common import percentile
+
+
+async def _loop_stall(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """Longest gap between ticks of a task that wants to run every `interval`"""
+    worst = 0.0
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(interval)
+        now = time.perf_counter()
+        worst = max(worst, now - last - interval)
+        last = now
+    return worst
+
+
+async def _logins(client, emails, total: int, concurrency: int):
+    latencies = []
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(emails[i % len(emails)])
+
+    async def worker():
+        while not queue.empty():
+            email = queue.get_nowait()
+            start = time.perf_counter()
+            response = await client.post("/api/auth/login", data={"username": email, "password": "password123"})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+
+async def main(rounds: list, requests: int, concurrency: int, users: int, inline: bool) -> None:
+    from .common import bench_client
+    from app.db import Base, db
+    from app.passwords import password_hasher
+
+    Base.metadata.create_all(db)
+    if inline:
+        async def verify_on_loop(password, stored_hash):
+            return password_hasher.verify(password, stored_hash)
+
+        async def hash_on_loop(password):
+            return password_hasher.hash(password)
+
+        password_hasher.verify_async = verify_on_loop
+        password_hasher.hash_async = hash_on_loop
+
+    mode = "on the event loop" if inline else f"on the hashing pool ({password_hasher.workers} workers)"
+    print(f"{requests} logins per cost, concurrency {concurrency}, bcrypt {mode}")
+    print(f"{'rounds':>7}{'hash ms':>9}{'logins/s':>10}{'p99 ms':>9}{'loop stall ms':>15}")
+    async with bench_client() as client:
+        for cost in rounds:
+            password_hasher.bcrypt_rounds = cost
+            emails = [f"user{i}-cost{cost}@example.com" for i in range(users)]
+            for email in emails:
+                await client.post("/api/auth/register", json={"email": email, "password": "password123"})
+
+            start = time.perf_counter()
+            password_hasher.hash("password123")
+            hash_ms = (time.perf_counter() - start) * 1000
+
+            stop = asyncio.Event()
+            stall = asyncio.create_task(_loop_stall(stop))
+            elapsed, latencies = await _logins(client, emails, requests, concurrency)
+            stop.set()
+            print(f"{cost:>7}{hash_ms:>9.1f}{requests / elapsed:>10.1f}"
+                  f"{percentile(latencies, 99) * 1000:>9.1f}{await stall * 1000:>15.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, nargs="+", default=[4, 8, 10, 12])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--inline", action="store_true", help="hash on the event loop")
+    args = parser.parse_args()
+
+    # Keep benchmark users out of the real database
+    workdir = tempfile.mkdtemp(prefix="bench-passwords-")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    asyncio.run(main(args.rounds, args.requests, args.concurrency, args.users, args.inline))
@@ -0,0 +1,66 @@
+"""
+Prompt formatting benchmark
+
+Formats the agent prompt the way each ReAct iteration does, with the tool
+descriptions bound, comparing LangChain's PromptTemplate (which re-parses
+and re-renders the whole template on every call) with the pre-rendered
+template, which also re-reads the current date on every call.
+
+    uv run python -m benchmarks.bench_prompt --iterations 20000
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from . import common  # noqa: F401 - sets the API keys needed to import app
+
+
+def _measure(prompt, inputs: dict, iterations: int):
+    prompt.format(**inputs)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        prompt.format(**inputs)
+    per_call = (time.perf_counter() - start) / iterations
+
+    tracemalloc.start()
+    prompt.format(**inputs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return per_call, peak
+
+
+def main(iterations: int) -> None:
+    from langchain.tools.render import render_text_description
+    from langchain_core.prompts import PromptTemplate
+
+    from app.ai.llm import build_prompt, get_current_date
+    from app.ai.prompt import PROMPT_TEMPLATE
+    from benchmarks.fakes import FakeTavilySearch
+
+    tools = [FakeTavilySearch()]
+    bound = {"tools": render_text_description(tools), "tool_names": ", ".join(t.name for t in tools)}
+    variables = ["input", "agent_scratchpad", "tool_names", "tools", "chat_history"]
+    inputs = {
+        "input": "What events are happening at the Tempe campus this week?",
+        "chat_history": "Human: Hi\nAI: Hello! How can I help you with ASU today?",
+        "agent_scratchpad": "I should search.\nAction: tavily_search\nAction Input: ASU Tempe events\nObservation: ...\nThought:",
+    }
+
+    prompts = {
+        # The old prompt: date fixed when the agent was built
+        "PromptTemplate": PromptTemplate(template=PROMPT_TEMPLATE, input_variables=variables)
+        .partial(current_date=get_current_date(), **bound),
+        "pre-rendered": build_prompt().partial(**bound),
+    }
+    print(f"{iterations} formats of a {len(prompts['pre-rendered'].format(**inputs))}-character prompt")
+    for label, prompt in prompts.items():
+        per_call, peak = _measure(prompt, inputs, iterations)
+        print(f"  {label:<15} {per_call * 1e6:8.2f} us/format  peak {peak / 1024:6.1f} KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.iterations)
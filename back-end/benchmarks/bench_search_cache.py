@@ -0,0 +1,94 @@
+"""
+Search cache benchmark
+
+Simulates many agents searching concurrently, where most queries are
+variations of a few popular ones, and compares upstream Tavily calls and wall
+time with and without the CachedSearchTool wrapper.
+
+    uv run python -m benchmarks.bench_search_cache --queries 400 --threads 32
+"""
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import percentile
+from .fakes import FakeTavilySearch
+
+POPULAR_QUERIES = [
+    "ASU academic calendar 2025",
+    "ASU tutoring services",
+    "ASU parking permits",
+    "ASU Tempe campus events this week",
+    "ASU library hours",
+    "ASU financial aid deadlines",
+]
+
+
+def _workload(total: int, distinct_ratio: float, seed: int = 7):
+    """Popular queries with random casing/spacing, plus a share of unique ones"""
+    rng = random.Random(seed)
+    queries = []
+    for i in range(total):
+        if rng.random() < distinct_ratio:
+            queries.append(f"ASU unique question {i}")
+            continue
+        query = rng.choice(POPULAR_QUERIES)
+        if rng.random() < 0.5:
+            query = query.lower()
+        if rng.random() < 0.3:
+            query = f"  {query} "
+        queries.append(query)
+    return queries
+
+
+def _run(tool, queries, threads: int):
+    latencies = []
+
+    def search(query):
+        start = time.perf_counter()
+        observation = tool.invoke(query)
+        assert observation["results"][0]["url"]
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(search, queries))
+    return time.perf_counter() - start, latencies
+
+
+def main(queries: int, threads: int, latency: float, distinct_ratio: float) -> None:
+    from app.ai.search_cache import SearchCache
+    from app.ai.tools import CachedSearchTool
+
+    workload = _workload(queries, distinct_ratio)
+
+    uncached = FakeTavilySearch(latency=latency)
+    plain_time, plain_latencies = _run(uncached, workload, threads)
+
+    upstream = FakeTavilySearch(latency=latency)
+    cache = SearchCache()
+    cached_time, cached_latencies = _run(CachedSearchTool.wrap(upstream, cache), workload, threads)
+
+    print(f"{queries} searches, {threads} threads, {latency * 1000:.0f} ms upstream latency")
+    print(f"{'':12}{'upstream calls':>16}{'wall ms':>10}{'p50 ms':>9}{'p99 ms':>9}")
+    for label, tool, wall, latencies in (
+        ("uncached", uncached, plain_time, plain_latencies),
+        ("cached", upstream, cached_time, cached_latencies),
+    ):
+        print(
+            f"{label:12}{tool.calls:>16}{wall * 1000:>10.0f}"
+            f"{percentile(latencies, 50) * 1000:>9.1f}{percentile(latencies, 99) * 1000:>9.1f}"
+        )
+    print(f"cache stats: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--distinct-ratio", type=float, default=0.1)
+    args = parser.parse_args()
+    main(args.queries, args.threads, args.latency, args.distinct_ratio)
@@ -0,0 +1,72 @@
+"""
+Source extraction benchmark
+
+Builds synthetic agent traces of --steps searches, where later searches keep
+finding pages already seen (with www., trailing slashes and tracking
+parameters), and compares the previous extraction (a validated Source per
+result, built again for the response) with extract_sources: time per trace,
+sources returned and the size of the serialized response.
+
+    uv run python -m benchmarks.bench_sources --steps 50 --iterations 500
+"""
+
+import argparse
+import json
+import random
+import time
+
+from . import common  # noqa: F401 - sets the API keys needed to import app
+
+
+def _trace(steps: int, results_per_search: int = 5, pages: int = 40, seed: int = 7):
+    rng = random.Random(seed)
+    hosts = ["https://www.asu.edu", "https://admission.asu.edu", "https://news.example.com", "https://www.reddit.com"]
+    variants = ["", "/", "?utm_source=newsletter", "#section"]
+    trace = []
+    for _ in range(steps):
+        results = []
+        for _ in range(results_per_search):
+            page = rng.randrange(pages)
+            url = f"{hosts[page % len(hosts)]}/page-{page}{rng.choice(variants)}"
+            results.append({"url": url, "title": f"Page {page}", "content": f"About page {page}. " * 40, "score": 0.5})
+        trace.append((None, {"query": "q", "results": results}))
+    return trace
+
+
+def _previous(trace):
+    """process_result and the response building before sources were deduplicated"""
+    from app.ai.llm_schema import Source
+
+    sources = []
+    for step in trace:
+        if len(step) > 1:
+            observation = step[1]
+            if isinstance(observation, dict) and 'results' in observation:
+                for search_result in observation['results']:
+                    if 'url' in search_result and search_result['url']:
+                        sources.append(Source(url=search_result['url']))
+    return [Source(url=source.url) for source in sources]
+
+
+def main(steps: int, iterations: int) -> None:
+    from app.ai.sources import extract_sources
+
+    trace = _trace(steps)
+    print(f"{steps}-step traces, {steps * 5} search results each")
+    print(f"{'':20}{'us/trace':>10}{'sources':>9}{'JSON bytes':>12}")
+    for label, extract in (("previous", _previous), ("extract_sources", extract_sources)):
+        extract(trace)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            sources = extract(trace)
+        per_trace = (time.perf_counter() - start) / iterations
+        size = len(json.dumps([source.model_dump() for source in sources]))
+        print(f"{label:<20}{per_trace * 1e6:>10.1f}{len(sources):>9}{size:>12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+    main(args.steps, args.iterations)
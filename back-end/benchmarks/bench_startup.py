@@ -0,0 +1,78 @@
+"""
+Startup time benchmark
+
+Starts fresh interpreters (as a uvicorn worker spawn would) and measures:
+- import: `import app.main`
+- startup: the lifespan hook (database init, optional agent warmup)
+- first auth request: GET /api/auth/me right after startup
+- agent build: what the first chat request adds on top (importing LangChain,
+  Gemini and Tavily and building the executor; no network calls are made)
+
+"eager" is the sum of import and agent build, which every process paid at
+import time before the agent stack became lazy.
+
+    uv run python -m benchmarks.bench_startup --runs 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from .common import percentile
+
+CHILD = r"""
+import json, time
+from fastapi.testclient import TestClient
+t0 = time.perf_counter()
+import app.main
+t1 = time.perf_counter()
+from app.routes.auth import create_access_token
+headers = {"Authorization": "Bearer " + create_access_token("bench@example.com", 1)}
+ready = time.perf_counter()
+with TestClient(app.main.app) as client:
+    t2 = time.perf_counter()
+    client.get("/api/auth/me", headers=headers).raise_for_status()
+    t3 = time.perf_counter()
+    from app.ai import llm
+    llm.get_chain()
+    t4 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "startup": t2 - ready, "first auth request": t3 - t2, "agent build": t4 - t3}))
+"""
+
+
+def _run_child(env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(runs: int, warmup: bool) -> None:
+    workdir = tempfile.mkdtemp(prefix="bench-startup-")
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "TAVILY_API_KEY": os.getenv("TAVILY_API_KEY", "benchmark"),
+        "GOOGLE_API_KEY": os.getenv("GOOGLE_API_KEY", "benchmark"),
+        "AGENT_WARMUP": "1" if warmup else "0",
+    }
+    samples = [_run_child(env) for _ in range(runs)]
+
+    print(f"{runs} fresh processes, AGENT_WARMUP={env['AGENT_WARMUP']}")
+    for key in samples[0]:
+        values = [sample[key] for sample in samples]
+        print(f"  {key:<20} p50 {percentile(values, 50) * 1000:8.1f} ms")
+    if not warmup:
+        eager = [sample["import"] + sample["agent build"] for sample in samples]
+        print(f"  {'eager (old import)':<20} p50 {percentile(eager, 50) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", action="store_true", help="build the agent in the lifespan hook")
+    args = parser.parse_args()
+    main(args.runs, args.warmup)
@@ -0,0 +1,100 @@
+"""
+Static asset serving benchmark
+
+Builds a throwaway React-like build directory and compares the previous
+serving path (StaticFiles plus a FileResponse of index.html per request)
+with the in-memory StaticAssets index: requests per second and bytes sent
+for SPA page loads, revalidations (If-None-Match) and a hashed JS bundle.
+
+    uv run python -m benchmarks.bench_static --requests 2000
+"""
+
+import argparse
+import asyncio
+import gzip
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import FileResponse
+from fastapi.staticfiles import StaticFiles
+
+from .common import REACT_BUNDLE as BUNDLE, make_react_build  # sets the API keys needed to import app
+
+
+def _legacy_app(build: Path) -> FastAPI:
+    app = FastAPI()
+    app.mount("/static", StaticFiles(directory=str(build / "static")), name="static")
+
+    @app.get("/{full_path:path}")
+    async def serve_react_app(full_path: str):
+        index_file = build / "index.html"
+        if index_file.exists():
+            return FileResponse(str(index_file))
+        raise HTTPException(status_code=404)
+
+    return app
+
+
+def _new_app(build: Path) -> FastAPI:
+    from app.static_assets import StaticAssets
+
+    app = FastAPI()
+    assets = StaticAssets(build).load()
+
+    @app.get("/static/{path:path}")
+    async def serve_static(path: str, request: Request):
+        return assets.static_response(request, path)
+
+    @app.get("/{full_path:path}")
+    async def serve_react_app(full_path: str, request: Request):
+        return assets.document_response(request, "index.html")
+
+    return app
+
+
+async def _measure(app, path: str, requests: int, revalidate: bool):
+    headers = {"Accept-Encoding": "gzip, br"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        first = await client.get(path, headers=headers)
+        if revalidate:
+            headers["If-None-Match"] = first.headers["etag"]
+        sent = 0
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = await client.get(path, headers=headers)
+            # httpx decodes transparently; count what went over the wire
+            sent += int(response.headers.get("content-length", 0))
+        elapsed = time.perf_counter() - start
+    return requests / elapsed, sent / requests, first.status_code
+
+
+async def main(requests: int) -> None:
+    build = make_react_build(Path(tempfile.mkdtemp(prefix="bench-static-")))
+    bundle = build / "static" / "js" / BUNDLE
+    print(f"bundle {bundle.stat().st_size / 1024:.0f} KiB, gzip {len(gzip.compress(bundle.read_bytes())) / 1024:.0f} KiB")
+
+    apps = {"StaticFiles": _legacy_app(build), "StaticAssets": _new_app(build)}
+    cases = [
+        ("page load", "/chat", False),
+        ("page revalidate", "/chat", True),
+        ("bundle", f"/static/js/{BUNDLE}", False),
+        ("bundle revalidate", f"/static/js/{BUNDLE}", True),
+    ]
+    print(f"{'':>18}" + "".join(f"{name:>26}" for name in apps))
+    for label, path, revalidate in cases:
+        row = ""
+        for app in apps.values():
+            rps, size, _ = await _measure(app, path, requests, revalidate)
+            row += f"{rps:>10.0f} req/s {size / 1024:>7.1f} KiB"
+        print(f"{label:>18}{row}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,75 @@
+"""
+Streaming time-to-first-byte benchmark
+
+Compares how long a user waits for something to appear with /api/chat/ask
+(the whole response at once) versus /api/chat/ask/stream (progress events,
+then answer tokens). Runs the app under uvicorn so bytes reach the client as
+soon as they are sent.
+
+    uv run python -m benchmarks.bench_stream_ttfb --steps 2
+"""
+
+import argparse
+import time
+
+import httpx
+
+from .common import auth_headers, install_stub_agent, percentile, serve_app
+
+
+def _measure_ask(client, headers, question):
+    start = time.perf_counter()
+    response = client.post("/api/chat/ask", json={"question": question, "include_history": False}, headers=headers)
+    response.raise_for_status()
+    total = time.perf_counter() - start
+    return total, total, total
+
+
+def _measure_stream(client, headers, question):
+    start = time.perf_counter()
+    first_byte = first_token = None
+    body = {"question": question, "include_history": False}
+    with client.stream("POST", "/api/chat/ask/stream", json=body, headers=headers) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            now = time.perf_counter() - start
+            if first_byte is None:
+                first_byte = now
+            if first_token is None and line == "event: token":
+                first_token = now
+            if line == "event: done":
+                break
+    return first_byte, first_token, time.perf_counter() - start
+
+
+def main(runs: int, steps: int, llm_latency: float, token_latency: float, search_latency: float) -> None:
+    install_stub_agent(llm_latency=llm_latency, search_latency=search_latency,
+                       steps=steps, token_latency=token_latency)
+    headers = auth_headers()
+
+    with serve_app() as base_url, httpx.Client(base_url=base_url, timeout=60) as client:
+        print(f"{runs} runs, {steps} search steps per question")
+        print(f"{'':10}{'first byte p50':>16}{'first token p50':>17}{'complete p50':>14}")
+        for label, measure in (("/ask", _measure_ask), ("/stream", _measure_stream)):
+            # Distinct questions per run so the answer cache never short-circuits
+            samples = [
+                measure(client, headers, f"{label} question {i} for conversation {time.time_ns()}")
+                for i in range(runs)
+            ]
+            first_byte, first_token, complete = zip(*samples)
+            print(
+                f"{label:10}{percentile(first_byte, 50) * 1000:>13.0f} ms"
+                f"{percentile(first_token, 50) * 1000:>14.0f} ms"
+                f"{percentile(complete, 50) * 1000:>11.0f} ms"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--steps", type=int, default=2)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.02)
+    parser.add_argument("--search-latency", type=float, default=0.2)
+    args = parser.parse_args()
+    main(args.runs, args.steps, args.llm_latency, args.token_latency, args.search_latency)
@@ -0,0 +1,76 @@
+"""
+Upstream client benchmark under injected faults
+
+Sends searches through the Tavily search tool to a local stub server that
+adds latency spikes and 503 errors, comparing langchain-tavily's own
+TavilySearch (a new connection per request, no retries) with
+PooledTavilySearch under the upstream policy, with and without hedging. Reports p50/p99 latency, failed
+searches, requests that reached the server and connections opened.
+
+    uv run python -m benchmarks.bench_upstream --searches 400 --slow-ratio 0.05 --error-ratio 0.05
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import common
+from .fakes import StubTavilyServer
+
+from langchain_tavily import TavilySearch
+
+
+def _run(tool, searches: int, threads: int):
+    latencies, failures = [], 0
+
+    def search(i):
+        nonlocal failures
+        start = time.perf_counter()
+        # Both tools report a failed search as an "error" result
+        if "error" in tool.invoke(f"ASU question {i}"):
+            failures += 1
+        latencies.append(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(search, range(searches)))
+    return latencies, failures
+
+
+def main(searches: int, threads: int, latency: float, slow_ratio: float, slow_latency: float,
+         error_ratio: float, hedge_after: float) -> None:
+    from app.ai import tavily
+    from app.ai.upstream import UpstreamPolicy
+
+    print(f"{searches} searches, {threads} threads; {latency * 1000:.0f} ms upstream, "
+          f"{slow_ratio:.0%} take {slow_latency * 1000:.0f} ms, {error_ratio:.0%} fail with 503")
+    print(f"{'':28}{'p50 ms':>8}{'p99 ms':>8}{'failed':>8}{'requests':>10}{'connections':>13}")
+    policy = UpstreamPolicy(timeout=5, max_retries=3, backoff=0.02, backoff_max=0.5)
+    clients = [
+        ("langchain-tavily client", TavilySearch, None),
+        ("pooled + retries", tavily.PooledTavilySearch, policy),
+        ("pooled + retries + hedge", tavily.PooledTavilySearch,
+         UpstreamPolicy(**{**policy.__dict__, "hedge_after": hedge_after})),
+    ]
+    for label, tool_class, search_policy in clients:
+        if search_policy is not None:
+            tavily.SEARCH_POLICY = search_policy
+        with StubTavilyServer(latency=latency, slow_ratio=slow_ratio, slow_latency=slow_latency,
+                              error_ratio=error_ratio) as server:
+            tool = tool_class(tavily_api_key="benchmark", api_base_url=server.url, max_results=3)
+            latencies, failures = _run(tool, searches, threads)
+        print(f"{label:<28}{common.percentile(latencies, 50) * 1000:>8.0f}"
+              f"{common.percentile(latencies, 99) * 1000:>8.0f}{failures:>8}{server.requests:>10}{server.connections:>13}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--searches", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--slow-ratio", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=0.5)
+    parser.add_argument("--error-ratio", type=float, default=0.05)
+    parser.add_argument("--hedge-after", type=float, default=0.1)
+    args = parser.parse_args()
+    main(args.searches, args.threads, args.latency, args.slow_ratio, args.slow_latency,
+         args.error_ratio, args.hedge_after)
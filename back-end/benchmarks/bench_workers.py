@@ -0,0 +1,121 @@
+"""
+Multi-worker scaling benchmark
+
+Serves benchmarks.stub_app through app.serve with each of --workers worker
+processes, sharing state through SHARED_STATE_BACKEND=sqlite (a throwaway
+database) or redis (a local FakeRedisServer), and sends /api/chat/ask from
+--per-worker connections per worker for --seconds, each question different so
+the answer cache never answers. A worker runs at most --agent-concurrency
+agent runs at once, each one stub LLM call of --llm-latency, so its capacity
+is agent-concurrency / llm-latency questions per second; reports questions
+per second, the speed-up over the first worker count and p50/p99 latency.
+
+    uv run python -m benchmarks.bench_workers --workers 1,2,4 --backend redis
+"""
+
+import argparse
+import contextlib
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+import httpx
+
+from .common import balanced_clients, percentile, serve_workers
+
+
+def worker_env(backend: str, directory: str, redis_url: str = "", llm_latency: float = 0.1,
+               agent_concurrency: int = 2) -> Dict[str, str]:
+    """Environment of served stub apps: a throwaway database, the shared state backend and the agent's capacity"""
+    return {
+        "DATABASE_URL": f"sqlite:///{directory}/workers.db",
+        "SHARED_STATE_BACKEND": backend,
+        "REDIS_URL": redis_url,
+        "REVOCATION_REFRESH_SECONDS": "0.2",
+        "TRACE_DIR": f"{directory}/traces",
+        "PASSWORD_BCRYPT_ROUNDS": "4",
+        "AGENT_MAX_CONCURRENCY": str(agent_concurrency),
+        "STUB_LLM_LATENCY": str(llm_latency),
+        "STUB_STEPS": "0",
+    }
+
+
+def login(base_url: str, email: str) -> Dict[str, str]:
+    """Register a user and return its Authorization header"""
+    with httpx.Client(base_url=base_url, timeout=30) as client:
+        client.post("/api/auth/register", json={"email": email, "password": "password123"}).raise_for_status()
+        token = client.post("/api/auth/login", data={"username": email, "password": "password123"}).json()
+    return {"Authorization": f"Bearer {token['access_token']}"}
+
+
+def ask_throughput(clients: List[httpx.Client], headers: Dict[str, str], seconds: float, tag: str) -> dict:
+    """Ask distinct questions on every client for `seconds` and return questions per second and latencies"""
+    latencies: List[float] = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def run(index: int, client: httpx.Client):
+        i = 0
+        while time.perf_counter() < deadline:
+            i += 1
+            start = time.perf_counter()
+            response = client.post("/api/chat/ask", headers=headers, json={
+                "question": f"Question {tag}-{index}-{i}?", "include_history": False,
+                "conversation_id": f"{tag}-{index}",
+            })
+            with lock:
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors[0] += 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=run, args=(i, client)) for i, client in enumerate(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {"questions": len(latencies), "errors": errors[0], "qps": len(latencies) / elapsed,
+            "p50": percentile(latencies, 50), "p99": percentile(latencies, 99)}
+
+
+def main(worker_counts: List[int], backend: str, per_worker: int, seconds: float,
+         llm_latency: float, agent_concurrency: int) -> None:
+    from .fakes import FakeRedisServer
+
+    with contextlib.ExitStack() as stack:
+        redis_url = stack.enter_context(FakeRedisServer()).url if backend == "redis" else ""
+        print(f"backend {backend}, {per_worker} connections and {agent_concurrency} agent runs per worker, "
+              f"LLM {llm_latency * 1000:.0f} ms, {seconds:.0f} s per run")
+        print(f"{'workers':>8}{'questions':>11}{'errors':>8}{'q/s':>8}{'speed-up':>10}{'p50 ms':>9}{'p99 ms':>9}")
+        baseline = None
+        for workers in worker_counts:
+            env = worker_env(backend, tempfile.mkdtemp(prefix="bench-workers-"), redis_url,
+                             llm_latency, agent_concurrency)
+            with serve_workers(workers, env) as base_url:
+                headers = login(base_url, f"workers{workers}@example.com")
+                clients = balanced_clients(base_url, workers, per_worker)
+                try:
+                    result = ask_throughput(clients, headers, seconds, tag=f"w{workers}")
+                finally:
+                    for client in clients:
+                        client.close()
+            baseline = baseline or result["qps"] / workers
+            print(f"{workers:>8}{result['questions']:>11}{result['errors']:>8}{result['qps']:>8.1f}"
+                  f"{result['qps'] / baseline:>9.2f}x{result['p50'] * 1000:>9.0f}{result['p99'] * 1000:>9.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--backend", choices=["sqlite", "redis"], default="sqlite")
+    parser.add_argument("--per-worker", type=int, default=4, help="client connections per worker")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--llm-latency", type=float, default=0.1)
+    parser.add_argument("--agent-concurrency", type=int, default=2, help="AGENT_MAX_CONCURRENCY of each worker")
+    args = parser.parse_args()
+    main([int(n) for n in args.workers.split(",")], args.backend, args.per_worker, args.seconds,
+         args.llm_latency, args.agent_concurrency)
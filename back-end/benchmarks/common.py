@@ -0,0 +1,188 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+# The real LLM and search clients refuse to be created without keys; the
+# benchmarks that build them (bench_startup) never call them.
+os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+from .fakes import FakeTavilySearch, StubReActLLM
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Hashed bundle name in the build made by make_react_build
+REACT_BUNDLE = "main.1a2b3c4d.js"
+
+
+def percentile(values, pct: float) -> float:
+    """Return the pct-th percentile (0-100) of values using nearest rank"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def install_stub_agent(llm_latency: float = 0.05, search_latency: float = 0.05, steps: int = 1,
+                       token_latency: float = 0.0, budget=None):
+    """Replace the agent chain with one backed by the stub LLM and fake search
+
+    The fake search is wrapped in the same cache as the real one. Returns the
+    fake search tool so callers can inspect its upstream call count. budget
+    sets the executor's own limits (see build_agent_executor).
+    """
+    from app.ai import llm
+    from app.ai.search_cache import search_cache
+    from app.ai.tools import CachedSearchTool
+
+    search = FakeTavilySearch(latency=search_latency)
+    stub_llm = StubReActLLM(latency=llm_latency, token_latency=token_latency, steps=steps)
+    search_cache.clear()
+    llm.chain = llm.build_agent_executor(stub_llm, [CachedSearchTool.wrap(search, search_cache)], budget=budget)
+    return search
+
+
+def auth_headers(email: str = "bench@example.com", user_id: int = 1) -> dict:
+    """Return an Authorization header with a freshly signed access token"""
+    from app.routes.auth import create_access_token
+
+    return {"Authorization": f"Bearer {create_access_token(email=email, user_id=user_id)}"}
+
+
+def bench_client() -> httpx.AsyncClient:
+    """Return an HTTP client that talks to the FastAPI app in-process"""
+    from app.main import app
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark")
+
+
+def make_react_build(root: Path) -> Path:
+    """Write a throwaway React-like build (index.html, manifest, a large hashed bundle) and precompress it"""
+    from app.static_assets import precompress
+
+    (root / "static" / "js").mkdir(parents=True)
+    (root / "index.html").write_text(
+        "<!doctype html><html><head><title>ASU Assistant</title>"
+        + "<link rel=\"preload\" href=\"/static/js/chunk.js\">" * 40
+        + "</head><body><div id=\"root\"></div></body></html>"
+    )
+    (root / "manifest.json").write_text('{"short_name": "ASU", "name": "ASU Assistant"}')
+    lines = [f"function component{i}(props) {{ return props.items.map(x => x * {i}); }}" for i in range(6000)]
+    (root / "static" / "js" / REACT_BUNDLE).write_text("\n".join(lines))
+    precompress(root)
+    return root
+
+
+@contextlib.contextmanager
+def serve_app(app=None):
+    """Run the app under uvicorn on a free local port and yield its base URL
+
+    Needed where the in-process ASGI transport is not enough, e.g. to measure
+    time-to-first-byte of streaming responses.
+    """
+    import uvicorn
+
+    if app is None:
+        from app.main import app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def serve_workers(workers: int, env: Dict[str, str], app: str = "benchmarks.stub_app:app",
+                  timeout: float = 60):
+    """Run app.serve with `workers` processes on a free local port and yield its base URL
+
+    `env` is added to this process's environment (e.g. DATABASE_URL and
+    SHARED_STATE_BACKEND). Yields once every worker has answered a request,
+    which needs an app that sets X-Worker-Pid, such as benchmarks.stub_app.
+    """
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.serve", "--workers", str(workers), "--port", str(port),
+         "--app", app, "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, **env},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        pids = set()
+        deadline = time.monotonic() + timeout
+        while len(pids) < workers:
+            if process.poll() is not None:
+                raise RuntimeError(f"app.serve exited with status {process.returncode}")
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Only {len(pids)} of {workers} workers answered within {timeout} s")
+            try:
+                # A new connection per request, so that every worker gets to accept one
+                response = httpx.get(base_url + "/", headers={"Connection": "close"}, timeout=5)
+                pids.add(response.headers["x-worker-pid"])
+            except httpx.TransportError:
+                time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def balanced_clients(base_url: str, workers: int, per_worker: int, attempts: int = 500) -> List[httpx.Client]:
+    """
+    Return workers * per_worker single-connection clients, per_worker of them
+    connected to each worker
+
+    The kernel hands new connections to whichever worker accepts first, which
+    on an idle host can be the same one many times in a row; keeping only
+    connections that landed on a worker that still needs some makes the load
+    even, so throughput measures the workers rather than the kernel's luck.
+    """
+    clients: Dict[str, List[httpx.Client]] = {}
+    for _ in range(attempts):
+        if sum(len(held) for held in clients.values()) == workers * per_worker:
+            return [client for held in clients.values() for client in held]
+        client = httpx.Client(base_url=base_url, timeout=60, limits=httpx.Limits(max_connections=1))
+        held = clients.setdefault(client.get("/").headers["x-worker-pid"], [])
+        if len(held) < per_worker:
+            held.append(client)
+        else:
+            client.close()
+    for held in clients.values():
+        for client in held:
+            client.close()
+    raise RuntimeError(f"Could not spread {workers * per_worker} connections over {workers} workers")
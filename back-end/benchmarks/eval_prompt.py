@@ -0,0 +1,65 @@
+"""
+Offline prompt variant evaluation
+
+Runs the stub ReAct agent through the same questions with each prompt
+variant and compares the tokens sent per LLM call and per question. Every
+iteration re-sends the whole prompt plus the growing scratchpad, so input
+tokens grow with the square of the number of steps; the compact variants
+shrink the fixed part. The stub reports no usage, so tokens are the same
+text-length estimate the budget uses. A variant only counts as working if
+the agent still reaches a final answer with it.
+
+    uv run python -m benchmarks.eval_prompt --steps 3
+"""
+
+import argparse
+
+from . import common  # noqa: F401 - sets the API keys needed to import app
+
+QUESTIONS = [
+    "When does the fall semester start?",
+    "Where can I find tutoring for calculus?",
+    "Are there any big events at the Tempe campus next week?",
+    "How do I apply for ASU scholarships?",
+]
+
+VARIANTS = [
+    ("full", "full", True),
+    ("compact", "compact", True),
+    ("compact, no examples", "compact", False),
+]
+
+
+def main(steps: int) -> None:
+    from app.ai.budget import AgentBudget, run_with_budget
+    from app.ai.llm import build_agent_executor, build_prompt
+    from benchmarks.fakes import FakeTavilySearch, StubReActLLM
+
+    print(f"{len(QUESTIONS)} questions, {steps} search steps each (tokens estimated)")
+    print(f"{'variant':<22}{'1st call in':>12}{'last call in':>13}{'in/question':>13}{'out/question':>13}{'answered':>10}")
+    baseline = None
+    for label, variant, few_shot in VARIANTS:
+        budget = AgentBudget(max_tool_calls=steps)
+        executor = build_agent_executor(
+            StubReActLLM(steps=steps), [FakeTavilySearch()], prompt=build_prompt(variant, few_shot), budget=budget
+        )
+        first = last = total_in = total_out = answered = 0
+        for question in QUESTIONS:
+            result = run_with_budget(executor, {"input": question, "chat_history": ""}, budget)
+            usage = result["budget_usage"]
+            first += usage["iterations"][0]["input_tokens"]
+            last += usage["iterations"][-1]["input_tokens"]
+            total_in += usage["input_tokens"]
+            total_out += usage["output_tokens"]
+            answered += result["output"].startswith("Stub answer")
+        n = len(QUESTIONS)
+        baseline = baseline or total_in
+        saving = f"  ({1 - total_in / baseline:.0%} fewer input tokens)" if total_in != baseline else ""
+        print(f"{label:<22}{first // n:>12}{last // n:>13}{total_in // n:>13}{total_out // n:>13}{answered:>7}/{n}{saving}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=3)
+    args = parser.parse_args()
+    main(args.steps)
@@ -0,0 +1,478 @@
+"""
+Deterministic stand-ins for the upstream services used by the agent
+
+- StubReActLLM answers in the ReAct format: it searches a fixed number of
+  times and then gives a final answer, sleeping to simulate model latency
+  and reporting its output word by word like a streaming model.
+- FakeTavilySearch mimics the `tavily_search` tool and returns results in the
+  same `results`/`url` structure as the real Tavily API.
+- StubTavilyServer is a local HTTP server speaking the Tavily search API,
+  with injected latency spikes and error responses, for exercising the
+  real HTTP client path.
+- ReplayLLM and ReplayTool play back the LLM outputs and tool observations
+  of a recorded agent trace (app/ai/traces.py), with the recorded timing
+  scaled by `speed`.
+- FakeRedis is an in-process stand-in for the subset of the redis-py client
+  the app uses, including key expiry.
+- FakeRedisServer is a local TCP server speaking the Redis protocol, which
+  the worker processes of a multi-worker test can share.
+"""
+
+import fnmatch
+import json
+import random
+import re
+import socket
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, List, Optional
+
+from langchain_core.language_models.llms import LLM
+from langchain_core.tools import BaseTool, ToolException
+from pydantic import PrivateAttr
+
+
+def _question_tail(prompt: str) -> str:
+    """Return the rendered prompt from the last "Question:" line onwards"""
+    # The few-shot examples also contain "Observation:", so only the tail counts
+    return prompt.rsplit("\nQuestion: ", 1)[-1]
+
+
+class StubReActLLM(LLM):
+    """Fake LLM that plays a fixed number of ReAct search steps"""
+
+    latency: float = 0.0
+    token_latency: float = 0.0
+    steps: int = 1
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-react"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        if self.latency:
+            time.sleep(self.latency)
+        text = self._respond(prompt)
+        if run_manager:
+            for token in re.findall(r"\S+\s*|\s+", text):
+                if self.token_latency:
+                    time.sleep(self.token_latency)
+                run_manager.on_llm_new_token(token)
+        return text
+
+    def _respond(self, prompt: str) -> str:
+        tail = _question_tail(prompt)
+        question = tail.split("\n", 1)[0].strip()
+        done = tail.count("Observation:")
+
+        if done < self.steps:
+            return (
+                f" I should search for more information.\n"
+                f"Action: tavily_search\n"
+                f"Action Input: ASU {question} {done + 1}"
+            )
+        return f" I now know the final answer\nFinal Answer: Stub answer to: {question}"
+
+
+class FakeTavilySearch(BaseTool):
+    """Local replacement for TavilySearch that counts upstream calls"""
+
+    name: str = "tavily_search"
+    description: str = "A search engine for questions about current events. Input should be a search query."
+    latency: float = 0.0
+    results_per_query: int = 3
+
+    _calls: int = PrivateAttr(default=0)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def calls(self) -> int:
+        """Number of searches that reached this fake upstream"""
+        return self._calls
+
+    def _run(self, query: str, run_manager=None) -> dict:
+        with self._lock:
+            self._calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return _search_results(query, self.results_per_query)
+
+
+class ReplayLLM(LLM):
+    """Fake LLM that returns the recorded LLM steps of a trace, in order"""
+
+    steps: List[dict]
+    speed: float = 1.0
+
+    _next: int = PrivateAttr(default=0)
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        if self._next >= len(self.steps):
+            # The replayed run asked for more than was recorded: end it visibly
+            return " The recorded trace has no further steps\nFinal Answer: (end of recorded trace)"
+        step = self.steps[self._next]
+        self._next += 1
+        if self.speed:
+            time.sleep(step.get("seconds", 0.0) * self.speed)
+        if "text" not in step:
+            raise RuntimeError(step.get("error", "Recorded LLM call failed"))
+        return step["text"]
+
+
+class ReplayTool(BaseTool):
+    """Fake tool that returns the recorded observations of one tool in a trace, in order"""
+
+    description: str = "Replays recorded observations."
+    steps: List[dict]
+    speed: float = 1.0
+    handle_tool_error: bool = True
+
+    _next: int = PrivateAttr(default=0)
+
+    def _run(self, query: str, run_manager=None) -> Any:
+        if self._next >= len(self.steps):
+            raise ToolException("The recorded trace has no further observations")
+        step = self.steps[self._next]
+        self._next += 1
+        if self.speed:
+            time.sleep(step.get("seconds", 0.0) * self.speed)
+        if "output" not in step:
+            raise ToolException(step.get("error", "Recorded tool call failed"))
+        return step["output"]
+
+
+def _search_results(query: str, count: int) -> dict:
+    slug = re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-")
+    return {
+        "query": query,
+        "results": [
+            {
+                "url": f"https://www.asu.edu/{slug}/{i}",
+                "title": f"{query} ({i})",
+                "content": f"Information about {query}, result {i}.",
+                "score": round(1.0 - i / 10, 2),
+            }
+            for i in range(count)
+        ],
+    }
+
+
+class StubTavilyServer:
+    """
+    Local Tavily API stand-in with fault injection
+
+    Each request sleeps `latency`, or `slow_latency` for a `slow_ratio` share
+    of them, and a share of `error_ratio` is answered with 503. Use as a
+    context manager; `url` is the base URL to send searches to.
+    """
+
+    def __init__(self, latency: float = 0.0, slow_ratio: float = 0.0, slow_latency: float = 1.0,
+                 error_ratio: float = 0.0, seed: int = 7):
+        self.latency = latency
+        self.slow_ratio = slow_ratio
+        self.slow_latency = slow_latency
+        self.error_ratio = error_ratio
+        self.requests = 0
+        self.connections = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _plan(self):
+        with self._lock:
+            self.requests += 1
+            slow = self._random.random() < self.slow_ratio
+            failed = self._random.random() < self.error_ratio
+        return (self.slow_latency if slow else self.latency), failed
+
+    def __enter__(self) -> "StubTavilyServer":
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+            disable_nagle_algorithm = True  # headers and body are separate writes
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                delay, failed = stub._plan()
+                time.sleep(delay)
+                if failed:
+                    status, payload = 503, {"detail": {"error": "injected failure"}}
+                else:
+                    status, payload = 200, _search_results(body["query"], body.get("max_results") or 3)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FakeRedis:
+    """Minimal in-memory redis-py lookalike with key expiry"""
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _live(self, name):
+        entry = self._data.get(name)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= self.clock():
+            del self._data[name]
+            return None
+        return entry
+
+    def set(self, name, value, ex=None, nx=False):
+        with self._lock:
+            if nx and self._live(name) is not None:
+                return None
+            expires_at = self.clock() + ex if ex is not None else None
+            self._data[name] = (str(value).encode(), expires_at)
+            return True
+
+    def get(self, name):
+        with self._lock:
+            entry = self._live(name)
+            return entry[0] if entry else None
+
+    def exists(self, *names):
+        with self._lock:
+            return sum(1 for name in names if self._live(name) is not None)
+
+    def delete(self, *names):
+        with self._lock:
+            return sum(1 for name in names if self._data.pop(name, None) is not None)
+
+    def scan_iter(self, match="*"):
+        with self._lock:
+            names = [name for name in list(self._data) if self._live(name) is not None]
+        return iter([name for name in names if fnmatch.fnmatchcase(name, match)])
+
+
+class FakeRedisServer:
+    """
+    Local server speaking the Redis protocol (RESP2), for the redis backends
+
+    Implements the commands the redis backends send through redis-py: strings with
+    expiry (GET, SET EX/PX/NX, INCRBY, PEXPIRE), lists (RPUSH, LTRIM, LRANGE),
+    DEL, EXISTS, SCAN and MULTI/EXEC. Worker processes can reach it, unlike
+    FakeRedis. Use as a context manager; `url` is the REDIS_URL to connect to.
+
+    Failures can be injected: with `drop_replies` set, that many commands (or
+    transactions) are executed but their connection is closed instead of
+    answered, and close_connections() drops every open connection, like a
+    server restart or an idle timeout.
+    """
+
+    def __init__(self):
+        self.commands = 0
+        self.drop_replies = 0
+        self._connections = set()
+        self._data = {}  # key -> [value (str or list), expires_at or None]
+        self._lock = threading.Lock()
+        self._server: Optional[socketserver.ThreadingTCPServer] = None
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.time():
+            del self._data[key]
+            return None
+        return entry
+
+    def _list(self, key) -> list:
+        entry = self._live(key)
+        if entry is None:
+            entry = self._data[key] = [[], None]
+        if not isinstance(entry[0], list):
+            raise ValueError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return entry[0]
+
+    def _run(self, name: str, args: List[str]):
+        """Execute one command under the lock and return its reply"""
+        self.commands += 1
+        if name in ("PING", "SELECT", "AUTH", "FLUSHDB"):
+            if name == "FLUSHDB":
+                self._data.clear()
+            return "+PONG" if name == "PING" else "+OK"
+        if name == "GET":
+            entry = self._live(args[0])
+            return None if entry is None else str(entry[0])
+        if name == "SET":
+            key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+            if "NX" in options and self._live(key) is not None:
+                return None
+            expires_at = None
+            for unit, scale in (("EX", 1.0), ("PX", 0.001)):
+                if unit in options:
+                    expires_at = time.time() + float(args[2 + options.index(unit) + 1]) * scale
+            self._data[key] = [value, expires_at]
+            return "+OK"
+        if name == "DEL":
+            return sum(1 for key in args if self._live(key) is not None and self._data.pop(key))
+        if name == "EXISTS":
+            return sum(1 for key in args if self._live(key) is not None)
+        if name == "INCRBY":
+            entry = self._live(args[0])
+            value = (int(entry[0]) if entry else 0) + int(args[1])
+            self._data[args[0]] = [str(value), entry[1] if entry else None]
+            return value
+        if name in ("PEXPIRE", "EXPIRE"):
+            entry = self._live(args[0])
+            if entry is None:
+                return 0
+            entry[1] = time.time() + float(args[1]) * (0.001 if name == "PEXPIRE" else 1.0)
+            return 1
+        if name == "RPUSH":
+            items = self._list(args[0])
+            items.extend(args[1:])
+            return len(items)
+        if name in ("LTRIM", "LRANGE"):
+            items = self._list(args[0])
+            start, stop = int(args[1]), int(args[2])
+            start = max(start + len(items), 0) if start < 0 else start
+            stop = stop + len(items) if stop < 0 else stop
+            selected = items[start:stop + 1]
+            if name == "LRANGE":
+                if not items:
+                    del self._data[args[0]]
+                return selected
+            items[:] = selected
+            if not items:
+                del self._data[args[0]]
+            return "+OK"
+        if name == "SCAN":
+            pattern = args[args.index("MATCH") + 1] if "MATCH" in args else "*"
+            keys = [key for key in list(self._data) if self._live(key) is not None]
+            return ["0", [key for key in keys if fnmatch.fnmatchcase(key, pattern)]]
+        raise ValueError(f"ERR unknown command '{name}'")
+
+    @staticmethod
+    def _encode(reply) -> bytes:
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, int):
+            return b":%d\r\n" % reply
+        if isinstance(reply, Exception):
+            return f"-{reply}\r\n".encode()
+        if isinstance(reply, list):
+            return b"*%d\r\n" % len(reply) + b"".join(FakeRedisServer._encode(item) for item in reply)
+        if reply.startswith("+"):
+            return reply.encode() + b"\r\n"
+        data = reply.encode()
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+
+    def __enter__(self) -> "FakeRedisServer":
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def _command(self) -> Optional[List[str]]:
+                line = self.rfile.readline()
+                if not line:
+                    return None
+                args = []
+                for _ in range(int(line[1:])):
+                    length = int(self.rfile.readline()[1:])
+                    args.append(self.rfile.read(length + 2)[:-2].decode())
+                return args
+
+            def handle(self):
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with fake._lock:
+                    fake._connections.add(self.connection)
+                try:
+                    self._serve()
+                except OSError:
+                    pass  # Dropped by close_connections()
+                finally:
+                    with fake._lock:
+                        fake._connections.discard(self.connection)
+
+            def _serve(self):
+                queued = None  # commands of an open MULTI
+                while True:
+                    args = self._command()
+                    if args is None:
+                        return
+                    name = args[0].upper()
+                    if name == "MULTI":
+                        queued, reply = [], "+OK"
+                    elif name == "EXEC":
+                        with fake._lock:
+                            reply = [fake._safe_run(command) for command in queued or []]
+                        queued = None
+                    elif queued is not None:
+                        queued.append(args)
+                        reply = "+QUEUED"
+                    else:
+                        with fake._lock:
+                            reply = fake._safe_run(args)
+                    # Connection setup (redis-py sends CLIENT SETINFO) is never dropped
+                    if name not in ("MULTI", "AUTH", "SELECT", "CLIENT") and queued is None:
+                        with fake._lock:
+                            drop = fake.drop_replies > 0
+                            fake.drop_replies -= drop
+                        if drop:
+                            return
+                    self.wfile.write(fake._encode(reply))
+
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def _safe_run(self, args: List[str]):
+        try:
+            return self._run(args[0].upper(), args[1:])
+        except (ValueError, IndexError) as exc:
+            return exc
+
+    def close_connections(self) -> None:
+        """Drop every client connection"""
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"redis://{host}:{port}/0"
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
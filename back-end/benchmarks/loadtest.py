@@ -0,0 +1,260 @@
+"""
+Mixed-traffic load test
+
+Boots app.main.app against a throwaway SQLite database, the stub LLM and
+fake search (with --llm-latency, --search-latency and --steps) and a
+throwaway React build, then drives a weighted mix of register, login, /me,
+/ask and static requests from --concurrency clients until --requests have
+been sent. Questions come from a fixed pool, so some repeat, as they do in
+real traffic. Reports requests per second, p50/p95/p99 latency and errors
+per operation, and the process's memory (client and app share the process).
+
+--save writes the results, the settings and the current git commit to
+benchmarks/results/, and --compare prints the change from an earlier saved
+run (a file, or "latest"), to spot regressions across commits.
+
+    uv run python -m benchmarks.loadtest --requests 3000 --concurrency 32 --save --compare latest
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .common import REACT_BUNDLE, percentile
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+DEFAULT_MIX = "register=1,login=2,me=10,ask=3,static=6"
+QUESTIONS = [f"What are the office hours of department {i}?" for i in range(40)]
+
+
+def _parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("register", "login", "me", "ask", "static"):
+            raise SystemExit(f"Unknown operation in --mix: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def _rss_mib() -> Optional[float]:
+    """Resident memory of this process, where the platform reports it"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class _Traffic:
+    """The requests of each operation, against a pool of registered users"""
+
+    def __init__(self, client, users: List[dict]):
+        self.client = client
+        self.users = users
+        self.registered = 0
+
+    async def register(self, rng: random.Random):
+        self.registered += 1
+        email = f"load{self.registered}-{rng.randrange(10**9)}@example.com"
+        return await self.client.post("/api/auth/register", json={"email": email, "password": "password123"})
+
+    async def login(self, rng: random.Random):
+        user = rng.choice(self.users)
+        return await self.client.post("/api/auth/login", data={"username": user["email"], "password": "password123"})
+
+    async def me(self, rng: random.Random):
+        return await self.client.get("/api/auth/me", headers=rng.choice(self.users)["headers"])
+
+    async def ask(self, rng: random.Random):
+        return await self.client.post(
+            "/api/chat/ask",
+            json={"question": rng.choice(QUESTIONS), "include_history": False,
+                  "conversation_id": f"load-{rng.randrange(1000)}"},
+            headers=rng.choice(self.users)["headers"],
+        )
+
+    async def static(self, rng: random.Random):
+        path = rng.choice(["/", f"/static/js/{REACT_BUNDLE}", "/manifest.json"])
+        return await self.client.get(path, headers={"Accept-Encoding": "gzip, br"})
+
+
+async def _run(client, mix: Dict[str, float], requests: int, concurrency: int, users: int, seed: int) -> dict:
+    traffic = _Traffic(client, [])
+    for i in range(users):
+        email = f"user{i}@example.com"
+        await client.post("/api/auth/register", json={"email": email, "password": "password123"})
+        token = (await client.post("/api/auth/login", data={"username": email, "password": "password123"})).json()
+        traffic.users.append({"email": email, "headers": {"Authorization": f"Bearer {token['access_token']}"}})
+
+    names, weights = list(mix), list(mix.values())
+    latencies: Dict[str, List[float]] = {name: [] for name in names}
+    errors: Dict[str, int] = {name: 0 for name in names}
+    remaining = requests
+    memory = {"start_mib": _rss_mib(), "peak_mib": _rss_mib()}
+
+    async def sample_memory():
+        while True:
+            await asyncio.sleep(0.1)
+            rss = _rss_mib()
+            if rss is not None:
+                memory["peak_mib"] = max(memory["peak_mib"], rss)
+
+    async def worker(worker_id: int):
+        nonlocal remaining
+        rng = random.Random(seed * 1000 + worker_id)
+        while remaining > 0:
+            remaining -= 1
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = await getattr(traffic, name)(rng)
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            latencies[name].append(time.perf_counter() - start)
+            errors[name] += failed
+
+    sampler = asyncio.create_task(sample_memory())
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    sampler.cancel()
+    memory["end_mib"] = _rss_mib()
+
+    def summary(values: List[float], failed: int) -> dict:
+        return {
+            "requests": len(values),
+            "errors": failed,
+            "rps": round(len(values) / elapsed, 1),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+        }
+
+    operations = {name: summary(latencies[name], errors[name]) for name in names}
+    every = [value for values in latencies.values() for value in values]
+    return {
+        "elapsed_seconds": round(elapsed, 3),
+        "total": summary(every, sum(errors.values())),
+        "operations": operations,
+        "memory": {key: round(value, 1) if value is not None else None for key, value in memory.items()},
+    }
+
+
+def _print(results: dict, baseline: Optional[dict]) -> None:
+    rows = [*results["operations"].items(), ("total", results["total"])]
+    base_rows = {**baseline["results"]["operations"], "total": baseline["results"]["total"]} if baseline else {}
+
+    def change(name: str, key: str, value: float) -> str:
+        before = base_rows.get(name, {}).get(key)
+        if not before:
+            return ""
+        return f" ({(value - before) / before * 100:+.0f}%)"
+
+    print(f"{'':10}{'requests':>9}{'errors':>8}{'req/s':>16}{'p50 ms':>16}{'p95 ms':>16}{'p99 ms':>16}")
+    for name, row in rows:
+        print(f"{name:10}{row['requests']:>9}{row['errors']:>8}"
+              + "".join(f"{f'{row[key]:.1f}' + change(name, key, row[key]):>16}"
+                        for key in ("rps", "p50_ms", "p95_ms", "p99_ms")))
+    memory = results["memory"]
+    if memory["end_mib"] is not None:
+        print(f"memory: {memory['start_mib']} MiB at start, {memory['peak_mib']} MiB peak, {memory['end_mib']} MiB at end")
+    if baseline:
+        print(f"compared with {baseline['commit'] or 'unknown commit'} ({baseline['saved_at']})")
+
+
+def _load_baseline(compare: Optional[str]) -> Optional[dict]:
+    if not compare:
+        return None
+    if compare == "latest":
+        saved = sorted(RESULTS_DIR.glob("loadtest-*.json"))
+        if not saved:
+            print("No saved results to compare with yet")
+            return None
+        compare = str(saved[-1])
+    with open(compare) as f:
+        return json.load(f)
+
+
+async def main(args) -> None:
+    from app import main as app_main
+    from app.ai.history import conversation_history
+    from app.db import Base, db
+    from app.static_assets import StaticAssets
+
+    from .common import install_stub_agent, make_react_build, serve_app
+
+    Base.metadata.create_all(db)
+    conversation_history.enabled = False
+    install_stub_agent(llm_latency=args.llm_latency, search_latency=args.search_latency, steps=args.steps)
+    app_main.static_assets = StaticAssets(make_react_build(Path(tempfile.mkdtemp(prefix="loadtest-build-")))).load()
+    mix = _parse_mix(args.mix)
+    baseline = _load_baseline(args.compare)
+
+    import httpx
+
+    if args.server:
+        with serve_app() as base_url:
+            limits = httpx.Limits(max_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+                results = await _run(client, mix, args.requests, args.concurrency, args.users, args.seed)
+    else:
+        transport = httpx.ASGITransport(app=app_main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+            results = await _run(client, mix, args.requests, args.concurrency, args.users, args.seed)
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, mix {args.mix}, "
+          f"{'uvicorn' if args.server else 'in-process'}; stub agent {args.steps} step(s), "
+          f"LLM {args.llm_latency * 1000:.0f} ms, search {args.search_latency * 1000:.0f} ms")
+    _print(results, baseline)
+
+    if args.save:
+        commit = _git_commit()
+        saved_at = time.strftime("%Y%m%d-%H%M%S")
+        RESULTS_DIR.mkdir(exist_ok=True)
+        path = RESULTS_DIR / f"loadtest-{saved_at}-{commit or 'nocommit'}.json"
+        settings = {key: value for key, value in vars(args).items() if key not in ("save", "compare")}
+        with open(path, "w") as f:
+            json.dump({"commit": commit, "saved_at": saved_at, "settings": settings, "results": results}, f, indent=2)
+        print(f"saved {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--users", type=int, default=20, help="users registered before the run")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--search-latency", type=float, default=0.05)
+    parser.add_argument("--steps", type=int, default=1, help="searches the stub agent runs per question")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--server", action="store_true", help="serve the app with uvicorn instead of in-process")
+    parser.add_argument("--save", action="store_true", help="save the results to benchmarks/results/")
+    parser.add_argument("--compare", help='saved results to compare with: a file, or "latest"')
+    args = parser.parse_args()
+
+    # Keep load-test users out of the real database; bcrypt at its minimum
+    # cost unless set, so logins measure the service rather than the hash
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'loadtest.db')}")
+    os.environ.setdefault("PASSWORD_BCRYPT_ROUNDS", "4")
+    asyncio.run(main(args))
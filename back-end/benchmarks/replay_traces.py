@@ -0,0 +1,118 @@
+"""
+Replay recorded agent traces offline
+
+Re-runs traces recorded with TRACE_SAMPLE_RATE / TRACE_SLOW_SECONDS through
+the real agent executor and budget loop, with the LLM and search tool
+replaced by stubs that return the recorded outputs after the recorded
+delays (scaled by --speed; 0 does not wait at all). For each trace it
+prints the recorded and replayed time and the replay's own overhead (time
+not spent in the stubs), and checks that the run takes the same steps and
+gives the same answer. Exits with status 1 if any trace diverges, so it can
+guard against regressions in the agent loop.
+
+    uv run python -m benchmarks.replay_traces traces/ --speed 0 --profile 15
+"""
+
+import argparse
+import cProfile
+import pstats
+import sys
+import time
+from typing import Dict, List
+
+from . import common  # noqa: F401 - sets the API keys needed to import app
+
+
+def _signature(steps: List[dict]) -> List[tuple]:
+    """What a run did, without timing: each LLM output and each tool call with its input"""
+    return [(step["type"], step.get("text"), step.get("tool"), step.get("input")) for step in steps]
+
+
+def replay(trace: dict, speed: float = 1.0) -> Dict:
+    """Run one recorded trace against replay stubs and compare the result with the recording"""
+    from app.ai.budget import AgentBudget, TraceCollector, run_with_budget
+    from app.ai.llm import build_agent_executor
+
+    from .fakes import ReplayLLM, ReplayTool
+
+    llm_steps = [step for step in trace["steps"] if step["type"] == "llm"]
+    tool_steps: Dict[str, List[dict]] = {}
+    for step in trace["steps"]:
+        # Internal tools (unparseable output, unknown tool names) are run by the executor itself
+        if step["type"] == "tool" and not step["tool"].startswith("_") and step["tool"] != "invalid_tool":
+            tool_steps.setdefault(step["tool"], []).append(step)
+    tools = [ReplayTool(name=name, steps=steps, speed=speed) for name, steps in tool_steps.items()]
+    budget = AgentBudget(**trace["budget"])
+    executor = build_agent_executor(ReplayLLM(steps=llm_steps, speed=speed), tools, budget=budget)
+
+    started_at = time.monotonic()
+    collector = TraceCollector(started_at)
+    result = run_with_budget(
+        executor,
+        {"input": trace["question"], "chat_history": trace["chat_history"]},
+        budget,
+        callbacks=[collector],
+        started_at=started_at,
+    )
+    elapsed = time.monotonic() - started_at
+    replayed = llm_steps + [step for steps in tool_steps.values() for step in steps]
+    waited = speed * sum(step.get("seconds", 0.0) for step in replayed)
+    usage = result["budget_usage"]
+    return {
+        "id": trace["id"],
+        "steps": len(collector.steps),
+        "recorded_seconds": trace["usage"]["elapsed_seconds"],
+        "replay_seconds": elapsed,
+        "overhead_seconds": max(0.0, elapsed - waited),
+        "matches": (
+            _signature(collector.steps) == _signature(trace["steps"])
+            and result["output"] == trace["output"]
+            and usage["exhausted"] == trace["usage"]["exhausted"]
+        ),
+    }
+
+
+def main(path: str, speed: float, limit: int, profile: int) -> int:
+    from app.ai.traces import read_traces, trace_recorder
+
+    # The replays themselves are not recorded
+    trace_recorder.sample_rate = trace_recorder.slow_seconds = 0
+    traces = list(read_traces(path))[:limit or None]
+    if not traces:
+        print(f"No traces in {path}")
+        return 1
+
+    # Loads LangChain's lazily imported modules, which the first replay would otherwise pay for
+    replay(traces[0], speed=0)
+    profiler = cProfile.Profile() if profile else None
+    print(f"{'trace':<10}{'steps':>6}{'recorded s':>12}{'replay s':>10}{'overhead ms':>13}  result")
+    results = []
+    for trace in traces:
+        if profiler:
+            profiler.enable()
+        outcome = replay(trace, speed)
+        if profiler:
+            profiler.disable()
+        results.append(outcome)
+        print(f"{outcome['id'][:8]:<10}{outcome['steps']:>6}{outcome['recorded_seconds']:>12.2f}"
+              f"{outcome['replay_seconds']:>10.2f}{outcome['overhead_seconds'] * 1000:>13.1f}  "
+              f"{'same' if outcome['matches'] else 'DIVERGED'}")
+
+    diverged = sum(not outcome["matches"] for outcome in results)
+    overheads = [outcome["overhead_seconds"] * 1000 for outcome in results]
+    print(f"{len(results)} traces, {diverged} diverged, overhead per trace "
+          f"p50 {common.percentile(overheads, 50):.1f} ms, p99 {common.percentile(overheads, 99):.1f} ms")
+    if profiler:
+        pstats.Stats(profiler).sort_stats("tottime").print_stats(profile)
+    return 1 if diverged else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="a trace file, or a directory of them")
+    parser.add_argument("--speed", type=float, default=1.0, help="scale of the recorded delays, 0 for none")
+    parser.add_argument("--limit", type=int, default=0, help="replay at most this many traces")
+    parser.add_argument("--profile", type=int, default=0, metavar="N",
+                        help="profile the replays and print the N most expensive functions")
+    args = parser.parse_args()
+    sys.exit(main(args.path, args.speed, args.limit, args.profile))
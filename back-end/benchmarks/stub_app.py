@@ -0,0 +1,38 @@
+"""
+The app with the stub agent, for serving from worker processes
+
+    uv run python -m app.serve --workers 2 --app benchmarks.stub_app:app
+
+Each worker imports this module, which installs the stub LLM and fake search
+(latency from STUB_LLM_LATENCY / STUB_SEARCH_LATENCY, searches per question
+from STUB_STEPS) and tags every response with an X-Worker-Pid header, so
+multi-worker tests and benchmarks can tell which worker answered.
+"""
+
+import os
+
+from . import common  # noqa: F401 - sets the API keys needed to import app
+
+from app.main import app as _app
+
+from .common import install_stub_agent
+
+install_stub_agent(
+    llm_latency=float(os.getenv("STUB_LLM_LATENCY", "0.05")),
+    search_latency=float(os.getenv("STUB_SEARCH_LATENCY", "0.05")),
+    steps=int(os.getenv("STUB_STEPS", "1")),
+)
+
+_PID_HEADER = (b"x-worker-pid", str(os.getpid()).encode())
+
+
+async def app(scope, receive, send):
+    if scope["type"] != "http":
+        return await _app(scope, receive, send)
+
+    async def send_with_pid(message):
+        if message["type"] == "http.response.start":
+            message = {**message, "headers": [*message.get("headers", []), _PID_HEADER]}
+        await send(message)
+
+    await _app(scope, receive, send_with_pid)
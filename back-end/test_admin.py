@@ -5,7 +5,6 @@ Test admin account functionality without role field in database
 from fastapi.testclient import TestClient
 from app.main import app
 from app.db import authenticate, is_admin_user, get_user_by_email
-import hashlib
 
 client = TestClient(app)
 
@@ -47,8 +46,7 @@ def test_admin_account():
     
     # Test 3: Test admin authentication
     print("\n3️⃣ Testing admin authentication...")
-    password_hash = hashlib.sha256(admin_password.encode()).hexdigest()
-    auth_result = authenticate(admin_email, password_hash)
+    auth_result = authenticate(admin_email, admin_password)
     
     if auth_result:
         user_id, email, pwd_hash, is_admin = auth_result
@@ -111,8 +109,7 @@ def test_regular_user_vs_admin():
         print(f"Failed to create regular user: {register_response.json()}")
     
     # Test regular user authentication
-    password_hash = hashlib.sha256(regular_password.encode()).hexdigest()
-    regular_auth = authenticate(regular_email, password_hash)
+    regular_auth = authenticate(regular_email, regular_password)
     
     if regular_auth:
         user_id, email, pwd_hash, is_admin = regular_auth
@@ -143,6 +140,19 @@ def test_case_insensitive_admin_check():
     
     print("✅ Case insensitive admin check working!")
 
+def test_stats_endpoints_are_for_admins_only():
+    """Operational statistics are not shown to regular users"""
+    from app.routes.auth import create_access_token
+
+    def headers(is_admin):
+        token = create_access_token(email="stats@example.com", user_id=7070, is_admin=is_admin)
+        return {"Authorization": f"Bearer {token}"}
+
+    for path in ("/api/chat/cache/stats", "/api/chat/admission/stats", "/api/chat/usage/stats"):
+        assert client.get(path).status_code == 401
+        assert client.get(path, headers=headers(False)).status_code == 403
+        assert client.get(path, headers=headers(True)).status_code == 200
+
 if __name__ == "__main__":
     try:
         # Test admin functionality
@@ -0,0 +1,107 @@
+"""
+Tests for admission control of agent runs
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.ai.admission import AdmissionController, AdmissionRejected
+from app.ai.history import conversation_history
+from app.main import app
+from app.routes import chat
+from benchmarks.common import auth_headers, install_stub_agent
+
+
+def test_waiting_users_are_served_round_robin():
+    async def scenario():
+        controller = AdmissionController(max_active=1, max_queued=10, max_queued_per_user=10)
+        order = []
+
+        async def ask(user, label):
+            async with controller.admit(user):
+                order.append(label)
+                await asyncio.sleep(0.01)
+
+        tasks = [asyncio.create_task(ask("heavy", f"heavy{i}")) for i in range(4)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(ask("light", "light")))
+        await asyncio.gather(*tasks)
+        return order, controller.stats()
+
+    order, stats = asyncio.run(scenario())
+
+    # The light user waits for one heavy run, not for all of them
+    assert order == ["heavy0", "heavy1", "light", "heavy2", "heavy3"]
+    assert stats["admitted"] == 5 and stats["active"] == stats["queued"] == 0
+    assert stats["wait_seconds_max"] > 0
+
+
+def test_overload_is_rejected_early_with_a_retry_hint():
+    async def scenario():
+        controller = AdmissionController(max_active=1, max_queued=2, max_queued_per_user=1, max_wait_seconds=0.05)
+        async with controller.admit("a"):
+            waiting = asyncio.create_task(controller.admit("a").__aenter__())
+            await asyncio.sleep(0)
+            with pytest.raises(AdmissionRejected) as per_user:
+                await controller.admit("a").__aenter__()
+            waiting.cancel()
+            await asyncio.sleep(0)
+            with pytest.raises(AdmissionRejected) as timed_out:
+                await controller.admit("b").__aenter__()
+        return per_user.value, timed_out.value, controller.stats()
+
+    per_user, timed_out, stats = asyncio.run(scenario())
+
+    assert per_user.reason == "user_queue_full" and per_user.retry_after >= 1
+    assert timed_out.reason == "wait_timeout"
+    assert stats["rejected"] == {"user_queue_full": 1, "wait_timeout": 1}
+    assert stats["active"] == stats["queued"] == 0
+
+
+def test_slot_of_a_cancelled_request_is_held_until_its_worker_finishes():
+    pool = ThreadPoolExecutor(max_workers=1)
+    release = threading.Event()
+
+    async def scenario():
+        controller = AdmissionController(max_active=1)
+
+        async def ask():
+            async with controller.admit("a") as slot:
+                return await slot.hold(pool.submit(release.wait, 5))
+
+        abandoned = asyncio.create_task(ask())
+        await asyncio.sleep(0.05)
+        abandoned.cancel()
+        await asyncio.gather(abandoned, return_exceptions=True)
+        # The worker thread is still busy, so the next request has to wait
+        during = controller.stats()
+        waiting = asyncio.create_task(ask())
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+
+        release.set()
+        await waiting
+        return during, controller.stats()
+
+    during, after = asyncio.run(scenario())
+    pool.shutdown()
+
+    assert during["active"] == 1
+    assert after["active"] == 0 and after["admitted"] == 2
+
+
+def test_ask_returns_429_with_retry_after(monkeypatch):
+    install_stub_agent(llm_latency=0, search_latency=0)
+    monkeypatch.setattr(chat, "ANSWER_CACHE_ENABLED", False)
+    monkeypatch.setattr(conversation_history, "enabled", False)
+    monkeypatch.setattr(chat, "admission", AdmissionController(max_active=0, max_queued=0))
+
+    response = TestClient(app).post(
+        "/api/chat/ask", json={"question": "Where is the library?"}, headers=auth_headers(user_id=4343)
+    )
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
@@ -0,0 +1,65 @@
+"""
+Tests for per-request agent budgets
+"""
+from app.ai.budget import BEST_EFFORT_PREFIX, AgentBudget, run_with_budget
+from app.ai.llm import build_agent_executor, process_result
+from benchmarks.fakes import FakeTavilySearch, StubReActLLM
+
+
+def _run(steps, budget, llm_latency=0.0, executor_budget=None):
+    search = FakeTavilySearch()
+    executor = build_agent_executor(StubReActLLM(steps=steps, latency=llm_latency), [search],
+                                    budget=executor_budget)
+    inputs = {"input": "When does the fall semester start?", "chat_history": ""}
+    return run_with_budget(executor, inputs, budget), search
+
+
+def test_run_within_budget_reports_usage():
+    result, search = _run(steps=2, budget=AgentBudget())
+
+    assert result["output"].startswith("Stub answer to:")
+    assert result["budget_usage"]["tool_calls"] == search.calls == 2
+    assert result["budget_usage"]["exhausted"] is None
+
+    # Three LLM calls: two searches and the final answer
+    iterations = result["budget_usage"]["iterations"]
+    assert len(iterations) == 3
+    assert iterations[0]["input_tokens"] < iterations[-1]["input_tokens"]
+    assert result["budget_usage"]["tokens"] == sum(it["input_tokens"] + it["output_tokens"] for it in iterations)
+
+
+def test_runaway_agent_is_stopped_at_the_tool_call_limit():
+    result, search = _run(steps=50, budget=AgentBudget(max_tool_calls=3))
+
+    assert search.calls == 3
+    assert result["budget_usage"]["exhausted"] == "tool_calls"
+    assert result["output"].startswith(BEST_EFFORT_PREFIX)
+    # Sources gathered before the stop are kept
+    assert len(process_result(result).sources) == 9
+
+
+def test_deadline_and_token_limits():
+    slow, _ = _run(steps=50, budget=AgentBudget(deadline_seconds=0.2), llm_latency=0.05)
+    wordy, _ = _run(steps=50, budget=AgentBudget(max_tokens=1))
+
+    assert slow["budget_usage"]["exhausted"] == "deadline"
+    assert slow["budget_usage"]["elapsed_seconds"] < 0.5
+    assert wordy["budget_usage"]["exhausted"] == "tokens"
+    assert wordy["budget_usage"]["tool_calls"] == 0
+
+
+def test_executor_is_bounded_without_run_with_budget():
+    search = FakeTavilySearch()
+    executor = build_agent_executor(StubReActLLM(steps=50), [search], budget=AgentBudget(max_tool_calls=3))
+
+    result = executor.invoke({"input": "When does the fall semester start?", "chat_history": ""})
+
+    # Four iterations: the budget's three tool calls plus one for the answer
+    assert search.calls == 4
+    assert result["output"].startswith("Agent stopped")
+
+    # Under run_with_budget, a stop by the executor's limits still gets a best-effort answer
+    result, search = _run(steps=50, budget=AgentBudget(), executor_budget=AgentBudget(max_tool_calls=2))
+    assert search.calls == 3
+    assert result["budget_usage"]["exhausted"] == "iterations"
+    assert result["output"].startswith(BEST_EFFORT_PREFIX)
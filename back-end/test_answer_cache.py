@@ -0,0 +1,82 @@
+"""
+Tests for the answer cache in front of the agent
+"""
+from app.ai.answer_cache import AnswerCache
+from app.ai.llm_schema import Source
+
+
+def _cache(date="10-01-2025"):
+    today = {"date": date}
+    cache = AnswerCache(date_provider=lambda: today["date"])
+    return cache, today
+
+
+def test_exact_repeat_after_normalization_hits():
+    cache, _ = _cache()
+    cache.store("Where can I find calculus tutoring?", ["Try UASP."], [Source(url="https://tutoring.asu.edu")])
+
+    entry = cache.lookup("  where can i find CALCULUS tutoring ")
+    assert entry is not None
+    assert entry.answer == ["Try UASP."]
+    assert entry.sources[0].url == "https://tutoring.asu.edu"
+    assert cache.stats()["exact_hits"] == 1
+
+
+def test_near_duplicate_hits_but_different_numbers_miss():
+    cache, _ = _cache()
+    cache.store("ASU academic calendar 2025", ["Fall starts Aug 21."], [])
+
+    assert cache.lookup("academic calendar ASU 2025?") is not None
+    assert cache.lookup("ASU academic calendar 2026") is None
+    assert cache.lookup("How do I pay for parking?") is None
+
+    stats = cache.stats()
+    assert stats["similar_hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_time_sensitive_answers_expire_when_the_date_changes():
+    cache, today = _cache()
+    cache.store("What events are on campus this week?", ["Career fair."], [])
+    cache.store("Where is Hayden Library?", ["Tempe campus."], [])
+    assert cache.lookup("What events are on campus this week?") is not None
+
+    today["date"] = "10-02-2025"
+    assert cache.lookup("What events are on campus this week?") is None
+    assert cache.lookup("Where is Hayden Library?") is not None
+
+
+def test_failed_answers_are_not_cached():
+    cache, _ = _cache()
+    cache.store("asdfgh", ["I don't get what you mean, can you explain it?"], [])
+
+    assert cache.lookup("asdfgh") is None
+
+
+def test_questions_differing_in_one_meaningful_word_miss():
+    cache, _ = _cache()
+    pairs = [
+        ("What are the Memorial Union hours in the fall semester?",
+         "What are the Memorial Union hours in the spring semester?"),
+        ("What are the undergraduate computer science degree requirements at ASU?",
+         "What are the graduate computer science degree requirements at ASU?"),
+        ("Is Hayden library open on Sunday?", "Is Hayden library closed on Sunday?"),
+    ]
+    for stored, asked in pairs:
+        cache.store(stored, [f"Answer to: {stored}"], [])
+
+    for stored, asked in pairs:
+        assert cache.lookup(asked) is None, asked
+    # A typo in a longer word still finds the answer
+    entry = cache.lookup("What are the Memorial Union hours in the fall semestr?")
+    assert entry.answer == ["Answer to: What are the Memorial Union hours in the fall semester?"]
+
+
+def test_questions_differing_in_the_question_word_miss():
+    cache, _ = _cache()
+    cache.store("Where is the ASU parking office?", ["In the Fulton Center."], [])
+    cache.store("Who is the ASU president?", ["Michael Crow."], [])
+
+    assert cache.lookup("When is the ASU parking office?") is None
+    assert cache.lookup("Why is the ASU president?") is None
+    assert cache.lookup("where is the parking office at ASU").answer == ["In the Fulton Center."]
@@ -0,0 +1,63 @@
+"""
+Tests for the ASGI authentication middleware
+"""
+import asyncio
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.main import AuthenticationMiddleware
+from app.routes.auth import create_access_token
+
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(AuthenticationMiddleware)
+
+    @app.get("/api/whoami")
+    async def whoami(request: Request):
+        return {"email": request.state.user_email, "user_id": request.state.user_id}
+
+    @app.get("/static/js/main.js")
+    async def asset():
+        return {"public": True}
+
+    @app.get("/api/stream")
+    async def stream():
+        async def chunks():
+            for i in range(3):
+                yield f"chunk {i}\n"
+                await asyncio.sleep(0)
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    return app
+
+
+client = TestClient(_app())
+headers = {"Authorization": f"Bearer {create_access_token('asgi@example.com', 5)}"}
+
+
+def test_rejections_match_previous_responses():
+    missing = client.get("/api/whoami")
+    malformed = client.get("/api/whoami", headers={"Authorization": "Bearer "})
+    invalid = client.get("/api/whoami", headers={"Authorization": "Bearer not-a-jwt"})
+
+    assert missing.status_code == malformed.status_code == invalid.status_code == 401
+    assert missing.json() == {"detail": "Authentication required"}
+    assert malformed.json() == {"detail": "Invalid token format"}
+    assert invalid.json() == {"detail": "Invalid or expired token"}
+    assert missing.headers["www-authenticate"] == "Bearer"
+
+
+def test_public_prefixes_and_user_state():
+    assert client.get("/static/js/main.js").json() == {"public": True}
+    assert client.get("/api/whoami", headers=headers).json() == {"email": "asgi@example.com", "user_id": 5}
+
+
+def test_streaming_body_passes_through_in_chunks():
+    with client.stream("GET", "/api/stream", headers=headers) as response:
+        assert response.status_code == 200
+        chunks = list(response.iter_text())
+
+    assert "".join(chunks) == "chunk 0\nchunk 1\nchunk 2\n"
@@ -0,0 +1,37 @@
+"""
+Tests for the batch question endpoint
+"""
+import json
+
+from fastapi.testclient import TestClient
+
+from app.ai.history import conversation_history
+from app.ai.memory import conversation_store
+from app.ai.runner import usage_stats
+from app.main import app
+from app.routes import chat
+from benchmarks.common import auth_headers, install_stub_agent
+
+
+def test_batch_answers_each_item_and_runs_repeated_questions_once(monkeypatch):
+    monkeypatch.setattr(chat, "ANSWER_CACHE_ENABLED", False)
+    monkeypatch.setattr(conversation_history, "enabled", False)
+    install_stub_agent(llm_latency=0, search_latency=0)
+    questions = ["Where is the library?", "where is the LIBRARY", "When is spring break?"]
+    runs = usage_stats.runs
+
+    response = TestClient(app).post(
+        "/api/chat/ask/batch",
+        json={"requests": [{"question": q, "conversation_id": "batch"} for q in questions]},
+        headers=auth_headers(user_id=4242),
+    )
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+    by_index = {line["index"]: line["response"] for line in lines}
+    assert by_index[1]["question"] == questions[1]
+    assert by_index[0]["answer"] == by_index[1]["answer"] == ["Stub answer to: Where is the library?"]
+    assert usage_stats.runs - runs == 2
+    # Both answered questions were added to the conversation
+    assert len(conversation_store.get_messages(4242, "batch")) == 4
@@ -0,0 +1,176 @@
+"""
+Tests for persistent conversation history
+"""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import db
+from app.ai.history import ConversationHistory
+from app.ai.memory import ConversationStore
+from app.main import app
+from benchmarks.common import auth_headers
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'history.db'}")
+
+    async def create_tables():
+        async with engine.begin() as connection:
+            await connection.run_sync(db.Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    monkeypatch.setattr(db, "async_db", engine)
+    monkeypatch.setattr(db, "AsyncSession", async_sessionmaker(engine, expire_on_commit=False))
+    yield ConversationHistory(ConversationStore(window=2), batch_size=3, flush_seconds=0.01)
+    asyncio.run(engine.dispose())
+
+
+def test_turns_are_written_in_batches_and_reloaded_on_resume(history):
+    async def scenario():
+        for i in range(3):
+            await history.save_turn(1, "default", f"question {i}", f"answer {i}")
+        await history.save_turn(2, "default", "someone else", "private")
+        await history.close()
+
+        # A restarted process only has the database
+        resumed = ConversationHistory(ConversationStore(window=2))
+        return await resumed.get_chat_history(1, "default"), await resumed.get_chat_history(3, "default")
+
+    chat_history, empty = asyncio.run(scenario())
+
+    assert chat_history == "Human: question 1\nAI: answer 1\nHuman: question 2\nAI: answer 2"
+    assert empty == ""
+
+
+def test_messages_are_paginated_newest_first(history):
+    async def scenario():
+        for i in range(5):
+            await history.save_turn(1, "trip", f"question {i}", f"answer {i}")
+        first = await history.get_messages_page(1, "trip", limit=4)
+        second = await history.get_messages_page(1, "trip", before_seq=first[-1].seq, limit=4)
+        conversations = await db.get_conversations_page_async(1)
+        await history.close()
+        return first, second, conversations
+
+    first, second, conversations = asyncio.run(scenario())
+
+    assert [m.content for m in first] == ["answer 4", "question 4", "answer 3", "question 3"]
+    assert [m.content for m in second] == ["answer 2", "question 2", "answer 1", "question 1"]
+    assert [m.seq for m in second] == [6, 5, 4, 3]
+    assert [c.conversation_id for c in conversations] == ["trip"]
+
+
+def test_pages_follow_seq_and_a_seq_is_stored_once(history):
+    # Written together, out of seq order: created_at and id do not follow seq
+    rows = [{"user_id": 1, "conversation_id": "c", "seq": seq, "role": "human", "content": f"message {seq}",
+             "created_at": 100.0} for seq in (4, 3, 2, 1)]
+
+    async def scenario():
+        await db.save_messages_async(rows)
+        first = await db.get_messages_page_async(1, "c", limit=2)
+        second = await db.get_messages_page_async(1, "c", before_seq=first[-1].seq, limit=2)
+        recent = await db.load_recent_messages_async(1, "c", 3)
+        await db.save_messages_async([{**rows[0], "content": "again"}])
+        return first, second, recent, await db.load_recent_messages_async(1, "c", 10)
+
+    first, second, recent, stored = asyncio.run(scenario())
+
+    assert [m.seq for m in first] == [4, 3] and [m.seq for m in second] == [2, 1]
+    assert [seq for seq, _, _ in recent] == [2, 3, 4]
+    assert [content for _, _, content in stored] == [f"message {seq}" for seq in (1, 2, 3, 4)]
+
+
+def test_a_conflicting_row_does_not_drop_the_rest_of_its_batch(history):
+    async def scenario():
+        await db.save_messages_async([{"user_id": 1, "conversation_id": "c", "seq": 1, "role": "human",
+                                       "content": "stored earlier", "created_at": 100.0}])
+        # Another worker numbered a turn of conversation c from 1 again
+        await history.save_turn(1, "c", "Where is the gym?", "The SDFC.")
+        await history.save_turn(2, "c", "Where is the library?", "Hayden Library.")
+        await history.save_turn(1, "d", "Is there parking?", "Yes.")
+        await history.close()
+        return [await db.load_recent_messages_async(user_id, conversation_id, 10)
+                for user_id, conversation_id in ((1, "c"), (2, "c"), (1, "d"))]
+
+    assert asyncio.run(scenario()) == [
+        [(1, "human", "stored earlier"), (2, "ai", "The SDFC.")],
+        [(1, "human", "Where is the library?"), (2, "ai", "Hayden Library.")],
+        [(1, "human", "Is there parking?"), (2, "ai", "Yes.")],
+    ]
+
+
+def test_resume_reads_queued_rows_without_writing_the_queue(history, monkeypatch):
+    writes = []
+    save = db.save_messages_async
+
+    async def recording_save(messages):
+        writes.append(messages)
+        await save(messages)
+
+    monkeypatch.setattr(db, "save_messages_async", recording_save)
+    history.batch_size, history.flush_seconds = 200, 60
+
+    async def scenario():
+        await history.save_turn(1, "c", "Where is the library?", "Hayden Library.")
+        await history.save_turn(2, "c", "Where is the gym?", "The SDFC.")
+        # The conversation leaves memory before its rows were written
+        history.store = ConversationStore(window=2)
+        chat_history = await history.get_chat_history(1, "c")
+        pending = len(history._pending)
+        page = await history.get_messages_page(1, "c")
+        left = len(history._pending)
+        await history.close()
+        return chat_history, pending, page, left
+
+    chat_history, pending, page, left = asyncio.run(scenario())
+
+    assert chat_history == "Human: Where is the library?\nAI: Hayden Library."
+    assert pending == 4 and writes[0] == [row for row in writes[0] if row["user_id"] == 1]
+    # Listing writes only this conversation's rows
+    assert [m.seq for m in page] == [2, 1] and left == 2
+
+
+def test_resume_fails_rather_than_renumbering_when_the_history_cannot_be_loaded(history, monkeypatch):
+    load = db.load_recent_messages_async
+
+    async def unavailable(*args):
+        raise OSError("database is unavailable")
+
+    async def scenario():
+        await history.save_turn(1, "c", "Where is the library?", "Hayden Library.")
+        await history.close()
+        resumed = ConversationHistory(ConversationStore(window=2))
+
+        monkeypatch.setattr(db, "load_recent_messages_async", unavailable)
+        with pytest.raises(OSError):
+            await resumed.get_chat_history(1, "c")
+        monkeypatch.setattr(db, "load_recent_messages_async", load)
+        await resumed.get_chat_history(1, "c")
+        seq = await resumed.save_turn(1, "c", "When does it open?", "At 7am.")
+        await resumed.close()
+        return seq
+
+    assert asyncio.run(scenario()) == 4
+
+
+def test_conversation_pages_keep_conversations_updated_at_the_same_time(history):
+    # One batch: all five conversations share an updated_at
+    rows = [{"user_id": 7, "conversation_id": f"c{i}", "seq": 1, "role": "human", "content": "Hi",
+             "created_at": 100.0} for i in range(5)]
+    asyncio.run(db.save_messages_async(rows))
+    client, headers = TestClient(app), auth_headers(user_id=7)
+
+    seen, before = [], None
+    while True:
+        params = {"limit": 2, **({"before": before} if before else {})}
+        page = client.get("/api/chat/conversations", params=params, headers=headers).json()
+        seen += [c["conversation_id"] for c in page["conversations"]]
+        if (before := page["next_before"]) is None:
+            break
+
+    assert sorted(seen) == [f"c{i}" for i in range(5)] and len(seen) == 5
+    assert client.get("/api/chat/conversations", params={"before": "soon"}, headers=headers).status_code == 400
@@ -0,0 +1,72 @@
+"""
+Tests for the per-user conversation store
+"""
+import time
+
+from app.ai.memory import ConversationStore
+
+
+def test_conversations_are_isolated_per_user_and_id():
+    """Users and conversations never see each other's messages"""
+    store = ConversationStore()
+    store.save_turn(1, "default", "Where is the library?", "Hayden Library.")
+    store.save_turn(2, "default", "When is parking open?", "All day.")
+    store.save_turn(1, "other", "Any events?", "Career fair.")
+
+    assert store.get_messages(1, "default") == [
+        ("human", "Where is the library?"),
+        ("ai", "Hayden Library."),
+    ]
+    assert store.get_chat_history(2, "default") == "Human: When is parking open?\nAI: All day."
+    assert store.get_messages(1, "other")[0] == ("human", "Any events?")
+    assert store.get_messages(3, "default") == []
+
+
+def test_history_is_windowed_and_messages_truncated():
+    """Only the last `window` exchanges are kept and long messages are cut"""
+    store = ConversationStore(window=2, max_message_chars=10)
+    for i in range(5):
+        store.save_turn(1, "default", f"question {i}", "x" * 50)
+
+    messages = store.get_messages(1, "default")
+    assert len(messages) == 4
+    assert messages[0] == ("human", "question 3")
+    assert messages[1] == ("ai", "x" * 10)
+
+
+def test_least_recently_used_conversations_are_evicted():
+    """The store never holds more than max_sessions conversations"""
+    store = ConversationStore(max_sessions=2)
+    store.save_turn(1, "a", "q", "a")
+    store.save_turn(2, "a", "q", "a")
+    store.get_messages(1, "a")  # touch user 1 so user 2 is the oldest
+    store.save_turn(3, "a", "q", "a")
+
+    assert store.stats()["size"] == 2
+    assert store.get_messages(2, "a") == []
+    assert store.get_messages(1, "a") != []
+
+
+def test_idle_conversations_expire():
+    """Conversations are dropped once their TTL passes"""
+    store = ConversationStore(ttl_seconds=0.05)
+    store.save_turn(1, "default", "q", "a")
+    time.sleep(0.1)
+
+    assert store.get_messages(1, "default") == []
+
+
+def test_history_cursor_returns_only_new_messages():
+    """Messages are numbered so clients can fetch only what they have not seen"""
+    store = ConversationStore(window=2)
+    store.save_turn(1, "default", "q1", "a1")
+    seen, cursor = store.get_serialized(1, "default")
+    last = store.save_turn(1, "default", "q2", "a2")
+    new, next_cursor = store.get_serialized(1, "default", after=cursor)
+
+    assert cursor == 2 and next_cursor == last == 4
+    assert new == [{"seq": 3, "role": "human", "content": "q2"}, {"seq": 4, "role": "ai", "content": "a2"}]
+    assert store.get_serialized(1, "default", after=next_cursor) == ([], 4)
+    assert store.get_serialized(1, "default", limit=1)[0] == [new[-1]]
+    # Serialized messages are built once, not on every request
+    assert store.get_serialized(1, "default")[0][0] is seen[0]
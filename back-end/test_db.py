@@ -0,0 +1,98 @@
+"""
+Tests for the async database functions used by request handlers
+"""
+import asyncio
+
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession as SQLAlchemyAsyncSession
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import db
+from app.passwords import PasswordHasher
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_async_engine(db._async_url(f"sqlite:///{tmp_path / 'app.db'}"))
+    db._configure_sqlite(engine.sync_engine)
+
+    async def create_tables():
+        async with engine.begin() as connection:
+            await connection.run_sync(db.Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    monkeypatch.setattr(db, "AsyncSession", async_sessionmaker(engine, expire_on_commit=False))
+    monkeypatch.setattr(db, "password_hasher", PasswordHasher(bcrypt_rounds=4, workers=2))
+    yield engine
+    asyncio.run(engine.dispose())
+
+
+def test_concurrent_registrations_of_one_account_create_it_once(engine, monkeypatch):
+    integrity_errors = []
+    sa.event.listen(engine.sync_engine, "handle_error",
+                    lambda context: integrity_errors.append(context.sqlalchemy_exception)
+                    if isinstance(context.sqlalchemy_exception, IntegrityError) else None)
+
+    async def scenario():
+        registrations = 8
+        barrier = asyncio.Barrier(registrations)
+
+        class RacingSession(SQLAlchemyAsyncSession):
+            """Session that waits for every registration to pass its existence check"""
+
+            async def scalar(self, *args, **kwargs):
+                result = await super().scalar(*args, **kwargs)
+                await barrier.wait()
+                return result
+
+        monkeypatch.setattr(db, "AsyncSession", async_sessionmaker(engine, class_=RacingSession,
+                                                                   expire_on_commit=False))
+        return await asyncio.gather(*(
+            db.create_user_async("sparky", "sparky@asu.edu", f"hash-{i}") for i in range(registrations)
+        ))
+
+    created = asyncio.run(scenario())
+
+    assert sum(user is not None for user in created) == 1
+    assert len(integrity_errors) == 7
+
+    async def count():
+        async with engine.connect() as connection:
+            return await connection.scalar(sa.select(sa.func.count()).select_from(db.User))
+
+    assert asyncio.run(count()) == 1
+
+
+def test_login_with_an_unknown_email_still_verifies_a_hash(engine, monkeypatch):
+    verified = []
+    verify_async = db.password_hasher.verify_async
+
+    async def recording_verify(password, stored_hash):
+        verified.append(stored_hash)
+        return await verify_async(password, stored_hash)
+
+    monkeypatch.setattr(db.password_hasher, "verify_async", recording_verify)
+
+    async def scenario():
+        await db.create_user_async("sparky", "sparky@asu.edu", db.password_hasher.hash("password123"))
+        return (await db.authenticate_async("nobody@asu.edu", "password123"),
+                await db.authenticate_async("sparky@asu.edu", "wrong"))
+
+    assert asyncio.run(scenario()) == (None, None)
+    # Both the miss and the wrong password cost one bcrypt verification
+    assert len(verified) == 2 and all(h.startswith("$2b$04$") for h in verified)
+
+
+@pytest.mark.skipif(db.async_db.dialect.name != "sqlite", reason="SQLite pragmas")
+def test_async_engine_connections_use_wal():
+    async def pragmas():
+        async with db.async_db.connect() as connection:
+            return [
+                (await connection.exec_driver_sql(f"PRAGMA {name}")).scalar()
+                for name in ("journal_mode", "synchronous", "busy_timeout")
+            ]
+
+    # synchronous=NORMAL is 1
+    assert asyncio.run(pragmas()) == ["wal", 1, 5000]
@@ -0,0 +1,94 @@
+"""
+Tests for the metrics registry and the /metrics endpoint
+"""
+from fastapi.testclient import TestClient
+from prometheus_client.parser import text_string_to_metric_families
+
+from app import main
+from app import metrics as metrics_module
+from app.ai.history import conversation_history
+from app.main import app
+from app.metrics import MetricsRegistry
+from app.routes import chat
+from benchmarks.common import auth_headers, install_stub_agent
+
+METRICS_HEADERS = {"Authorization": "Bearer scrape-secret"}
+
+
+def _families(text):
+    return {family.name: family for family in text_string_to_metric_families(text)}
+
+
+def test_histograms_render_cumulative_buckets_per_label():
+    registry = MetricsRegistry(enabled=True)
+    latency = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        latency.labels("/a").observe(value)
+    registry.collector(lambda: [("queued", "gauge", "Queued runs", [({}, 3)])])
+
+    families = _families(registry.render())
+
+    samples = {(s.name, s.labels.get("le")): s.value for s in families["latency_seconds"].samples}
+    assert samples[("latency_seconds_bucket", "0.1")] == 1
+    assert samples[("latency_seconds_bucket", "1.0")] == 2
+    assert samples[("latency_seconds_bucket", "+Inf")] == 3
+    assert samples[("latency_seconds_sum", None)] == 5.55
+    assert families["queued"].type == "gauge" and families["queued"].samples[0].value == 3
+
+
+def test_metrics_endpoint_is_absent_when_disabled(monkeypatch):
+    monkeypatch.setattr(metrics_module.metrics, "enabled", False)
+
+    assert TestClient(app).get("/metrics").status_code == 404
+
+
+def test_metrics_endpoint_requires_the_metrics_token(monkeypatch):
+    monkeypatch.setattr(metrics_module.metrics, "enabled", True)
+    client = TestClient(app)
+
+    monkeypatch.setattr(main, "METRICS_TOKEN", "")
+    assert client.get("/metrics", headers=METRICS_HEADERS).status_code == 404
+    monkeypatch.setattr(main, "METRICS_TOKEN", "scrape-secret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/metrics", headers=METRICS_HEADERS).status_code == 200
+
+
+def test_label_values_and_help_text_survive_the_exposition_format():
+    registry = MetricsRegistry(enabled=True)
+    odd = 'say "hi"\\path\nnext line'
+    registry.counter("odd_total", "Back\\slash\nand newline", ("value",)).labels(odd).inc()
+    registry.collector(lambda: [("stats_total", "counter", "Stats", [({"route": odd}, 2)])])
+
+    families = _families(registry.render())
+
+    assert families["odd"].documentation == "Back\\slash\nand newline"
+    assert [(s.name, s.labels, s.value) for s in families["odd"].samples if s.name == "odd_total"] == [
+        ("odd_total", {"value": odd}, 1.0)
+    ]
+    assert [(s.labels, s.value) for s in families["stats"].samples] == [({"route": odd}, 2.0)]
+
+
+def test_questions_are_timed_per_route_and_agent_iteration(monkeypatch):
+    monkeypatch.setattr(metrics_module.metrics, "enabled", True)
+    monkeypatch.setattr(main, "METRICS_TOKEN", "scrape-secret")
+    monkeypatch.setattr(chat, "ANSWER_CACHE_ENABLED", False)
+    monkeypatch.setattr(conversation_history, "enabled", False)
+    install_stub_agent(llm_latency=0, search_latency=0)
+    client = TestClient(app)
+    route = {"method": "POST", "route": "/api/chat/ask", "status": "200"}
+    registry = metrics_module.metrics
+    requests = registry.value("http_request_seconds_count", route)
+    llm_calls = registry.value("agent_llm_seconds_count")
+
+    response = client.post("/api/chat/ask", json={"question": "Where is the library?"},
+                           headers=auth_headers(user_id=77))
+    body = client.get("/metrics", headers=METRICS_HEADERS).text
+
+    assert response.status_code == 200
+    assert registry.value("http_request_seconds_count", route) == requests + 1
+    assert registry.value("agent_llm_seconds_count") > llm_calls
+    assert registry.value("question_seconds_count", {"outcome": "agent"}) >= 1
+    families = _families(body)
+    assert any(s.labels == route for s in families["http_request_seconds"].samples)
+    assert families["agent_runs_queued"].samples[0].value == 0
@@ -0,0 +1,95 @@
+"""
+Tests for multi-worker deployments: app.serve with worker processes sharing state
+"""
+import time
+
+import pytest
+from prometheus_client.parser import text_string_to_metric_families
+
+from benchmarks.bench_workers import ask_throughput, login, worker_env
+from benchmarks.common import balanced_clients, serve_workers
+from benchmarks.fakes import FakeRedisServer
+
+
+@pytest.fixture(scope="module")
+def redis_url():
+    with FakeRedisServer() as server:
+        yield server.url
+
+
+@pytest.fixture(scope="module")
+def sqlite_workers(tmp_path_factory):
+    with serve_workers(2, worker_env("sqlite", str(tmp_path_factory.mktemp("sqlite")))) as base_url:
+        yield base_url
+
+
+@pytest.fixture(scope="module")
+def redis_workers(tmp_path_factory, redis_url):
+    with serve_workers(2, worker_env("redis", str(tmp_path_factory.mktemp("redis")), redis_url)) as base_url:
+        yield base_url
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "redis"])
+def test_logout_and_conversations_are_shared_across_workers(request, backend):
+    base_url = request.getfixturevalue(f"{backend}_workers")
+    headers = login(base_url, f"shared-{backend}@example.com")
+    first, second = balanced_clients(base_url, workers=2, per_worker=1)
+    try:
+        assert first.get("/").headers["x-worker-pid"] != second.get("/").headers["x-worker-pid"]
+
+        first.post("/api/chat/ask", headers=headers,
+                   json={"question": "Where is the library?", "conversation_id": "tour"}).raise_for_status()
+        response = second.post("/api/chat/ask", headers=headers,
+                               json={"question": "When does it open?", "conversation_id": "tour"})
+        history = response.json()["conversation_history"]
+        assert [(m["seq"], m["role"]) for m in history] == [(1, "human"), (2, "ai"), (3, "human"), (4, "ai")]
+        assert history[0]["content"] == "Where is the library?"
+
+        assert first.get("/api/auth/me", headers=headers).status_code == 200
+        assert second.post("/api/auth/logout", headers=headers).status_code == 200
+        time.sleep(0.3)  # REVOCATION_REFRESH_SECONDS of the sqlite workers
+        assert first.get("/api/auth/me", headers=headers).status_code == 401
+        assert second.get("/api/auth/me", headers=headers).status_code == 401
+    finally:
+        first.close()
+        second.close()
+
+
+def test_throughput_scales_with_workers(tmp_path, redis_url, redis_workers):
+    """Two workers answer about twice as many questions as one when each is bound by its agent capacity"""
+    results = {}
+    with serve_workers(1, worker_env("redis", str(tmp_path), redis_url)) as one_worker:
+        for workers, base_url in ((1, one_worker), (2, redis_workers)):
+            headers = login(base_url, f"scaling{workers}@example.com")
+            clients = balanced_clients(base_url, workers, per_worker=4)
+            try:
+                results[workers] = ask_throughput(clients, headers, seconds=2, tag=f"scaling{workers}")
+            finally:
+                for client in clients:
+                    client.close()
+
+    assert results[1]["errors"] == results[2]["errors"] == 0
+    assert results[2]["qps"] >= 1.6 * results[1]["qps"]
+
+
+def test_metrics_cover_every_worker(tmp_path):
+    env = {**worker_env("sqlite", str(tmp_path)), "METRICS_ENABLED": "1", "METRICS_TOKEN": "scrape-secret",
+           "PROMETHEUS_MULTIPROC_DIR": str(tmp_path / "metrics")}
+
+    def requests_answered(client):
+        body = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"}).text
+        family = next(f for f in text_string_to_metric_families(body) if f.name == "http_request_seconds")
+        return sum(sample.value for sample in family.samples if sample.name == "http_request_seconds_count")
+
+    with serve_workers(2, env) as base_url:
+        first, second = balanced_clients(base_url, workers=2, per_worker=1)
+        try:
+            for _ in range(5):
+                first.get("/")
+            # Each scrape counts both workers' requests: the second adds only the first scrape
+            seen_by_first = requests_answered(first)
+            assert seen_by_first >= 5
+            assert requests_answered(second) == seen_by_first + 1
+        finally:
+            first.close()
+            second.close()
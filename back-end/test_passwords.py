@@ -0,0 +1,64 @@
+"""
+Tests for password hashing and the upgrade of legacy hashes
+"""
+import asyncio
+import hashlib
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import db
+from app.passwords import PasswordHasher
+
+
+def test_bcrypt_hashes_verify_and_outdated_costs_need_rehash():
+    hasher = PasswordHasher(bcrypt_rounds=4, workers=1)
+    stored = hasher.hash("password123")
+
+    assert stored.startswith("$2b$04$")
+    assert hasher.verify("password123", stored) == (True, False)
+    assert hasher.verify("wrong", stored) == (False, False)
+    assert PasswordHasher(bcrypt_rounds=5, workers=1).verify("password123", stored) == (True, True)
+    # Passwords longer than bcrypt's 72 bytes are not truncated
+    long_hash = hasher.hash("x" * 80)
+    assert hasher.verify("x" * 80, long_hash)[0] and not hasher.verify("x" * 72, long_hash)[0]
+
+
+def test_legacy_sha256_hashes_verify_once_and_need_rehash():
+    hasher = PasswordHasher(bcrypt_rounds=4, workers=1)
+    legacy = hashlib.sha256(b"password123").hexdigest()
+
+    assert hasher.verify("password123", legacy) == (True, True)
+    assert hasher.verify("wrong", legacy) == (False, False)
+
+
+@pytest.fixture
+def users_db(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'users.db'}")
+
+    async def create_tables():
+        async with engine.begin() as connection:
+            await connection.run_sync(db.Base.metadata.create_all)
+
+    asyncio.run(create_tables())
+    monkeypatch.setattr(db, "AsyncSession", async_sessionmaker(engine, expire_on_commit=False))
+    monkeypatch.setattr(db, "password_hasher", PasswordHasher(bcrypt_rounds=4, workers=2))
+    yield
+    asyncio.run(engine.dispose())
+
+
+def test_login_upgrades_a_legacy_hash(users_db):
+    async def scenario():
+        legacy = hashlib.sha256(b"password123").hexdigest()
+        await db.create_user_async("old@example.com", "old@example.com", legacy)
+        wrong = await db.authenticate_async("old@example.com", "wrong")
+        first = await db.authenticate_async("old@example.com", "password123")
+        second = await db.authenticate_async("old@example.com", "password123")
+        missing = await db.authenticate_async("nobody@example.com", "password123")
+        return wrong, first, second, missing, (await db.get_user_by_email_async("old@example.com")).password_hash
+
+    wrong, first, second, missing, stored = asyncio.run(scenario())
+
+    assert wrong is None and missing is None
+    assert first[0] == second[0]
+    assert stored.startswith("$2b$04$")
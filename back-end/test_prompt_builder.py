@@ -0,0 +1,39 @@
+"""
+Tests for the pre-rendered agent prompt
+"""
+from langchain_core.prompts import PromptTemplate
+
+from app.ai.prompt import PROMPT_TEMPLATE, get_prompt_template
+from app.ai.prompt_builder import PrerenderedPromptTemplate
+
+VARIABLES = ["input", "agent_scratchpad", "tool_names", "tools", "chat_history"]
+TOOLS = {"tools": "tavily_search: look things up, e.g. {\"query\": \"ASU\"}", "tool_names": "tavily_search"}
+INPUTS = {"input": "When is spring break?", "agent_scratchpad": "Thought: search", "chat_history": "Human: hi"}
+
+
+def test_matches_the_langchain_prompt_template():
+    prerendered = PrerenderedPromptTemplate(template=PROMPT_TEMPLATE, input_variables=VARIABLES)
+    reference = PromptTemplate(template=PROMPT_TEMPLATE, input_variables=VARIABLES)
+
+    expected = reference.partial(current_date="10-17-2026", **TOOLS).format(**INPUTS)
+    assert prerendered.partial(current_date="10-17-2026", **TOOLS).format(**INPUTS) == expected
+
+
+def test_current_date_is_read_on_every_format():
+    dates = iter(["10-17-2026", "10-18-2026"])
+    prompt = PrerenderedPromptTemplate(template=PROMPT_TEMPLATE, input_variables=VARIABLES)
+    prompt = prompt.partial(current_date=lambda: next(dates)).partial(**TOOLS)
+
+    assert "Current Date: 10-17-2026" in prompt.format(**INPUTS)
+    assert "Current Date: 10-18-2026" in prompt.format(**INPUTS)
+
+
+def test_compact_variant_lists_tools_once_and_can_drop_examples():
+    full = get_prompt_template("full")
+    compact = get_prompt_template("compact", few_shot=True)
+    minimal = get_prompt_template("compact", few_shot=False)
+
+    assert full == PROMPT_TEMPLATE and full.count("{tools}") == 2
+    assert compact.count("{tools}") == minimal.count("{tools}") == 1
+    assert "Example 1" in compact and "Example 1" not in minimal
+    assert len(minimal) < len(compact) < len(full)
@@ -0,0 +1,134 @@
+"""
+Tests for the token revocation store backends
+"""
+import asyncio
+
+import pytest
+import sqlalchemy as sa
+
+from app.revocation import (
+    MemoryRevocationStore,
+    RedisRevocationStore,
+    SQLiteRevocationStore,
+    token_id,
+)
+from benchmarks.fakes import FakeRedis
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _memory(clock):
+    return MemoryRevocationStore(clock=clock)
+
+
+def _sqlite(clock):
+    return SQLiteRevocationStore(engine=sa.create_engine("sqlite://"), clock=clock, purge_interval=0)
+
+
+def _redis(clock):
+    return RedisRevocationStore(FakeRedis(clock=clock), clock=clock)
+
+
+@pytest.fixture(params=[_memory, _sqlite, _redis], ids=["memory", "sqlite", "redis"])
+def store_and_clock(request):
+    clock = Clock()
+    return request.param(clock), clock
+
+
+def test_revoked_token_is_rejected_until_it_expires(store_and_clock):
+    store, clock = store_and_clock
+    store.revoke("abc", clock.now + 60)
+
+    assert store.is_revoked("abc")
+    assert not store.is_revoked("other")
+
+    clock.now += 61
+    assert not store.is_revoked("abc")
+
+
+def test_expired_entries_are_purged(store_and_clock):
+    store, clock = store_and_clock
+    for i in range(100):
+        store.revoke(f"short-{i}", clock.now + 10)
+    store.revoke("long", clock.now + 3600)
+
+    clock.now += 20
+    store.revoke("new", clock.now + 3600)
+    store.purge_expired()
+
+    assert len(store) == 2
+    assert store.is_revoked("long")
+
+
+def test_already_expired_tokens_are_not_stored(store_and_clock):
+    store, clock = store_and_clock
+    store.revoke("old", clock.now - 1)
+
+    assert len(store) == 0
+
+
+def test_sqlite_lookups_are_answered_from_memory_and_refreshed(tmp_path):
+    clock = Clock()
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'revoked.db'}")
+    statements = []
+    sa.event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    worker_a = SQLiteRevocationStore(engine=engine, clock=clock, refresh_interval=5)
+    worker_b = SQLiteRevocationStore(engine=engine, clock=clock, refresh_interval=5)
+    # As the app's lifespan does
+    worker_a.open()
+    worker_b.open()
+
+    asyncio.run(worker_a.revoke_async("abc", clock.now + 60))
+    statements.clear()
+    assert asyncio.run(worker_a.is_revoked_async("abc"))
+    assert not asyncio.run(worker_b.is_revoked_async("abc"))
+    assert statements == []
+
+    # Worker B picks up the revocation on its next refresh
+    clock.now += 5
+    assert asyncio.run(worker_b.is_revoked_async("abc"))
+    assert SQLiteRevocationStore(engine=engine, clock=clock).is_revoked("abc")
+
+    clock.now += 60
+    assert not worker_b.is_revoked("abc")
+
+
+def test_token_id_prefers_jti_and_never_returns_the_token():
+    token = "header.payload.signature"
+
+    assert token_id({"jti": "abc123"}, token) == "abc123"
+    legacy_id = token_id({}, token)
+    assert legacy_id != token and len(legacy_id) == 64
+
+
+def test_sqlite_refresh_reads_only_new_revocations(tmp_path):
+    clock = Clock()
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'revoked.db'}")
+    worker_a = SQLiteRevocationStore(engine=engine, clock=clock, refresh_interval=1)
+    worker_b = SQLiteRevocationStore(engine=engine, clock=clock, refresh_interval=1)
+    for i in range(50):
+        worker_a.revoke(f"old-{i}", clock.now + 3600)
+    clock.now += 60
+    worker_b.open()
+
+    loaded = []
+    revoke = worker_b._revoked.revoke
+    worker_b._revoked.revoke = lambda jti, expires_at: (loaded.append(jti), revoke(jti, expires_at))
+
+    clock.now += 1
+    worker_a.revoke("new", clock.now + 3600)
+    worker_a.revoke("short", clock.now + 30)
+    clock.now += 1
+    assert worker_b.is_revoked("new") and worker_b.is_revoked("old-7")
+    assert sorted(loaded) == ["new", "short"]
+
+    # Expired entries leave the in-memory copy on a refresh
+    clock.now += 60
+    worker_b.refresh()
+    assert not worker_b.is_revoked("short") and len(worker_b._revoked) == 51
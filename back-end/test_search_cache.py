@@ -0,0 +1,138 @@
+"""
+Tests for the search cache behind the agent's search tool
+"""
+import threading
+import time
+
+from langchain_core.tools import BaseTool
+
+from app.ai.search_cache import SearchCache
+from app.ai.tools import CachedSearchTool
+from app.shared_state import MemorySharedStore
+
+RESULT = {"results": [{"url": "https://www.asu.edu/parking"}]}
+
+
+class GatedFetch:
+    """Upstream search that blocks until released, counting its calls"""
+
+    def __init__(self, outcome=RESULT):
+        self.outcome = outcome
+        self.calls = 0
+        self.release = threading.Event()
+
+    def __call__(self, query):
+        self.calls += 1
+        self.release.wait(5)
+        if isinstance(self.outcome, Exception):
+            raise self.outcome
+        return self.outcome
+
+
+class FakeSearch(BaseTool):
+    name: str = "tavily_search"
+    description: str = "Search the web"
+    calls: int = 0
+
+    def _run(self, query: str):
+        self.calls += 1
+        return {"results": [{"url": f"https://www.asu.edu/{query}"}]}
+
+
+def _ask_concurrently(cache, fetch, queries):
+    """Call get_or_fetch from one thread per query once they all wait; return results or exceptions"""
+    results = [None] * len(queries)
+
+    def run(i):
+        try:
+            results[i] = cache.get_or_fetch(queries[i], fetch)
+        except Exception as exc:
+            results[i] = exc
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(queries))]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while cache.stats()["coalesced"] < len(queries) - 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    fetch.release.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_identical_queries_make_one_upstream_call():
+    cache, fetch = SearchCache(), GatedFetch()
+
+    results = _ask_concurrently(cache, fetch, ["ASU parking", "asu  parking", '"ASU Parking"', "asu parking"])
+
+    assert results == [RESULT] * 4
+    assert fetch.calls == 1
+    stats = cache.stats()
+    assert stats["upstream_calls"] == 1 and stats["coalesced"] == 3 and stats["in_flight"] == 0
+    assert cache.get_or_fetch("ASU parking", fetch) == RESULT and fetch.calls == 1
+
+
+def test_leader_exception_reaches_every_waiter_and_is_not_cached():
+    cache, fetch = SearchCache(), GatedFetch(RuntimeError("Tavily is down"))
+
+    results = _ask_concurrently(cache, fetch, ["ASU parking"] * 3)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert fetch.calls == 1 and cache.stats()["in_flight"] == 0
+
+    # No stale in-flight future: the next call searches again
+    fetch.outcome = RESULT
+    assert cache.get_or_fetch("ASU parking", fetch) == RESULT
+    assert fetch.calls == 2
+
+
+def test_results_expire_and_empty_results_are_not_cached():
+    cache = SearchCache(ttl_seconds=0.05)
+    fetch = GatedFetch()
+    fetch.release.set()
+
+    cache.get_or_fetch("ASU parking", fetch)
+    cache.get_or_fetch("ASU parking", fetch)
+    assert fetch.calls == 1
+    time.sleep(0.1)
+    cache.get_or_fetch("ASU parking", fetch)
+    assert fetch.calls == 2
+
+    fetch.outcome = {"results": []}
+    cache.get_or_fetch("ASU tunnels", fetch)
+    cache.get_or_fetch("ASU tunnels", fetch)
+    assert fetch.calls == 4
+
+
+class _BrokenStore(MemorySharedStore):
+    def get(self, key):
+        raise ConnectionError("shared store is down")
+
+    def set(self, key, value, ttl=None, only_if_absent=False):
+        raise ConnectionError("shared store is down")
+
+
+def test_shared_store_is_used_when_up_and_skipped_when_down():
+    shared = MemorySharedStore()
+    fetch = GatedFetch()
+    fetch.release.set()
+
+    SearchCache(shared=shared).get_or_fetch("ASU parking", fetch)
+    other_worker = SearchCache(shared=shared)
+    assert other_worker.get_or_fetch("asu parking", fetch) == RESULT
+    assert fetch.calls == 1 and other_worker.stats()["shared_hits"] == 1
+
+    broken = SearchCache(shared=_BrokenStore())
+    assert broken.get_or_fetch("ASU parking", fetch) == RESULT
+    assert fetch.calls == 2 and broken.stats()["shared_hits"] == 0
+
+
+def test_cached_search_tool_keeps_the_tool_interface():
+    search = FakeSearch()
+    tool = CachedSearchTool.wrap(search, SearchCache())
+
+    assert tool.name == "tavily_search" and tool.description == "Search the web"
+    assert tool.invoke("parking") == tool.invoke({"query": " Parking "})
+    assert search.calls == 1
+
@@ -0,0 +1,166 @@
+"""
+Tests for the shared state backends and the conversation store built on them
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+import sqlalchemy as sa
+
+from app.ai.answer_cache import AnswerCache
+from app.ai.history import ConversationHistory
+from app.ai.llm_schema import Source
+from app.ai.memory import SharedConversationStore
+from app.ai.search_cache import SearchCache
+from app.shared_state import MemorySharedStore, RedisSharedStore, SQLiteSharedStore, create_redis_client
+from benchmarks.fakes import FakeRedisServer
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def connect(request, tmp_path):
+    """Return a function that opens the store a new worker process would get"""
+    if request.param == "memory":
+        store = MemorySharedStore()
+        yield lambda: store
+    elif request.param == "sqlite":
+        url = f"sqlite:///{tmp_path / 'shared.db'}"
+        yield lambda: SQLiteSharedStore(engine=sa.create_engine(url), purge_interval=0)
+    else:
+        with FakeRedisServer() as server:
+            yield lambda: RedisSharedStore(create_redis_client(server.url),
+                                           read_client=create_redis_client(server.url, retries=2))
+
+
+def test_values_counters_and_lists_are_shared_and_expire(connect):
+    first, second = connect(), connect()
+
+    assert first.set("token", "a", ttl=0.2)
+    assert not second.set("token", "b", ttl=0.2, only_if_absent=True)
+    assert second.get("token") == "a"
+    assert [first.incr("count", 2, ttl=0.2), second.incr("count", 2, ttl=0.2)] == [2, 4]
+    first.append("list", ["1", "2", "3"], max_len=3, ttl=0.2)
+    second.append("list", ["4"], max_len=3, ttl=0.2)
+    assert first.get_list("list") == ["2", "3", "4"]
+    assert second.exists("list")
+
+    time.sleep(0.3)
+    assert second.get("token") is None
+    assert not first.exists("list") and first.get_list("list") == []
+    assert second.incr("count", 1) == 1
+    assert second.set("token", "b", only_if_absent=True)
+    first.append("list", ["5"], max_len=3)
+    assert second.get_list("list") == ["5"]
+    first.delete("list")
+    assert not second.exists("list")
+
+
+def test_conversation_continues_on_another_worker(connect):
+    worker_a = SharedConversationStore(connect(), window=2)
+    worker_b = SharedConversationStore(connect(), window=2)
+
+    assert worker_a.save_turn(1, "c", "Where is the library?", "Hayden Library.") == 2
+    assert (1, "c") in worker_b and (2, "c") not in worker_b
+    assert worker_b.save_turn(1, "c", "When does it open?", "At 7am.") == 4
+    assert worker_a.get_chat_history(1, "c") == (
+        "Human: Where is the library?\nAI: Hayden Library.\nHuman: When does it open?\nAI: At 7am."
+    )
+    messages, cursor = worker_a.get_serialized(1, "c", after=2)
+    assert [m["seq"] for m in messages] == [3, 4] and cursor == 4
+
+    worker_a.save_turn(1, "c", "Is there parking?", "Yes.")
+    assert [m["seq"] for m in worker_b.get_serialized(1, "c")[0]] == [3, 4, 5, 6]
+
+
+def test_persisted_window_is_restored_once(connect):
+    worker_a = SharedConversationStore(connect())
+    worker_b = SharedConversationStore(connect())
+
+    worker_a.restore(1, "c", [(1, "human", "Hi"), (2, "ai", "Hello")])
+    worker_b.restore(1, "c", [(1, "human", "Hi"), (2, "ai", "Hello")])
+
+    assert worker_b.get_messages(1, "c") == [("human", "Hi"), ("ai", "Hello")]
+    assert worker_b.save_turn(1, "c", "Where is the gym?", "The SDFC.") == 4
+
+
+def test_caches_reuse_answers_and_searches_of_other_workers(connect):
+    answers_a = AnswerCache(shared=connect(), date_provider=lambda: "2025-09-27")
+    answers_b = AnswerCache(shared=connect(), date_provider=lambda: "2025-09-27")
+    answers_a.store("Where is Hayden Library?", ["On the Tempe campus."],
+                    [Source(url="https://lib.asu.edu", title="Library")])
+
+    cached = answers_b.lookup("where is hayden library")
+    assert cached.answer == ["On the Tempe campus."] and cached.sources[0].url == "https://lib.asu.edu"
+    assert answers_b.stats()["exact_hits"] == 1
+
+    calls = []
+
+    def fetch(query):
+        calls.append(query)
+        return {"results": [{"url": "https://www.asu.edu/parking"}]}
+
+    searches_a, searches_b = SearchCache(shared=connect()), SearchCache(shared=connect())
+    assert searches_a.get_or_fetch("ASU parking", fetch) == searches_b.get_or_fetch("asu  parking", fetch)
+    assert calls == ["ASU parking"]
+    assert searches_b.stats()["shared_hits"] == 1
+
+
+class _ThreadRecordingStore(MemorySharedStore):
+    """MemorySharedStore that remembers which threads called it"""
+
+    def __init__(self):
+        super().__init__()
+        self.threads = set()
+
+    def get(self, key):
+        self.threads.add(threading.get_ident())
+        return super().get(key)
+
+    def get_list(self, key):
+        self.threads.add(threading.get_ident())
+        return super().get_list(key)
+
+    def incr(self, key, amount=1, ttl=None):
+        self.threads.add(threading.get_ident())
+        return super().incr(key, amount, ttl)
+
+
+def test_async_callers_use_the_shared_store_off_the_event_loop():
+    store = _ThreadRecordingStore()
+    history = ConversationHistory(SharedConversationStore(store), enabled=False)
+    answers = AnswerCache(shared=store, date_provider=lambda: "2025-09-27")
+
+    async def scenario():
+        await history.save_turn(1, "c", "Where is the gym?", "The SDFC.")
+        await history.get_chat_history(1, "c")
+        await history.get_serialized(1, "c")
+        await answers.lookup_async("Where is the gym?")
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(scenario())
+    assert store.threads and loop_thread not in store.threads
+
+
+def test_redis_store_resends_reads_but_not_writes_after_a_dropped_connection():
+    import redis
+
+    with FakeRedisServer() as server:
+        store = RedisSharedStore(create_redis_client(server.url),
+                                 read_client=create_redis_client(server.url, retries=2))
+        store.append("list", ["a"], max_len=10)
+
+        server.drop_replies = 1
+        with pytest.raises(redis.ConnectionError):
+            store.incr("count", ttl=60)
+        server.drop_replies = 1
+        with pytest.raises(redis.ConnectionError):
+            store.append("list", ["b"], max_len=10)
+        # Both were applied once, and not sent again
+        assert store.get("count") == "1"
+
+        server.drop_replies = 1
+        assert store.get_list("list") == ["a", "b"]
+
+        # A connection the server closed while idle is replaced before a write is sent on it
+        server.close_connections()
+        assert store.incr("count") == 2
@@ -0,0 +1,33 @@
+"""
+Tests for source extraction from agent runs
+"""
+from app.ai.sources import canonical_url, extract_sources
+
+
+def _step(*results):
+    return (None, {"results": [{"url": url, "title": f"Title of {url}", "content": "x" * 500} for url in results]})
+
+
+def test_urls_of_the_same_page_share_a_canonical_form():
+    assert canonical_url("https://www.asu.edu/academics/?utm_source=x#top") == canonical_url("http://asu.edu/academics")
+    assert canonical_url("https://asu.edu/search?q=parking") != canonical_url("https://asu.edu/search?q=tutoring")
+
+
+def test_sources_are_deduplicated_ranked_and_capped():
+    steps = [
+        _step("https://example.com/asu-news", "https://admission.asu.edu/apply"),
+        _step("https://admission.asu.edu/apply/", "https://www.asu.edu/calendar"),
+        (None, "Tavily failed"),
+        _step("https://example.com/asu-news?utm_medium=email", "https://other.org/a", "https://other.org/b"),
+    ]
+
+    sources = extract_sources(steps, limit=4)
+
+    assert [s.url for s in sources] == [
+        "https://admission.asu.edu/apply",
+        "https://www.asu.edu/calendar",
+        "https://example.com/asu-news",
+        "https://other.org/a",
+    ]
+    assert sources[0].title == "Title of https://admission.asu.edu/apply"
+    assert len(sources[0].snippet) == 200
@@ -0,0 +1,55 @@
+"""
+Tests that the AI stack stays out of application startup
+"""
+import os
+import subprocess
+import sys
+
+
+def test_importing_the_app_does_not_load_the_agent_stack():
+    code = (
+        "import sys, app.main; "
+        "print(sorted(m for m in ('langchain.agents', 'langchain_google_genai', 'langchain_tavily') "
+        "if m in sys.modules))"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+
+    assert output.strip().splitlines()[-1] == "[]"
+
+
+def test_importing_the_app_does_no_io(tmp_path):
+    code = (
+        "import sys, threading; events = set(); "
+        "sys.addaudithook(lambda event, args: events.add(event) if event in "
+        "('sqlite3.connect', 'socket.connect', 'os.scandir') else None); "
+        "threads = threading.active_count(); import app.main; "
+        "print(sorted(events), threading.active_count() - threads)"
+    )
+    env = {**os.environ, "SHARED_STATE_BACKEND": "sqlite", "DATABASE_URL": f"sqlite:///{tmp_path / 'app.db'}"}
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            env=env).stdout
+
+    # No database, React build or socket was touched, and no thread started
+    assert output.strip().splitlines()[-1] == "[] 0"
+    assert not (tmp_path / "app.db").exists()
+
+
+def test_app_can_be_started_again_after_shutdown(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from app import main
+    from app.ai.history import conversation_history
+    from app.routes import chat
+    from benchmarks.common import auth_headers, install_stub_agent
+
+    monkeypatch.setattr(main, "DB_INIT_ON_STARTUP", False)
+    monkeypatch.setattr(chat, "ANSWER_CACHE_ENABLED", False)
+    monkeypatch.setattr(conversation_history, "enabled", False)
+    install_stub_agent(llm_latency=0, search_latency=0)
+
+    for _ in range(2):
+        with TestClient(main.app) as client:
+            response = client.post("/api/chat/ask", json={"question": "Where is the library?"},
+                                   headers=auth_headers(user_id=4343))
+        assert response.status_code == 200
+        assert response.json()["answer"] == ["Stub answer to: Where is the library?"]
@@ -0,0 +1,58 @@
+"""
+Tests for serving the React build
+"""
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.static_assets import IMMUTABLE, REVALIDATE, StaticAssets
+
+client = TestClient(main.app)
+
+
+@pytest.fixture
+def build(tmp_path, monkeypatch):
+    (tmp_path / "static" / "js").mkdir(parents=True)
+    (tmp_path / "index.html").write_text("<html>" + "<div>ASU</div>" * 200 + "</html>")
+    (tmp_path / "manifest.json").write_text('{"short_name": "ASU"}')
+    script = tmp_path / "static" / "js" / "main.1a2b3c4d.js"
+    script.write_text("console.log('asu');" * 100)
+    script.with_name(script.name + ".gz").write_bytes(gzip.compress(script.read_bytes()))
+    monkeypatch.setattr(main, "static_assets", StaticAssets(tmp_path).load())
+    return tmp_path
+
+
+def test_index_is_served_from_memory_with_revalidation(build):
+    first = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert first.status_code == 200
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.headers["cache-control"] == REVALIDATE
+    assert first.text.startswith("<html>")
+
+    # Answered from the in-memory index, even with the file gone
+    (build / "index.html").unlink()
+    again = client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+
+    identity = client.get("/", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["etag"] != first.headers["etag"]
+
+
+def test_hashed_static_file_uses_prebuilt_variant_and_long_cache(build):
+    compressed = client.get("/static/js/main.1a2b3c4d.js", headers={"Accept-Encoding": "gzip, br;q=0"})
+    plain = client.get("/static/js/main.1a2b3c4d.js", headers={"Accept-Encoding": "identity"})
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["cache-control"] == plain.headers["cache-control"] == IMMUTABLE
+    assert compressed.text == plain.text
+    assert client.get("/static/js/missing.js").status_code == 404
+
+
+def test_missing_build_returns_404(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "static_assets", StaticAssets(tmp_path / "missing").load())
+
+    assert client.get("/").status_code == 404
+    assert client.get("/manifest.json").status_code == 404
@@ -0,0 +1,121 @@
+"""
+Tests for the streaming question endpoint and its agent event handler
+"""
+import json
+import time
+from typing import Any, Iterator, List, Optional
+
+import httpx
+from fastapi.testclient import TestClient
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult, LLMResult
+from pydantic import PrivateAttr
+
+from app.ai import llm
+from app.ai.history import conversation_history
+from app.ai.search_cache import search_cache
+from app.ai.streaming import AgentEventHandler
+from app.ai.tools import CachedSearchTool
+from app.main import app
+from app.routes import chat
+from benchmarks.common import auth_headers, install_stub_agent, serve_app
+from benchmarks.fakes import FakeTavilySearch
+
+
+class StubReActChatModel(BaseChatModel):
+    """Chat model that searches once and then answers, recording whether it was streamed"""
+
+    _calls: int = PrivateAttr(default=0)
+    _streamed: List[bool] = PrivateAttr(default_factory=list)
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-react-chat"
+
+    def _respond(self) -> str:
+        self._calls += 1
+        if self._calls == 1:
+            return " I should search.\nAction: tavily_search\nAction Input: ASU library hours"
+        return " I now know the final answer\nFinal Answer: Hayden Library opens at 7am."
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self._streamed.append(False)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._respond()))])
+
+    def _stream(self, messages, stop: Optional[List[str]] = None, run_manager=None,
+                **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        self._streamed.append(True)
+        text = self._respond()
+        for start in range(0, len(text), 5):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text[start:start + 5]))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+def _frames(body: str) -> List[tuple]:
+    frames = []
+    for block in body.strip().split("\n\n"):
+        event, data = block.split("\n")
+        frames.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return frames
+
+
+def test_stream_sends_progress_then_answer_tokens_then_done(monkeypatch):
+    monkeypatch.setattr(chat, "ANSWER_CACHE_ENABLED", False)
+    monkeypatch.setattr(conversation_history, "enabled", False)
+    model = StubReActChatModel()
+    search_cache.clear()
+    monkeypatch.setattr(llm, "chain", llm.build_agent_executor(
+        model, [CachedSearchTool.wrap(FakeTavilySearch(), search_cache)]
+    ))
+
+    response = TestClient(app).post("/api/chat/ask/stream", headers=auth_headers(user_id=5151),
+                                    json={"question": "When does Hayden Library open?"})
+    frames = _frames(response.text)
+    names = [name for name, _ in frames]
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    # The handler exposes the streaming hooks, so both calls went through _stream
+    assert model._streamed == [True, True]
+    assert names[:2] == ["search_started", "sources_found"] and names[-1] == "done"
+    assert set(names[2:-1]) == {"token"}
+    assert frames[0][1]["query"] == "ASU library hours"
+    # Only the text after the marker is sent, although the marker was split across chunks
+    answer = "".join(data["text"] for name, data in frames if name == "token")
+    assert answer == "Hayden Library opens at 7am."
+    assert frames[-1][1]["answer"] == ["Hayden Library opens at 7am."]
+
+
+def test_handler_buffers_tokens_until_the_final_answer_marker():
+    events = []
+    handler = AgentEventHandler(events.append)
+
+    handler.on_chat_model_start({}, [])
+    for token in [" I now know", " the answer\nFinal An", "swer:", " Tempe", " campus."]:
+        handler.on_llm_new_token(token)
+    assert [e["text"] for e in events] == ["Tempe", " campus."]
+
+    # A model that did not stream sends its answer as one token when it ends
+    events.clear()
+    handler.on_chat_model_start({}, [])
+    generation = ChatGeneration(message=AIMessage(content="Thought: done\nFinal Answer: Tempe campus."))
+    handler.on_llm_end(LLMResult(generations=[[generation]]))
+    assert events == [{"event": "token", "text": "Tempe campus."}]
+
+
+def test_agent_run_stops_when_the_client_disconnects(monkeypatch):
+    monkeypatch.setattr(chat, "ANSWER_CACHE_ENABLED", False)
+    monkeypatch.setattr(conversation_history, "enabled", False)
+    search = install_stub_agent(llm_latency=0.2, search_latency=0, steps=4)
+
+    with serve_app() as base_url, httpx.Client(base_url=base_url, timeout=10) as client:
+        with client.stream("POST", "/api/chat/ask/stream", headers=auth_headers(user_id=5152),
+                           json={"question": "Where is the gym?"}) as response:
+            first = next(response.iter_lines())
+        assert first == "event: search_started"
+
+        # Uninterrupted, the run would make three more searches in the next second
+        time.sleep(1.2)
+        assert search.calls <= 1
@@ -0,0 +1,64 @@
+"""
+Tests for the verified access token cache
+"""
+import datetime
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from jose import JWTError
+
+import app.token_cache as token_cache_module
+from app.main import app
+from app.routes.auth import create_access_token, token_cache
+from app.token_cache import VerifiedTokenCache
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def decode_calls(monkeypatch):
+    """Count signature verifications"""
+    calls = []
+    real_decode = token_cache_module.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(token_cache_module.jwt, "decode", counting_decode)
+    return calls
+
+
+def test_token_is_verified_once_per_request_and_then_cached(decode_calls):
+    token_cache.clear()
+    headers = {"Authorization": f"Bearer {create_access_token('cache@example.com', 42)}"}
+
+    first = client.get("/api/auth/me", headers=headers)
+    second = client.get("/api/auth/me", headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert second.json()["user_id"] == 42
+    assert len(decode_calls) == 1
+
+
+def test_cached_token_is_rejected_after_logout():
+    headers = {"Authorization": f"Bearer {create_access_token('logout@example.com', 7)}"}
+    assert client.get("/api/auth/me", headers=headers).status_code == 200
+
+    assert client.post("/api/auth/logout", headers=headers).status_code == 200
+
+    response = client.get("/api/auth/me", headers=headers)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token has been invalidated"
+
+
+def test_cached_entry_expires_with_the_token():
+    cache = VerifiedTokenCache("LEOISGAY", "HS256")
+    token = create_access_token("short@example.com", 3, expires_delta=datetime.timedelta(seconds=1))
+    cache.decode(token)
+
+    time.sleep(1.1)
+
+    with pytest.raises(JWTError):
+        cache.decode(token)
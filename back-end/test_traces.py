@@ -0,0 +1,45 @@
+"""
+Tests for agent trace recording and offline replay
+"""
+from app.ai import llm
+from app.ai.budget import AgentBudget, run_with_budget
+from app.ai.traces import TraceRecorder, read_traces, trace_recorder
+from benchmarks.common import install_stub_agent
+from benchmarks.replay_traces import replay
+
+
+def _record(monkeypatch, tmp_path, **settings):
+    monkeypatch.setattr(trace_recorder, "directory", str(tmp_path))
+    for name, value in settings.items():
+        monkeypatch.setattr(trace_recorder, name, value)
+    install_stub_agent(llm_latency=0, search_latency=0, steps=2)
+    result = run_with_budget(llm.chain, {"input": "Where is the library?", "chat_history": ""}, AgentBudget())
+    trace_recorder.flush()
+    return result, list(read_traces(str(tmp_path)))
+
+
+def test_sampled_runs_are_recorded_with_every_step_and_replay_identically(monkeypatch, tmp_path):
+    result, traces = _record(monkeypatch, tmp_path, sample_rate=1.0)
+
+    assert len(traces) == 1
+    trace = traces[0]
+    assert trace["id"] == result["budget_usage"]["trace_id"]
+    assert [step["type"] for step in trace["steps"]] == ["llm", "tool", "llm", "tool", "llm"]
+    assert trace["steps"][0]["text"].endswith("Action Input: ASU Where is the library? 1")
+    assert trace["steps"][0]["input_tokens"] > 0
+    assert trace["steps"][1]["output"]["results"][0]["url"].startswith("https://www.asu.edu/")
+    assert trace["output"] == "Stub answer to: Where is the library?"
+
+    assert replay(trace, speed=0)["matches"]
+    trace["steps"][1]["input"] = "a different search"
+    assert not replay(trace, speed=0)["matches"]
+
+
+def test_unsampled_runs_are_only_kept_when_slow(monkeypatch, tmp_path):
+    recorder = TraceRecorder(str(tmp_path), sample_rate=0, slow_seconds=0)
+    assert recorder.should_collect() is None
+
+    _, traces = _record(monkeypatch, tmp_path, sample_rate=0, slow_seconds=60)
+    assert traces == []
+    _, traces = _record(monkeypatch, tmp_path, sample_rate=0, slow_seconds=0.000001)
+    assert len(traces) == 1
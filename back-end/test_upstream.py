@@ -0,0 +1,89 @@
+"""
+Tests for upstream call timeouts, retries and hedging
+"""
+import time
+
+import pytest
+
+from app.ai import tavily
+from app.ai.upstream import UpstreamError, UpstreamPolicy, call_upstream, upstream_stats
+from benchmarks.fakes import StubTavilyServer
+
+
+def _flaky(failures):
+    calls = []
+
+    def attempt(timeout):
+        calls.append(timeout)
+        if len(calls) <= len(failures):
+            raise failures[len(calls) - 1]
+        return "ok"
+
+    return attempt, calls
+
+
+def test_transient_errors_are_retried_and_others_are_not():
+    policy = UpstreamPolicy(timeout=5, max_retries=3, backoff=0.001)
+
+    attempt, calls = _flaky([UpstreamError(503), ConnectionError("reset")])
+    assert call_upstream("test", attempt, policy) == "ok"
+    assert calls == [5, 5, 5]
+
+    attempt, calls = _flaky([UpstreamError(400, "bad request")])
+    with pytest.raises(UpstreamError):
+        call_upstream("test", attempt, policy)
+    assert len(calls) == 1
+
+
+def test_backoff_is_jittered_and_honours_retry_after():
+    policy = UpstreamPolicy(backoff=1, backoff_max=3)
+
+    delays = {policy.delay(3, UpstreamError(429)) for _ in range(50)}
+    assert all(0 <= d <= 3 for d in delays) and len(delays) > 1
+    assert policy.delay(1, UpstreamError(429, retry_after=2)) == 2
+
+
+def test_slow_attempt_is_hedged():
+    durations = iter([1.0, 0.01])
+
+    def attempt(timeout):
+        time.sleep(next(durations))
+        return "answer"
+
+    before = upstream_stats.stats().get("hedge-test", {}).get("hedge_wins", 0)
+    start = time.perf_counter()
+    assert call_upstream("hedge-test", attempt, UpstreamPolicy(timeout=5, hedge_after=0.05)) == "answer"
+
+    assert time.perf_counter() - start < 0.5
+    assert upstream_stats.stats()["hedge-test"]["hedge_wins"] == before + 1
+
+
+def test_tavily_searches_reuse_connections_and_retry_failures(monkeypatch):
+    monkeypatch.setattr(tavily, "SEARCH_POLICY", UpstreamPolicy(timeout=5, max_retries=8, backoff=0.001))
+
+    with StubTavilyServer(error_ratio=0.3) as server:
+        search = tavily.create_tavily_search("test-key")
+        search.api_base_url = server.url
+        results = [search.invoke(f"ASU question {i}") for i in range(10)]
+
+    assert all(result["results"][0]["url"].startswith("https://www.asu.edu/") for result in results)
+    assert server.requests > 10  # Injected failures were retried
+    assert server.connections < server.requests
+
+
+def test_tavily_search_sends_the_tool_options_with_the_agent_arguments(monkeypatch):
+    sent = []
+
+    def search_api(self, params):
+        sent.append(params)
+        return {"results": [] if params["query"] == "nothing" else [{"url": "https://www.asu.edu/"}]}
+
+    monkeypatch.setattr(tavily.PooledTavilySearch, "_search", search_api)
+    search = tavily.PooledTavilySearch(tavily_api_key="test-key", max_results=3, topic="news")
+
+    search.invoke({"query": "ASU library hours", "topic": "general", "time_range": "week"})
+    # Options set on the tool win over the agent's
+    assert sent[-1] == {"query": "ASU library hours", "max_results": 3, "topic": "news", "time_range": "week"}
+
+    # Reported to the agent rather than raised
+    assert search.invoke({"query": "nothing"}).startswith("No search results found for 'nothing'")
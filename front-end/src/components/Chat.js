@@ -55,8 +55,8 @@ const Chat = ({ user }) => {
         throw new Error('Your session has expired. Please log in again.');
       }
 
-      // Call the backend API
-      const response = await chatAPI.askQuestion(currentInput, true);
+      // Call the backend API; messages are already shown here, so skip the history
+      const response = await chatAPI.askQuestion(currentInput, false);
 
       // Add AI response
       const aiMessage = {